@@ -0,0 +1,110 @@
+"""
+Mide el arranque del bot hasta su primer sondeo de la portada: tiempo desde que se lanza
+el intérprete, memoria residente (RSS) en ese momento y módulos pesados ya importados.
+Sale con código 1 si se supera algún umbral, para detectar regresiones al reiniciar.
+
+    py bench_arranque.py [repeticiones]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from statistics import median
+
+REPETICIONES = 5
+UMBRAL_PRIMER_SONDEO_MS = 600
+UMBRAL_RSS_MB = 64
+
+# No deben cargarse antes del primer sondeo: sólo los usan exportaciones, informes o rutas de respaldo
+MODULOS_PESADOS = ('pandas', 'numpy', 'pyarrow', 'bs4')
+
+MARCA = 'BENCH '
+
+
+class _PrimerSondeo(BaseException):
+    """Corta el bot justo al pedir la portada (su bucle sólo captura Exception)"""
+
+
+def _rss_mb() -> float:
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().rss / 2**20
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / 2**20 if sys.platform == 'darwin' else maximo / 1024
+
+
+def _medir_hijo():
+    """Arranca el bot como lo haría el supervisor y mide al llegar a la primera petición"""
+    import bot_apuestas_mejorado as bot
+
+    def http_get(url, **kwargs):
+        raise _PrimerSondeo()
+
+    bot.http_get = http_get
+    try:
+        bot.run_bot_mejorado()
+    except _PrimerSondeo:
+        pass
+
+    medida = {
+        'primer_sondeo_ms': (time.time() - float(os.environ['BENCH_T0'])) * 1000,
+        'rss_mb': _rss_mb(),
+        'pesados': [m for m in MODULOS_PESADOS if m in sys.modules],
+    }
+    print(MARCA + json.dumps(medida), flush=True)
+    os._exit(0)  # sin esperar a los hilos del bot
+
+
+def _lanzar() -> dict:
+    # Cada arranque en una carpeta vacía: sin bases de datos previas, como un despliegue nuevo
+    with tempfile.TemporaryDirectory() as carpeta:
+        entorno = dict(os.environ, BENCH_T0=repr(time.time()), PYTHONIOENCODING='utf-8')
+        salida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--hijo'],
+            cwd=carpeta, env=entorno, capture_output=True, text=True, encoding='utf-8',
+        )
+    for linea in salida.stdout.splitlines():
+        if linea.startswith(MARCA):
+            return json.loads(linea[len(MARCA):])
+    raise RuntimeError(f"El arranque no llegó al primer sondeo:\n{salida.stdout[-2000:]}{salida.stderr[-2000:]}")
+
+
+def main(repeticiones: int = REPETICIONES) -> int:
+    medidas = [_lanzar() for _ in range(repeticiones)]
+    tiempo = median(m['primer_sondeo_ms'] for m in medidas)
+    rss = [m['rss_mb'] for m in medidas if m['rss_mb'] is not None]
+    rss = median(rss) if rss else None
+    pesados = sorted({p for m in medidas for p in m['pesados']})
+
+    print(f"Primer sondeo: {tiempo:.0f} ms (mediana de {repeticiones}, umbral {UMBRAL_PRIMER_SONDEO_MS} ms)")
+    if rss is None:
+        print("RSS: no disponible (instala psutil para medirla en Windows)")
+    else:
+        print(f"RSS al primer sondeo: {rss:.1f} MB (umbral {UMBRAL_RSS_MB} MB)")
+    print(f"Módulos pesados cargados: {', '.join(pesados) or 'ninguno'}")
+
+    fallos = []
+    if tiempo > UMBRAL_PRIMER_SONDEO_MS:
+        fallos.append('tiempo hasta el primer sondeo')
+    if rss is not None and rss > UMBRAL_RSS_MB:
+        fallos.append('memoria al arrancar')
+    if pesados:
+        fallos.append('módulos pesados importados al arrancar')
+    if fallos:
+        print(f"❌ Regresión de arranque: {', '.join(fallos)}")
+        return 1
+    print("✅ Arranque dentro de los umbrales")
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--hijo']:
+        _medir_hijo()
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else REPETICIONES))
@@ -1,12 +1,20 @@
 import json
 import os
 import re
+import threading
 import time
-import requests
-from bs4 import BeautifulSoup
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from scoring_system import ScoringEngine, integrar_scoring_en_partido
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+from cache_persistente import CacheClasificaciones, EstadisticasLigas
+from cliente_http import CACHE_ESTADISTICAS, cerrar_sesion, http_get, http_post
+from parser_html import extraer_filas_estadisticas, extraer_partidos_livescore, extraer_portada_livescore
+from planificador import PlanificadorPartidos
+from precarga import PrecargaPrepartido
+from reglas import IndiceReglas, ReglaAlerta
+from scoring_system import MatchBatch, ScoringEngine, integrar_scoring_en_partido
 from data_logger import ImprovedDataLogger, integrar_logger_en_main
 from historical_from_h2h import (
     obtener_historial_desde_h2h,
@@ -25,17 +33,22 @@ from historical_from_h2h import (
 # TELEGRAM_BOT_TOKEN y TELEGRAM_CHAT_ID
 idBot = os.getenv('TELEGRAM_BOT_TOKEN', 'tokenbot')
 idGrupo = os.getenv('TELEGRAM_CHAT_ID', '-1003331928750')
-INTERVALO_ACTUALIZACION = 60
 INDICE_FORMA_UMBRAL_ALTO = 15
 INDICE_FORMA_UMBRAL_BAJO = 0
 
+# Descarga concurrente de estadísticas por partido
+# (el límite de conexiones por host vive en cliente_http.MAX_CONEXIONES_POR_HOST)
+MAX_WORKERS_ESTADISTICAS = 16
+
 URL_LIVESCORE = 'https://m.flashscore.cl/?s=2'
 URL_ESTADISTICAS_BASE = 'https://m.flashscore.cl/detalle-del-partido/{}/?s=2&t=estadisticas'
+URL_CLASIFICACION_BASE = 'https://m.flashscore.cl/detalle-del-partido/{}/?s=2&t=clasificacion'
+URL_TELEGRAM = 'https://api.telegram.org/bot{}/sendMessage'
 
 PARTIDOS_EN_SEGUIMIENTO: Dict[str, 'Partido'] = {}
-HEADERS = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-}
+
+# Motor de scoring compartido: el bucle y las reglas usan el mismo, con el momentum de cada partido
+MOTOR_SCORING = ScoringEngine()
 
 DEBUG_ALERTAS = False
 
@@ -46,7 +59,22 @@ def debug(msg: str):
 
 # --- Modelos de datos ---
 
+HISTORIAL_MAXIMO = 30   # snapshots que guarda cada partido (el más antiguo sale al entrar uno nuevo)
+
 class EstadisticasPartido:
+    # Hay una por sondeo y hasta HISTORIAL_MAXIMO por partido: sin __dict__ ocupan mucho menos
+    __slots__ = (
+        'minuto', 'goles_local', 'goles_visita',
+        'tarjetas_rojas_local', 'tarjetas_rojas_visita', 'tarjetas_rojas_totales',
+        'grandes_ocasiones_local', 'grandes_ocasiones_visita', 'xgot_local', 'xgot_visita',
+        'remates_totales', 'tiros_puerta', 'corners', 'posesion_local', 'posesion_visita', 'ataques_peligrosos',
+        'remates_local', 'remates_visita', 'tiros_puerta_local', 'tiros_puerta_visita',
+        'corners_local', 'corners_visita', 'ataques_peligrosos_local', 'ataques_peligrosos_visita',
+        'faltas_local', 'faltas_visita', 'amarillas_local', 'amarillas_visita',
+        'diferencia_goles', 'posesion_equilibrada', 'dominio_ofensivo_abs', 'dominio_ofensivo_rel',
+        'equipo_dominante',
+    )
+
     def __init__(self, minuto: int, g_local: int, g_visita: int, rojas_local: int, rojas_visita: int,
                 remates_totales: int = 0, tiros_puerta: int = 0, corners: int = 0,
                 posesion_local: int = 0, posesion_visita: int = 0, ataques_peligrosos: int = 0,
@@ -101,13 +129,149 @@ class EstadisticasPartido:
             self.equipo_dominante = 'Local' if tiros_puerta_local > tiros_puerta_visita else 'Visita'
 
 
+CLAVES_MOMENTUM = ('remates', 'tiros_puerta', 'corners')
+
+# Contadores que indexa IndiceMomentum, cada uno con columna <clave>_local y <clave>_visita
+CONTADORES_INDICE = ('remates', 'tiros_puerta', 'corners', 'ataques_peligrosos', 'faltas',
+                     'amarillas', 'grandes_ocasiones', 'goles', 'tarjetas_rojas')
+DECIMALES_INDICE = ('xgot',)
+
+
+class IndiceMomentum:
+    """
+    Valores de cada contador por minuto del partido: la fila m guarda los del último
+    snapshot del historial con minuto <= m. La referencia de cualquier ventana es así
+    una fila, sin recorrer el historial. Los contadores enteros van en un array('i') y
+    los decimales en un array('d'), una fila por minuto.
+    """
+    __slots__ = ('_enteros', '_decimales', 'filas')
+
+    def __init__(self):
+        self._enteros = array('i')
+        self._decimales = array('d')
+        self.filas = 0
+
+    def registrar(self, s: EstadisticasPartido):
+        """Añade la fila de un snapshot que entra en el historial (minutos no decrecientes)"""
+        ne, nd = len(CONTADORES_INDICE) * 2, len(DECIMALES_INDICE) * 2
+        enteros = [getattr(s, f"{c}_{lado}") for c in CONTADORES_INDICE for lado in ('local', 'visita')]
+        decimales = [getattr(s, f"{c}_{lado}") for c in DECIMALES_INDICE for lado in ('local', 'visita')]
+        minuto = max(s.minuto, 0)
+        if minuto < self.filas:
+            # El minuto retrocede (dato corregido en la web): se descartan las filas posteriores
+            del self._enteros[minuto * ne:]
+            del self._decimales[minuto * nd:]
+            self.filas = minuto
+        if self.filas:
+            # Los minutos sin snapshot repiten la fila anterior
+            hueco = minuto - self.filas
+            self._enteros.extend(self._enteros[-ne:] * hueco)
+            self._decimales.extend(self._decimales[-nd:] * hueco)
+        else:
+            # Antes del primer snapshot no se consulta nunca; se rellena con él
+            enteros, decimales = enteros * (minuto + 1), decimales * (minuto + 1)
+        self._enteros.extend(enteros)
+        self._decimales.extend(decimales)
+        self.filas = minuto + 1
+
+    def momentum(self, actual: EstadisticasPartido, ventanas, claves=CLAVES_MOMENTUM,
+                 minuto_minimo: int = 0) -> Dict[int, Dict[str, Dict[str, Union[int, float]]]]:
+        """
+        {ventana: {'local': {clave: delta}, 'visita': {...}}} entre el snapshot actual y la
+        fila de actual - ventana. minuto_minimo es el del snapshot más antiguo que se guarda:
+        las ventanas que llegan más atrás se miden desde él.
+        """
+        ne, nd = len(CONTADORES_INDICE) * 2, len(DECIMALES_INDICE) * 2
+        columnas = []
+        for clave in claves:
+            if clave in CONTADORES_INDICE:
+                columnas.append((clave, self._enteros, ne, CONTADORES_INDICE.index(clave) * 2))
+            else:
+                columnas.append((clave, self._decimales, nd, DECIMALES_INDICE.index(clave) * 2))
+
+        resultado = {}
+        for ventana in ventanas:
+            fila = min(max(actual.minuto - ventana, minuto_minimo, 0), self.filas - 1)
+            local, visita = {}, {}
+            for clave, valores, ancho, columna in columnas:
+                i = fila * ancho + columna
+                local[clave] = max(0, getattr(actual, f"{clave}_local") - valores[i])
+                visita[clave] = max(0, getattr(actual, f"{clave}_visita") - valores[i + 1])
+            resultado[ventana] = {'local': local, 'visita': visita}
+        return resultado
+
+
+class _MomentumPorVentana(dict):
+    """{ventana: momentum}; cada ventana se calcula la primera vez que una alerta la pide"""
+
+    def __init__(self, partido: 'Partido'):
+        super().__init__()
+        self.partido = partido
+
+    def __missing__(self, ventana: int) -> Dict[str, Dict[str, int]]:
+        momentum = self[ventana] = self.partido.momentum_ventanas((ventana,))[ventana]
+        return momentum
+
+
+class _MomentumTotal(dict):
+    """{ventana: {clave: local + visita}} sobre un _MomentumPorVentana"""
+
+    def __init__(self, momentum: _MomentumPorVentana):
+        super().__init__()
+        self.momentum = momentum
+
+    def __missing__(self, ventana: int) -> Dict[str, int]:
+        m = self.momentum[ventana]
+        total = self[ventana] = {
+            clave: m['local'].get(clave, 0) + m['visita'].get(clave, 0) for clave in CLAVES_MOMENTUM
+        }
+        return total
+
+
+class CaracteristicasSnapshot:
+    """
+    Rasgos derivados de un snapshot que comparten todas las alertas: momentum por lado y
+    total de cada ventana, ritmos por minuto, totales y diferencias local - visita. Se
+    crea una vez por snapshot (ver Partido.caracteristicas) y cada ventana de momentum se
+    calcula sólo si alguna alerta llega a pedirla; las alertas sólo leen.
+    """
+    __slots__ = (
+        'snapshot', 'momentum', 'momentum_total',
+        'ritmo_corners', 'ritmo_remates', 'ritmo_tiros_puerta',
+        'goles_total', 'faltas_total', 'amarillas_total', 'xgot_total', 'grandes_ocasiones_total',
+        'dif_remates', 'dif_tiros_puerta', 'dif_corners',
+    )
+
+    def __init__(self, s: EstadisticasPartido, partido: 'Partido'):
+        self.snapshot = s
+        self.momentum = _MomentumPorVentana(partido)
+        self.momentum_total = _MomentumTotal(self.momentum)
+
+        self.ritmo_corners = s.corners / s.minuto if s.minuto > 0 else 0.0
+        self.ritmo_remates = s.remates_totales / s.minuto if s.minuto > 0 else 0.0
+        self.ritmo_tiros_puerta = s.tiros_puerta / s.minuto if s.minuto > 0 else 0.0
+
+        self.goles_total = s.goles_local + s.goles_visita
+        self.faltas_total = s.faltas_local + s.faltas_visita
+        self.amarillas_total = s.amarillas_local + s.amarillas_visita
+        self.xgot_total = s.xgot_local + s.xgot_visita
+        self.grandes_ocasiones_total = s.grandes_ocasiones_local + s.grandes_ocasiones_visita
+
+        self.dif_remates = s.remates_local - s.remates_visita
+        self.dif_tiros_puerta = s.tiros_puerta_local - s.tiros_puerta_visita
+        self.dif_corners = s.corners_local - s.corners_visita
+
+
 class Partido:
     def __init__(self, partido_id: str, equipos: str, liga: str):
         self.id = partido_id
         self.equipos = equipos
         self.liga = liga
-        self.historial: List[EstadisticasPartido] = []
+        self.historial: Deque[EstadisticasPartido] = deque(maxlen=HISTORIAL_MAXIMO)
+        self.indice_momentum = IndiceMomentum()
         self.estadisticas_actuales: Optional[EstadisticasPartido] = None
+        self._caracteristicas: Optional[CaracteristicasSnapshot] = None
+        self.reglas_retiradas: Set[str] = set()   # alertas ya agotadas en este partido (ver reglas.py)
         self.perfil_local: Optional[Dict] = None
         self.perfil_visita: Optional[Dict] = None        
         self.probs_prematch: Optional[Dict] = None
@@ -151,42 +315,36 @@ class Partido:
 
         if not self.historial or self.historial[-1].minuto != nueva_stats.minuto:
             self.historial.append(nueva_stats)
+            self.indice_momentum.registrar(nueva_stats)
         self.estadisticas_actuales = nueva_stats
-        if len(self.historial) > 30:
-            self.historial = self.historial[-30:]
 
         if nueva_stats.tarjetas_rojas_local > prev_l and self.minuto_primera_roja_local is None:
             self.minuto_primera_roja_local = nueva_stats.minuto
         if nueva_stats.tarjetas_rojas_visita > prev_v and self.minuto_primera_roja_visita is None:
             self.minuto_primera_roja_visita = nueva_stats.minuto
 
-    def calcular_momentum(self, minutos: int) -> Dict[str, Dict[str, int]]:
-        if not self.estadisticas_actuales:
-            return {'local': {}, 'visita': {}}
-
-        stats_actual = self.estadisticas_actuales
-        minuto_inicio = stats_actual.minuto - minutos
+    @property
+    def caracteristicas(self) -> CaracteristicasSnapshot:
+        """Rasgos del snapshot actual; se calculan en la primera alerta que los pide"""
+        f = self._caracteristicas
+        if f is None or f.snapshot is not self.estadisticas_actuales:
+            f = self._caracteristicas = CaracteristicasSnapshot(self.estadisticas_actuales, self)
+        return f
 
-        stats_inicio = next(
-            (s for s in reversed(self.historial) if s.minuto <= minuto_inicio),
-            self.historial[0] if self.historial else stats_actual
-        )
+    def momentum_ventanas(self, ventanas, claves=CLAVES_MOMENTUM) -> Dict[int, Dict[str, Dict[str, int]]]:
+        """
+        Momentum de varias ventanas (y de cualquier contador de CONTADORES_INDICE o
+        DECIMALES_INDICE) en una sola llamada, leyendo el índice por minuto del partido
+        """
+        s = self.estadisticas_actuales
+        if s is None or not self.historial or (len(self.historial) == 1 and self.historial[0] is s):
+            return {ventana: {'local': {}, 'visita': {}} for ventana in ventanas}
+        return self.indice_momentum.momentum(s, ventanas, claves, minuto_minimo=self.historial[0].minuto)
 
-        if stats_inicio is stats_actual and len(self.historial) <= 1:
+    def calcular_momentum(self, minutos: int) -> Dict[str, Dict[str, int]]:
+        if not self.estadisticas_actuales:
             return {'local': {}, 'visita': {}}
-
-        momentum_local = {
-            'remates': max(0, stats_actual.remates_local - stats_inicio.remates_local),
-            'tiros_puerta': max(0, stats_actual.tiros_puerta_local - stats_inicio.tiros_puerta_local),
-            'corners': max(0, stats_actual.corners_local - stats_inicio.corners_local),
-        }
-        momentum_visita = {
-            'remates': max(0, stats_actual.remates_visita - stats_inicio.remates_visita),
-            'tiros_puerta': max(0, stats_actual.tiros_puerta_visita - stats_inicio.tiros_puerta_visita),
-            'corners': max(0, stats_actual.corners_visita - stats_inicio.corners_visita),
-        }
-
-        return {'local': momentum_local, 'visita': momentum_visita}
+        return self.caracteristicas.momentum[minutos]
 
 
 # --- Funciones auxiliares ---
@@ -228,10 +386,21 @@ class PerfilCornersLiga:
     
     @staticmethod
     def obtener_promedio(nombre_liga: str) -> float:
-        """Obtiene el promedio de córners para una liga"""
+        """Obtiene el promedio de córners para una liga (el observado si hay partidos suficientes)"""
+        observado = obtener_estadisticas_ligas().media(nombre_liga, 'corners')
+        if observado is not None:
+            return observado
         nombre_norm = _normalizar_nombre_equipo(nombre_liga)
         return PerfilCornersLiga.PROMEDIOS_LIGA.get(nombre_norm, 
                                                      PerfilCornersLiga.PROMEDIOS_LIGA['default'])
+    
+    @staticmethod
+    def obtener_desviacion(nombre_liga: str) -> float:
+        """Desviación estándar de córners de la liga; sin datos propios, un 20% de su promedio"""
+        observada = obtener_estadisticas_ligas().desviacion(nombre_liga, 'corners')
+        if observada is not None:
+            return observada
+        return PerfilCornersLiga.obtener_promedio(nombre_liga) * 0.20
 
 def construir_snapshot(stats: EstadisticasPartido) -> Dict:
     """Convierte EstadisticasPartido a formato dict para scoring"""
@@ -290,72 +459,131 @@ def _normalizar_nombre_equipo(nombre: str) -> str:
     return nombre
 
 
-def iniciar_seguimiento_partido(partido_id: str, equipos_str: str, liga: str, info_basica: dict):
-    """Inicializa un objeto Partido y carga sus perfiles históricos usando H2H"""
-    if partido_id in PARTIDOS_EN_SEGUIMIENTO:
-        return PARTIDOS_EN_SEGUIMIENTO[partido_id]
+# Cachés en cache_flashscore.db: se abren al primer uso, no al importar el módulo
+_CACHES_LOCK = threading.Lock()
+
+# Totales finales por liga (córners, goles, tarjetas) acumulados al terminar cada partido
+_estadisticas_ligas: Optional[EstadisticasLigas] = None
 
+
+def obtener_estadisticas_ligas() -> EstadisticasLigas:
+    global _estadisticas_ligas
+    if _estadisticas_ligas is None:
+        with _CACHES_LOCK:
+            if _estadisticas_ligas is None:
+                _estadisticas_ligas = EstadisticasLigas(normalizar=_normalizar_nombre_equipo)
+    return _estadisticas_ligas
+
+
+MINUTO_MINIMO_FINAL = 85        # por debajo, un partido que desaparece no cuenta como terminado
+AUSENCIAS_PARA_FINALIZAR = 2    # lecturas de la portada sin el partido antes de darlo por terminado
+_AUSENCIAS: Dict[str, int] = {}
+
+
+def _crear_partido(partido_id: str, equipos_str: str, liga: str, info_basica: dict) -> 'Partido':
+    """Crea el objeto Partido con los datos del livescore, sin descargas adicionales"""
     partido = Partido(partido_id, equipos_str, liga)
     
     partido.equipo_local = info_basica.get('equipo_local', equipos_str.split(" - ")[0])
     partido.equipo_visita = info_basica.get('equipo_visita', equipos_str.split(" - ")[1])
+    partido.tiene_estadisticas = info_basica.get('tiene_estadisticas', False)
+    partido.tiene_apuestas = info_basica.get('tiene_apuestas', False)
+    return partido
+
+
+def _aplicar_clasificacion(partido: 'Partido', tabla: List[Dict]):
+    """Asigna a cada equipo su fila de la tabla de posiciones"""
+
+    def _buscar_equipo(tabla, nombre_objetivo):
+        objetivo_norm = _normalizar_nombre_equipo(nombre_objetivo)
+        for fila in tabla:
+            if _normalizar_nombre_equipo(fila["equipo"]) == objetivo_norm:
+                return fila
+        return None
+
+    if tabla:
+        partido.clasificacion_local = _buscar_equipo(tabla, partido.equipo_local)
+        partido.clasificacion_visita = _buscar_equipo(tabla, partido.equipo_visita)
+
+        if partido.clasificacion_local and partido.clasificacion_visita:
+            cl = partido.clasificacion_local
+            cv = partido.clasificacion_visita
+            print(
+                f"📈 CLASIFICACIÓN:\n"
+                f"  Local ({partido.equipo_local})  Pos:{cl['pos']}  DG:{cl['dg']}  Pts:{cl['pts']}\n"
+                f"  Visita ({partido.equipo_visita}) Pos:{cv['pos']}  DG:{cv['dg']}  Pts:{cv['pts']}"
+            )
+    else:
+        print(f"⚠️ No se pudo obtener clasificación para {partido.equipos}")
+
 
+def _aplicar_historial(partido: 'Partido', hist_local: List[Dict], hist_visita: List[Dict],
+                       nombre_local_h2h: str, nombre_visita_h2h: str):
+    """Calcula perfiles de forma y probabilidades pre-partido a partir del H2H"""
+    perfil_local = analizar_patrones_simple(hist_local)
+    perfil_visita = analizar_patrones_simple(hist_visita)
+
+    partido.perfil_local = perfil_local
+    partido.perfil_visita = perfil_visita
+    partido.probs_prematch = estimar_probabilidades_por_forma(perfil_local, perfil_visita)
+
+    print("✅ Análisis histórico (H2H) completado.")
+    print("--- 📋 PERFIL HISTÓRICO (FORMA) CARGADO ---")
+    print(f"🏠 LOCAL ({nombre_local_h2h}): Forma {perfil_local.get('forma_resumen','N/D')}, "
+          f"GA/GC: {perfil_local.get('media_ga', 0.0):.2f}/{perfil_local.get('media_gc', 0.0):.2f}")
+    print(f"✈️ VISITA ({nombre_visita_h2h}): Forma {perfil_visita.get('forma_resumen','N/D')}, "
+          f"GA/GC: {perfil_visita.get('media_ga', 0.0):.2f}/{perfil_visita.get('media_gc', 0.0):.2f}")
+    print("-------------------------------------------")
+
+
+def _cargar_prepartido(partido: 'Partido'):
+    """Clasificación, H2H, perfiles de forma y probabilidades pre-partido"""
     # Clasificación de la liga
     try:
-        print(f"⚙️ Cargando clasificación de liga para: {equipos_str}...")
-        tabla = _obtener_clasificacion_liga(partido_id)
-
-        def _buscar_equipo(tabla, nombre_objetivo):
-            objetivo_norm = _normalizar_nombre_equipo(nombre_objetivo)
-            for fila in tabla:
-                if _normalizar_nombre_equipo(fila["equipo"]) == objetivo_norm:
-                    return fila
-            return None
-
-        if tabla:
-            partido.clasificacion_local = _buscar_equipo(tabla, partido.equipo_local)
-            partido.clasificacion_visita = _buscar_equipo(tabla, partido.equipo_visita)
-
-            if partido.clasificacion_local and partido.clasificacion_visita:
-                cl = partido.clasificacion_local
-                cv = partido.clasificacion_visita
-                print(
-                    f"📈 CLASIFICACIÓN:\n"
-                    f"  Local ({partido.equipo_local})  Pos:{cl['pos']}  DG:{cl['dg']}  Pts:{cl['pts']}\n"
-                    f"  Visita ({partido.equipo_visita}) Pos:{cv['pos']}  DG:{cv['dg']}  Pts:{cv['pts']}"
-                )
-        else:
-            print(f"⚠️ No se pudo obtener clasificación para {equipos_str}")
-
+        print(f"⚙️ Cargando clasificación de liga para: {partido.equipos}...")
+        tabla = _clasificacion_para_partido(partido)
+        _aplicar_clasificacion(partido, tabla)
     except Exception as e:
-        print(f"⚠️ ERROR al cargar clasificación de liga para {equipos_str}: {e}")
-    
-    partido.tiene_estadisticas = info_basica.get('tiene_estadisticas', False)
-    partido.tiene_apuestas = info_basica.get('tiene_apuestas', False)
+        print(f"⚠️ ERROR al cargar clasificación de liga para {partido.equipos}: {e}")
 
     # Obtener historiales desde H2H
-    print(f"\n⚙️ Iniciando análisis histórico (H2H) para: {equipos_str}...")
+    print(f"\n⚙️ Iniciando análisis histórico (H2H) para: {partido.equipos}...")
     try:
         hist_local, hist_visita, nombre_local_h2h, nombre_visita_h2h = \
-            obtener_historial_desde_h2h(partido_id)
+            obtener_historial_desde_h2h(partido.id, equipo_local=partido.equipo_local,
+                                        equipo_visita=partido.equipo_visita)
+        _aplicar_historial(partido, hist_local, hist_visita, nombre_local_h2h, nombre_visita_h2h)
+    except Exception as e:
+        print(f"⚠️ ERROR al cargar historial H2H para {partido.equipos}. Continuará sin análisis histórico. Error: {e}")
+
 
-        perfil_local = analizar_patrones_simple(hist_local)
-        perfil_visita = analizar_patrones_simple(hist_visita)
+def _precalcular_prepartido(info_programado: Dict) -> 'Partido':
+    """Enriquece un partido programado antes de que empiece (lo llama la precarga en segundo plano)"""
+    equipos = f"{info_programado['equipo_local']} - {info_programado['equipo_visita']}"
+    partido = _crear_partido(info_programado['partido_id'], equipos,
+                             info_programado.get('liga', 'Desconocida'), info_programado)
+    _cargar_prepartido(partido)
+    return partido
 
-        partido.perfil_local = perfil_local
-        partido.perfil_visita = perfil_visita
-        partido.probs_prematch = estimar_probabilidades_por_forma(perfil_local, perfil_visita)
 
-        print("✅ Análisis histórico (H2H) completado.")
-        print("--- 📋 PERFIL HISTÓRICO (FORMA) CARGADO ---")
-        print(f"🏠 LOCAL ({nombre_local_h2h}): Forma {perfil_local.get('forma_resumen','N/D')}, "
-              f"GA/GC: {perfil_local.get('media_ga', 0.0):.2f}/{perfil_local.get('media_gc', 0.0):.2f}")
-        print(f"✈️ VISITA ({nombre_visita_h2h}): Forma {perfil_visita.get('forma_resumen','N/D')}, "
-              f"GA/GC: {perfil_visita.get('media_ga', 0.0):.2f}/{perfil_visita.get('media_gc', 0.0):.2f}")
-        print("-------------------------------------------")
+# Enriquecimiento de los partidos programados, calculado antes del pitido inicial
+PRECARGA = PrecargaPrepartido(calcular=_precalcular_prepartido)
 
-    except Exception as e:
-        print(f"⚠️ ERROR al cargar historial H2H para {equipos_str}. Continuará sin análisis histórico. Error: {e}")
+
+def iniciar_seguimiento_partido(partido_id: str, equipos_str: str, liga: str, info_basica: dict):
+    """Inicializa un objeto Partido y carga sus perfiles históricos usando H2H"""
+    if partido_id in PARTIDOS_EN_SEGUIMIENTO:
+        return PARTIDOS_EN_SEGUIMIENTO[partido_id]
+
+    # Si se precargó mientras estaba programado, empezar sólo cuesta recogerlo
+    partido = PRECARGA.tomar(partido_id)
+    if partido is not None:
+        print(f"⚡ Pre-partido precargado para: {equipos_str}")
+        partido.tiene_estadisticas = info_basica.get('tiene_estadisticas', False)
+        partido.tiene_apuestas = info_basica.get('tiene_apuestas', False)
+    else:
+        partido = _crear_partido(partido_id, equipos_str, liga, info_basica)
+        _cargar_prepartido(partido)
 
     PARTIDOS_EN_SEGUIMIENTO[partido_id] = partido
     return partido
@@ -378,19 +606,19 @@ class EstrategiaAnalisis:
         if s.corners < 4:
             return None
 
-        ritmo_actual = s.corners / s.minuto
+        f = partido.caracteristicas
+        ritmo_actual = f.ritmo_corners
         corners_proyectados = ritmo_actual * 90
 
         promedio_liga = PerfilCornersLiga.obtener_promedio(partido.liga)
-        std_liga = promedio_liga * 0.20  # desviación estándar estimada
+        std_liga = PerfilCornersLiga.obtener_desviacion(partido.liga)
 
         z_score = (corners_proyectados - promedio_liga) / std_liga if std_liga > 0 else 0
 
         if z_score < 1.5:  # solo alertar si es estadísticamente significativo
             return None
 
-        mom10 = partido.calcular_momentum(10)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        c10 = f.momentum_total[10]['corners']
         if s.minuto >= 30 and c10 < 2:
             return None
 
@@ -429,7 +657,8 @@ class EstrategiaAnalisis:
             return None
 
         # Ritmo lineal actual (corners por minuto)
-        ritmo_actual = s.corners / s.minuto if s.minuto > 0 else 0.0
+        f = partido.caracteristicas
+        ritmo_actual = f.ritmo_corners
         proyeccion_lineal = ritmo_actual * 90.0  # proyección simple
 
         # Factor para 2º tiempo (los segundos tiempos tienden a ser algo más activos en corners)
@@ -453,8 +682,7 @@ class EstrategiaAnalisis:
             peso_mom = 0.10
 
         # Momentum reciente (U10) — si hay actividad reciente, la usamos para ajustar
-        mom10 = partido.calcular_momentum(10)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        c10 = f.momentum_total[10]['corners']
 
         # Escalar c10 a una contribución estimada (regla heurística)
         contrib_momentum = 0.0
@@ -540,7 +768,8 @@ class EstrategiaAnalisis:
             lado = 'visita'
         
         # Verificar momentum del equipo dominante
-        mom10 = partido.calcular_momentum(10)
+        f = partido.caracteristicas
+        mom10 = f.momentum[10]
         c10_dom = mom10[lado].get('corners', 0)
         
         # Si el dominante no tiene momentum reciente, no alertar
@@ -627,8 +856,8 @@ class EstrategiaAnalisis:
             return None
         
         # Verificar momentum reciente
-        mom10 = partido.calcular_momentum(10)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        f = partido.caracteristicas
+        c10 = f.momentum_total[10]['corners']
         
         if c10 < 2:
             return None
@@ -676,8 +905,8 @@ class EstrategiaAnalisis:
         corners_necesarios = int(linea_objetivo) + 1 - s.corners
         
         # Verificar momentum reciente
-        mom10 = partido.calcular_momentum(10)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        f = partido.caracteristicas
+        c10 = f.momentum_total[10]['corners']
         
         # Calcular ritmo reciente
         ritmo_reciente = c10 / 10
@@ -772,7 +1001,8 @@ class EstrategiaAnalisis:
         if not s or s.minuto < 60 or s.minuto > 85:
             return None
         
-        goles_actuales = s.goles_local + s.goles_visita
+        f = partido.caracteristicas
+        goles_actuales = f.goles_total
         
         if goles_actuales >= 3:
             return None
@@ -791,8 +1021,7 @@ class EstrategiaAnalisis:
         if s.corners >= 10:
             prob_base += 0.05
         
-        mom10 = partido.calcular_momentum(10)
-        tp_10 = mom10['local'].get('tiros_puerta', 0) + mom10['visita'].get('tiros_puerta', 0)
+        tp_10 = f.momentum_total[10]['tiros_puerta']
         if tp_10 >= 3:
             prob_base += 0.12
         elif tp_10 >= 2:
@@ -1001,8 +1230,9 @@ class EstrategiaAnalisis:
         if s.minuto < 60 or s.minuto > 88 or s.diferencia_goles > 1:
             return None
 
-        faltas_tot = s.faltas_local + s.faltas_visita
-        amarillas_tot = s.amarillas_local + s.amarillas_visita
+        f = partido.caracteristicas
+        faltas_tot = f.faltas_total
+        amarillas_tot = f.amarillas_total
         amarillas_local = s.amarillas_local
         amarillas_visita = s.amarillas_visita
         ratio_af = EstrategiaAnalisis._ratio_amarillas_por_falta(s)
@@ -1010,10 +1240,9 @@ class EstrategiaAnalisis:
         if s.minuto >= 70 and faltas_tot >= 24 and amarillas_tot <= 2 and ratio_af < 0.11:
             return None
 
-        mom10 = partido.calcular_momentum(10)
-        tp10 = mom10['local'].get('tiros_puerta', 0) + mom10['visita'].get('tiros_puerta', 0)
-        r10 = mom10['local'].get('remates', 0) + mom10['visita'].get('remates', 0)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        tp10 = f.momentum_total[10]['tiros_puerta']
+        r10 = f.momentum_total[10]['remates']
+        c10 = f.momentum_total[10]['corners']
 
         cond_calidad_alta = (
             faltas_tot >= 22 and
@@ -1055,9 +1284,9 @@ class EstrategiaAnalisis:
             return None
         if not s.posesion_equilibrada:
             return None
-        mom10 = partido.calcular_momentum(10)
-        rem_10 = mom10['local'].get('remates', 0) + mom10['visita'].get('remates', 0)
-        tp_10 = mom10['local'].get('tiros_puerta', 0) + mom10['visita'].get('tiros_puerta', 0)
+        f = partido.caracteristicas
+        rem_10 = f.momentum_total[10]['remates']
+        tp_10 = f.momentum_total[10]['tiros_puerta']
         if rem_10 < 5 or tp_10 < 2:
             return None
         if getattr(partido, 'alerta_over15_abierto_enviada', False):
@@ -1079,8 +1308,8 @@ class EstrategiaAnalisis:
             return None
         if s.diferencia_goles > 1 or s.corners < 8:
             return None
-        mom10 = partido.calcular_momentum(10)
-        corners_10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        f = partido.caracteristicas
+        corners_10 = f.momentum_total[10]['corners']
         if corners_10 < 3:
             return None
         if getattr(partido, 'alerta_over_corners_final_enviada', False):
@@ -1106,7 +1335,7 @@ class EstrategiaAnalisis:
         if s.goles_local != 0 or s.goles_visita != 0:
             return None
         
-        faltas_tot = s.faltas_local + s.faltas_visita
+        faltas_tot = partido.caracteristicas.faltas_total
         
         if s.remates_totales <= 6 and s.tiros_puerta <= 2 and faltas_tot >= 14:
             if getattr(partido, 'alerta_ritmo_lento_enviada', False):
@@ -1199,7 +1428,7 @@ class EstrategiaAnalisis:
             if minuto_roja is None or s.minuto - minuto_roja > 15 or s.minuto - minuto_roja < 3:
                 return None
             
-            mom = partido.calcular_momentum(8)[lado_rival]
+            mom = partido.caracteristicas.momentum[8][lado_rival]
             remates = mom.get('remates', 0)
             tp = mom.get('tiros_puerta', 0)
             corners = mom.get('corners', 0)
@@ -1422,7 +1651,8 @@ class EstrategiaAnalisis:
             return None
 
         equipo_dominante = partido.equipos.split(' - ')[0] if dom_score == 1 else partido.equipos.split(' - ')[1]
-        momentum = partido.calcular_momentum(10)
+        f = partido.caracteristicas
+        momentum = f.momentum[10]
         mom = momentum['local'] if dom_score == 1 else momentum['visita']
         req_rem = 3 if abs(s.tiros_puerta_local - s.tiros_puerta_visita) >= 3 else 4
 
@@ -1445,7 +1675,8 @@ class EstrategiaAnalisis:
         dom = EstrategiaAnalisis._equipo_dominante_por_tp(s)
         if dom == 0:
             return None
-        mom10 = partido.calcular_momentum(10)
+        f = partido.caracteristicas
+        mom10 = f.momentum[10]
         mom = mom10['local'] if dom == 1 else mom10['visita']
         if mom.get('tiros_puerta', 0) >= 2 and mom.get('remates', 0) >= 4 and mom.get('corners', 0) >= 2:
             if getattr(partido, 'alerta_presion_sostenida_enviada', False):
@@ -1466,7 +1697,8 @@ class EstrategiaAnalisis:
         s = partido.estadisticas_actuales
         if not s or s.minuto < 25 or s.minuto > 85 or s.diferencia_goles > 1 or s.tiros_puerta < 5:
             return None
-        mom7 = partido.calcular_momentum(7)
+        f = partido.caracteristicas
+        mom7 = f.momentum[7]
         for idx in ['local', 'visita']:
             c = mom7[idx].get('corners', 0)
             tp = mom7[idx].get('tiros_puerta', 0)
@@ -1496,7 +1728,8 @@ class EstrategiaAnalisis:
             dom = -1
         if dom == 0:
             return None
-        mom10 = partido.calcular_momentum(10)
+        f = partido.caracteristicas
+        mom10 = f.momentum[10]
         mom_dom = mom10['local'] if dom == 1 else mom10['visita']
         rem = mom_dom.get('remates', 0)
         if rem < 3 and s.ataques_peligrosos < 12:
@@ -1521,7 +1754,7 @@ class EstrategiaAnalisis:
         def check_rebote(minuto_roja, lado_rival):
             if minuto_roja is None or minuto_roja > 40 or s.minuto - minuto_roja > 12:
                 return None
-            mom = partido.calcular_momentum(12)[lado_rival]
+            mom = partido.caracteristicas.momentum[12][lado_rival]
             if mom.get('tiros_puerta', 0) >= 2 or mom.get('remates', 0) >= 4:
                 return mom
             return None
@@ -1569,11 +1802,11 @@ class EstrategiaAnalisis:
         if corners_actuales >= 10:
             return None
         
-        tasa_corners_min = corners_actuales / s.minuto if s.minuto > 0 else 0
+        f = partido.caracteristicas
+        tasa_corners_min = f.ritmo_corners
         corners_proyectados = tasa_corners_min * 90
         
-        mom10 = partido.calcular_momentum(10)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        c10 = f.momentum_total[10]['corners']
         
         if c10 >= 3:
             corners_proyectados += 2
@@ -1644,7 +1877,8 @@ class EstrategiaAnalisis:
         
         prob_btts = prob_gol_local * prob_gol_visita
         
-        mom10 = partido.calcular_momentum(10)
+        f = partido.caracteristicas
+        mom10 = f.momentum[10]
         tp10_local = mom10['local'].get('tiros_puerta', 0)
         tp10_visita = mom10['visita'].get('tiros_puerta', 0)
         
@@ -1719,7 +1953,8 @@ class EstrategiaAnalisis:
         prob_visita = tp_visita / total_tp if total_tp > 0 else 0.5
 
         # Ajustes por momentum (últimos 10 minutos)
-        mom10 = partido.calcular_momentum(10)
+        f = partido.caracteristicas
+        mom10 = f.momentum[10]
         tp10_local = mom10['local'].get('tiros_puerta', 0)
         tp10_visita = mom10['visita'].get('tiros_puerta', 0)
 
@@ -1826,11 +2061,13 @@ class EstrategiaAnalisis:
         tp_opp = s.tiros_puerta_visita if lado == 'local' else s.tiros_puerta_local
         grandes_ocasiones = s.grandes_ocasiones_local if lado == 'local' else s.grandes_ocasiones_visita
 
-        rem_diff = rem_lado - rem_opp
-        cor_diff = cor_lado - cor_opp
+        f = partido.caracteristicas
+        signo = 1 if lado == 'local' else -1
+        rem_diff = signo * f.dif_remates
+        cor_diff = signo * f.dif_corners
 
         # Momentum U10 por lado
-        mom10 = partido.calcular_momentum(10)
+        mom10 = f.momentum[10]
         r10 = mom10[lado].get('remates', 0)
         c10 = mom10[lado].get('corners', 0)
         tp10 = mom10[lado].get('tiros_puerta', 0)
@@ -1849,11 +2086,11 @@ class EstrategiaAnalisis:
 
         # Construir snapshot y tratar de obtener scoring/xg si existe
         snap_dict = construir_snapshot(s)
+        snap_dict['match_id'] = partido.id
         xgot_side = getattr(s, 'xgot_local', 0.0) if lado == 'local' else getattr(s, 'xgot_visita', 0.0)
 
         try:
-            scoring_engine = ScoringEngine()
-            resultado = integrar_scoring_en_partido(scoring_engine, snap_dict)
+            resultado = integrar_scoring_en_partido(MOTOR_SCORING, snap_dict)
             # intentar usar xG del scoring si viene
             xg = resultado.get('xg_home' if lado == 'local' else 'xg_away', None)
             if xg is not None:
@@ -1948,37 +2185,37 @@ class EstrategiaAnalisis:
             debug(f"Friccion+Presion skip: min={s.minuto}, diff={s.diferencia_goles}")
             return None
 
-        faltas_tot = s.faltas_local + s.faltas_visita
-        amarillas_tot = s.amarillas_local + s.amarillas_visita
+        f = partido.caracteristicas
+        faltas_tot = f.faltas_total
+        amarillas_tot = f.amarillas_total
         
         if faltas_tot < 24 or amarillas_tot < 3:
             debug(f"Friccion insuficiente: faltas={faltas_tot}, amarillas={amarillas_tot}")
             return None
 
         # ✅ NUEVA VALIDACIÓN 1: Verificar xGOT mínimo
-        xgot_total = s.xgot_local + s.xgot_visita
+        xgot_total = f.xgot_total
         if xgot_total < 1.5:  # Menos de 1.5 xGOT total = remates de muy baja calidad
             debug(f"xGOT insuficiente: {xgot_total:.2f}")
             return None
 
         # ✅ NUEVA VALIDACIÓN 2: Verificar grandes ocasiones
-        grandes_ocasiones_total = s.grandes_ocasiones_local + s.grandes_ocasiones_visita
+        grandes_ocasiones_total = f.grandes_ocasiones_total
         if grandes_ocasiones_total < 2:
             debug(f"Pocas grandes ocasiones: {grandes_ocasiones_total}")
             return None
 
-        mom10 = partido.calcular_momentum(10)
-        tp10 = mom10['local'].get('tiros_puerta', 0) + mom10['visita'].get('tiros_puerta', 0)
-        r10 = mom10['local'].get('remates', 0) + mom10['visita'].get('remates', 0)
-        c10 = mom10['local'].get('corners', 0) + mom10['visita'].get('corners', 0)
+        tp10 = f.momentum_total[10]['tiros_puerta']
+        r10 = f.momentum_total[10]['remates']
+        c10 = f.momentum_total[10]['corners']
 
         # ✅ NUEVA VALIDACIÓN 3: Momentum U10 más exigente
         if tp10 == 0:  # Si no hay ni un tiro a puerta en U10, no alertar
             debug(f"Sin tiros a puerta en U10")
             return None
 
-        dom_visita_vol = (s.remates_visita - s.remates_local >= 4 and s.corners_visita - s.corners_local >= 1)
-        dom_local_vol = (s.remates_local - s.remates_visita >= 4 and s.corners_local - s.corners_visita >= 1)
+        dom_visita_vol = (-f.dif_remates >= 4 and -f.dif_corners >= 1)
+        dom_local_vol = (f.dif_remates >= 4 and f.dif_corners >= 1)
         hay_dom_vol = dom_visita_vol or dom_local_vol
 
         # ✅ NUEVA VALIDACIÓN 4: Condiciones de momentum más estrictas
@@ -1989,7 +2226,7 @@ class EstrategiaAnalisis:
             debug(f"Momentum insuficiente: U10 tp={tp10}, r={r10}, c={c10}, dom_vol={hay_dom_vol}")
             return None
 
-        mom7 = partido.calcular_momentum(7)
+        mom7 = f.momentum[7]
         wave = any(mom7[idx].get('corners', 0) >= 1 and mom7[idx].get('tiros_puerta', 0) >= 1 for idx in ['local', 'visita'])
         tp_diff = abs(s.tiros_puerta_local - s.tiros_puerta_visita)
         marcador_bajo_empate = (s.goles_local == s.goles_visita and (s.goles_local in (0, 1)))
@@ -2031,8 +2268,81 @@ class EstrategiaAnalisis:
 
 # --- Extracción de datos ---
 
-def _obtener_estadisticas_detalladas(partido_id: str) -> Dict:
-    stats = {
+# Condiciones de activación de las alertas en vivo (ver reglas.py), en el orden de envío
+REGLAS_EN_VIVO = IndiceReglas([
+    ReglaAlerta('roja_rapida', EstrategiaAnalisis.alerta_roja_rapida, 0, 35,
+                banderas=('alerta_roja_enviada',), requiere_roja=True),
+    ReglaAlerta('rebote_post_roja', EstrategiaAnalisis.alerta_rebote_post_roja, 0, 70, max_diferencia_goles=1, requiere_roja=True,
+                banderas=('alerta_rebote_local_enviada', 'alerta_rebote_visita_enviada')),
+    ReglaAlerta('corners_tempranos', EstrategiaAnalisis.alerta_corners_tempranos, 0, 29, requiere_estadisticas=True,
+                banderas=('alerta_corners_tempranos_enviada',)),
+    ReglaAlerta('over15_abierto', EstrategiaAnalisis.alerta_over15_abierto, 25, 60, max_goles=1,
+                banderas=('alerta_over15_abierto_enviada',)),
+    ReglaAlerta('dominio_gol', EstrategiaAnalisis.alerta_dominio_gol, 50, 80, max_diferencia_goles=1,
+                banderas=('alerta_dominio_enviada',)),
+    ReglaAlerta('presion_sostenida', EstrategiaAnalisis.alerta_presion_sostenida, 35, 85, max_diferencia_goles=1,
+                banderas=('alerta_presion_sostenida_enviada',)),
+    ReglaAlerta('wave_ofensiva', EstrategiaAnalisis.alerta_wave_ofensiva, 25, 85, max_diferencia_goles=1,
+                banderas=('alerta_wave_local_enviada', 'alerta_wave_visita_enviada')),
+    ReglaAlerta('dominio_silencioso_local', lambda p: EstrategiaAnalisis.alerta_dominio_silencioso(p, lado='local'), 30, 88,
+                max_diferencia_goles=1, banderas=('alerta_dominio_silencioso_local_enviada',)),
+    ReglaAlerta('dominio_silencioso_visita', lambda p: EstrategiaAnalisis.alerta_dominio_silencioso(p, lado='visita'), 30, 88,
+                max_diferencia_goles=1, banderas=('alerta_dominio_silencioso_visita_enviada',)),
+    ReglaAlerta('dominio_posesion_ataques', EstrategiaAnalisis.alerta_dominio_con_posesion_y_ataques, 35, 80, max_diferencia_goles=1,
+                banderas=('alerta_dominio_pose_ataques_enviada',)),
+    ReglaAlerta('gol_tras_descanso', EstrategiaAnalisis.alerta_gol_tras_descanso, 40, 55, max_goles=1,
+                banderas=('alerta_descanso_enviada',)),
+    ReglaAlerta('over_corners_tramo_final', EstrategiaAnalisis.alerta_over_corners_tramo_final, 65, 85, requiere_estadisticas=True,
+                max_diferencia_goles=1, banderas=('alerta_over_corners_final_enviada',)),
+    ReglaAlerta('over_amarillas', EstrategiaAnalisis.alerta_over_amarillas_pro, 60, 88, max_diferencia_goles=1,
+                banderas=('alerta_over_amarillas_ext_enviada',)),
+    ReglaAlerta('friccion_presion_gol', EstrategiaAnalisis.alerta_friccion_mas_presion_gol, 60, 88, max_diferencia_goles=1,
+                banderas=('alerta_friccion_presion_gol_enviada',)),
+    ReglaAlerta('doble_roja', EstrategiaAnalisis.alerta_doble_roja, requiere_roja=True,
+                banderas=('alerta_doble_roja_local_enviada', 'alerta_doble_roja_visita_enviada',
+                          'alerta_doble_roja_ambos_enviada')),
+    ReglaAlerta('goleada_temprana', EstrategiaAnalisis.alerta_goleada_temprana, 0, 20,
+                banderas=('alerta_goleada_temprana_enviada',)),
+    ReglaAlerta('ritmo_lento_under', EstrategiaAnalisis.alerta_ritmo_lento_under, 20, 35, max_goles=0,
+                banderas=('alerta_ritmo_lento_enviada',)),
+    ReglaAlerta('remontada_potencial', EstrategiaAnalisis.alerta_remontada_potencial, 40, 75, max_diferencia_goles=1,
+                banderas=('alerta_remontada_enviada',)),
+    ReglaAlerta('gol_tardio', EstrategiaAnalisis.alerta_gol_tardio, 70, max_goles=1,
+                banderas=('alerta_gol_tardio_enviada',)),
+    ReglaAlerta('colapso_post_roja', EstrategiaAnalisis.alerta_colapso_defensivo_post_roja, 0, 75, requiere_roja=True,
+                banderas=('alerta_colapso_local_enviada', 'alerta_colapso_visita_enviada')),
+    ReglaAlerta('partido_roto', EstrategiaAnalisis.alerta_partido_roto, 60, max_diferencia_goles=1,
+                banderas=('alerta_partido_roto_enviada',)),
+    ReglaAlerta('over25_edge', EstrategiaAnalisis.alerta_over25_con_edge, 60, 85, max_goles=2,
+                banderas=('alerta_over25_edge_enviada',)),
+    # Una bandera por mercado: no se retira
+    ReglaAlerta('siguiente_gol_edge', EstrategiaAnalisis.alerta_siguiente_gol_con_edge, 25, 85, max_diferencia_goles=2),
+    ReglaAlerta('btts_edge', EstrategiaAnalisis.alerta_btts_con_edge, 30, 80,
+                banderas=('alerta_btts_edge_enviada',)),
+    ReglaAlerta('over_corners_edge', EstrategiaAnalisis.alerta_over_corners_con_edge, 60, 85, requiere_estadisticas=True,
+                banderas=('alerta_over_corners_edge_enviada',)),
+    ReglaAlerta('corners_ritmo_alto', EstrategiaAnalisis.alerta_corners_ritmo_alto, 15, 75, requiere_estadisticas=True,
+                banderas=('alerta_corners_ritmo_alto_enviada',)),
+    ReglaAlerta('corners_ritmo_bajo', EstrategiaAnalisis.alerta_corners_ritmo_bajo, 25, 75, requiere_estadisticas=True,
+                banderas=('alerta_corners_ritmo_bajo_enviada',)),
+    ReglaAlerta('corners_desequilibrio', EstrategiaAnalisis.alerta_corners_desequilibrio, 20, 80, requiere_estadisticas=True,
+                banderas=('alerta_corners_desequilibrio_local_enviada', 'alerta_corners_desequilibrio_visita_enviada')),
+    ReglaAlerta('corners_segundo_tiempo', EstrategiaAnalisis.alerta_corners_segundo_tiempo, 50, 70, requiere_estadisticas=True,
+                banderas=('alerta_corners_segundo_tiempo_enviada',)),
+    ReglaAlerta('corners_tramo_final_live', EstrategiaAnalisis.alerta_corners_tramo_final_live, 75, 88, requiere_estadisticas=True,
+                max_diferencia_goles=2,
+                banderas=tuple(f'alerta_corners_tramo_final_live_{n}_enviada' for n in (8, 9, 10, 11, 12))),
+])
+
+# ALERTA SCORING GOL: se calcula por lotes en _alertas_scoring_lote; aquí sólo su ventana y bandera
+REGLA_SCORING = ReglaAlerta('scoring_gol', None, 15, 85, banderas=('alerta_scoring_enviada',))
+
+# Cada partido se refresca con su propio intervalo (ver planificador.py), según las alertas que aún puede disparar
+PLANIFICADOR = PlanificadorPartidos(REGLAS_EN_VIVO, (REGLA_SCORING,))
+
+
+def _estadisticas_vacias() -> Dict:
+    return {
         'remates_totales': 0, 'tiros_puerta': 0, 'corners': 0,
         'posesion_local': 0, 'posesion_visita': 0, 'ataques_peligrosos': 0,
         'remates_local': 0, 'remates_visita': 0,
@@ -2045,141 +2355,140 @@ def _obtener_estadisticas_detalladas(partido_id: str) -> Dict:
         'xgot_local': 0.0, 'xgot_visita': 0.0,
         'tiene_estadisticas': False
     }
+
+
+def _obtener_estadisticas_detalladas(partido_id: str) -> Dict:
+    stats = _estadisticas_vacias()
     
     try:
         url = URL_ESTADISTICAS_BASE.format(partido_id)
-        resp = requests.get(url, headers=HEADERS, timeout=10)
-        if resp.status_code != 200:
-            return stats
+        resp = http_get(url, endpoint='estadisticas',
+                        headers=CACHE_ESTADISTICAS.cabeceras_condicionales(partido_id))
+        cuerpo = resp.text if resp.status_code == 200 else None
+        resultado = CACHE_ESTADISTICAS.resolver(partido_id, resp.status_code, resp.headers,
+                                                cuerpo, _parsear_estadisticas)
+        if resultado is not None:
+            stats = resultado
 
-        soup = BeautifulSoup(resp.text, "html.parser")
+    except Exception as e:
+        print(f"Error extrayendo estadísticas {partido_id}: {e}")
 
-        # Buscar todos los bloques de estadística
-        filas = soup.find_all("div", class_=re.compile(r"wcl-row_"))
+    return stats
 
-        for fila in filas:
-            # Nombre de la estadística
-            nombre_div = fila.find("div", class_=re.compile(r"wcl-category_"))
-            if not nombre_div:
-                continue
-            nombre = nombre_div.get_text(strip=True).lower()
 
-            # Valores local y visitante
-            valor_local_div = fila.find("div", class_=re.compile(r"wcl-homeValue_"))
-            valor_visita_div = fila.find("div", class_=re.compile(r"wcl-awayValue_"))
-            if not valor_local_div or not valor_visita_div:
-                continue
+def _parsear_estadisticas(html: str) -> Dict:
+    """Convierte la pestaña 'Estadísticas' de un partido en el dict de stats"""
+    stats = _estadisticas_vacias()
 
-            valor_local_text = valor_local_div.get_text(strip=True)
-            valor_visita_text = valor_visita_div.get_text(strip=True)
-
-            # Función para limpiar y convertir a número
-            def limpiar_valor(texto):
-                texto = texto.replace("%", "").split(" ")[0]  # Quitar % y texto extra
-                try:
-                    if "." in texto:
-                        return float(texto)
-                    else:
-                        return int(texto)
-                except:
-                    return 0
-
-            val_local = limpiar_valor(valor_local_text)
-            val_visita = limpiar_valor(valor_visita_text)
-
-            stats['tiene_estadisticas'] = True
-
-            # Mapear según nombre
-            if "remates totales" in nombre or "tiros totales" in nombre or "disparos" in nombre:
-                stats['remates_local'] = val_local
-                stats['remates_visita'] = val_visita
-                stats['remates_totales'] = val_local + val_visita
-            elif "remates a puerta" in nombre or "tiros a puerta" in nombre or "shot on target" in nombre:
-                stats['tiros_puerta_local'] = val_local
-                stats['tiros_puerta_visita'] = val_visita
-                stats['tiros_puerta'] = val_local + val_visita
-            elif "córneres" in nombre or "corners" in nombre:
-                stats['corners_local'] = val_local
-                stats['corners_visita'] = val_visita
-                stats['corners'] = val_local + val_visita
-            elif "posesión" in nombre or "possession" in nombre:
-                stats['posesion_local'] = val_local
-                stats['posesion_visita'] = val_visita
-            elif "grandes ocasiones" in nombre or "big chances" in nombre:
-                stats['grandes_ocasiones_local'] = val_local
-                stats['grandes_ocasiones_visita'] = val_visita
-            elif "faltas" in nombre:
-                stats['faltas_local'] = val_local
-                stats['faltas_visita'] = val_visita
-            elif "amarillas" in nombre or "yellow card" in nombre:
-                stats['amarillas_local'] = val_local
-                stats['amarillas_visita'] = val_visita
-            elif "xgot" in nombre or "xg a puerta" in nombre:
-                stats['xgot_local'] = val_local
-                stats['xgot_visita'] = val_visita
-
-    except Exception as e:
-        print(f"Error extrayendo estadísticas {partido_id}: {e}")
+    # Función para limpiar y convertir a número
+    def limpiar_valor(texto):
+        texto = texto.replace("%", "").split(" ")[0]  # Quitar % y texto extra
+        try:
+            if "." in texto:
+                return float(texto)
+            else:
+                return int(texto)
+        except:
+            return 0
+
+    # Filas (nombre, local, visita) con el backend de parser_html más rápido disponible
+    for nombre, valor_local_text, valor_visita_text in extraer_filas_estadisticas(html):
+        val_local = limpiar_valor(valor_local_text)
+        val_visita = limpiar_valor(valor_visita_text)
+
+        stats['tiene_estadisticas'] = True
+
+        # Mapear según nombre
+        if "remates totales" in nombre or "tiros totales" in nombre or "disparos" in nombre:
+            stats['remates_local'] = val_local
+            stats['remates_visita'] = val_visita
+            stats['remates_totales'] = val_local + val_visita
+        elif "remates a puerta" in nombre or "tiros a puerta" in nombre or "shot on target" in nombre:
+            stats['tiros_puerta_local'] = val_local
+            stats['tiros_puerta_visita'] = val_visita
+            stats['tiros_puerta'] = val_local + val_visita
+        elif "córneres" in nombre or "corners" in nombre:
+            stats['corners_local'] = val_local
+            stats['corners_visita'] = val_visita
+            stats['corners'] = val_local + val_visita
+        elif "posesión" in nombre or "possession" in nombre:
+            stats['posesion_local'] = val_local
+            stats['posesion_visita'] = val_visita
+        elif "grandes ocasiones" in nombre or "big chances" in nombre:
+            stats['grandes_ocasiones_local'] = val_local
+            stats['grandes_ocasiones_visita'] = val_visita
+        elif "faltas" in nombre:
+            stats['faltas_local'] = val_local
+            stats['faltas_visita'] = val_visita
+        elif "amarillas" in nombre or "yellow card" in nombre:
+            stats['amarillas_local'] = val_local
+            stats['amarillas_visita'] = val_visita
+        elif "xgot" in nombre or "xg a puerta" in nombre:
+            stats['xgot_local'] = val_local
+            stats['xgot_visita'] = val_visita
 
     return stats
 
 
+def _obtener_estadisticas_en_paralelo(partido_ids: List[str]) -> Dict[str, Dict]:
+    """
+    Descarga las estadísticas de todos los partidos en vivo de forma concurrente.
+    El tiempo del ciclo queda acotado por la petición más lenta y no por la suma.
+    """
+    resultados: Dict[str, Dict] = {}
+    if not partido_ids:
+        return resultados
+
+    workers = min(MAX_WORKERS_ESTADISTICAS, len(partido_ids))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="estadisticas") as executor:
+        futuros = {executor.submit(_obtener_estadisticas_detalladas, pid): pid for pid in partido_ids}
+        for futuro in as_completed(futuros):
+            partido_id = futuros[futuro]
+            try:
+                resultados[partido_id] = futuro.result()
+            except Exception as e:
+                print(f"Error extrayendo estadísticas {partido_id}: {e}")
+                resultados[partido_id] = _estadisticas_vacias()
+
+    return resultados
+
+
+# Tablas de posiciones compartidas por todos los partidos de una liga, también entre reinicios
+_cache_clasificaciones: Optional[CacheClasificaciones] = None
+
+
+def obtener_cache_clasificaciones() -> CacheClasificaciones:
+    global _cache_clasificaciones
+    if _cache_clasificaciones is None:
+        with _CACHES_LOCK:
+            if _cache_clasificaciones is None:
+                _cache_clasificaciones = CacheClasificaciones(normalizar=_normalizar_nombre_equipo)
+    return _cache_clasificaciones
+
+
+def _clasificacion_para_partido(partido: 'Partido') -> List[Dict]:
+    """Tabla de posiciones del partido: desde la caché si ya se tiene la de su liga, si no se descarga"""
+    tabla = obtener_cache_clasificaciones().buscar(partido.equipo_local, partido.equipo_visita)
+    if tabla is not None:
+        print(f"📦 Clasificación desde caché para: {partido.equipos}")
+        return tabla
+
+    tabla = _obtener_clasificacion_liga(partido.id)
+    obtener_cache_clasificaciones().guardar(partido.liga, tabla)
+    return tabla
+
+
 def _obtener_clasificacion_liga(partido_id: str) -> List[Dict]:
     """Lee la pestaña 'Clasificación' del partido"""
-    url = f"https://m.flashscore.cl/detalle-del-partido/{partido_id}/?s=2&t=clasificacion"
+    url = URL_CLASIFICACION_BASE.format(partido_id)
     clasificacion = []
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=10)
+        resp = http_get(url, endpoint='clasificacion')
         if resp.status_code != 200:
             print(f"⚠️ No se pudo acceder a CLASIFICACIÓN ({resp.status_code}) para {partido_id}")
             return clasificacion
 
-        soup = BeautifulSoup(resp.text, "html.parser")
-
-        tabla = soup.find("table")
-        if not tabla:
-            print(f"⚠️ No se encontró tabla de clasificación para {partido_id}")
-            return clasificacion
-
-        filas = tabla.find_all("tr")
-        for fila in filas[1:]:
-            celdas = [c.get_text(strip=True) for c in fila.find_all("td")]
-            if len(celdas) < 7:
-                continue
-            try:
-                pos_str = celdas[0].split(".")[0]
-                pos = int(pos_str)
-                equipo = celdas[1]
-                pj = int(celdas[2])
-                g = int(celdas[3])
-                e = int(celdas[4])
-                p = int(celdas[5])
-
-                gf_gc = celdas[6]
-                if ":" in gf_gc:
-                    gf, gc = gf_gc.split(":")
-                    gf = int(gf)
-                    gc = int(gc)
-                else:
-                    gf, gc = 0, 0
-
-                pts = int(celdas[7]) if len(celdas) > 7 else 0
-                dg = gf - gc
-
-                clasificacion.append({
-                    "pos": pos,
-                    "equipo": equipo,
-                    "pj": pj,
-                    "g": g,
-                    "e": e,
-                    "p": p,
-                    "gf": gf,
-                    "gc": gc,
-                    "dg": dg,
-                    "pts": pts,
-                })
-            except Exception:
-                continue
+        clasificacion = _parsear_clasificacion(resp.text, partido_id)
 
     except Exception as e:
         print(f"Error extrayendo CLASIFICACIÓN {partido_id}: {e}")
@@ -2187,72 +2496,72 @@ def _obtener_clasificacion_liga(partido_id: str) -> List[Dict]:
     return clasificacion
 
 
-def _extraer_info_basica(html_partido: str) -> Optional[Dict]:
-    try:
-        partido_id = re.search(r'href="/detalle-del-partido/([a-zA-Z0-9]{8})/\?s=2"', html_partido).group(1)
-        minuto_str_match = re.search(r'<span class="live">([^<]+)</span>', html_partido)
-        if not minuto_str_match:
-            return None
-        minuto_str = minuto_str_match.group(1).replace("'", "").replace("+", "").strip()
-        if minuto_str.lower().startswith("descanso"):
-            minuto = 45
-        elif minuto_str.isdigit():
-            minuto = int(minuto_str)
-        else:
-            return None
+def _parsear_clasificacion(html: str, partido_id: str) -> List[Dict]:
+    """Extrae la tabla de posiciones de la pestaña 'Clasificación'"""
+    from bs4 import BeautifulSoup
+    clasificacion = []
+    soup = BeautifulSoup(html, "html.parser")
+
+    tabla = soup.find("table")
+    if not tabla:
+        print(f"⚠️ No se encontró tabla de clasificación para {partido_id}")
+        return clasificacion
+
+    filas = tabla.find_all("tr")
+    for fila in filas[1:]:
+        celdas = [c.get_text(strip=True) for c in fila.find_all("td")]
+        if len(celdas) < 7:
+            continue
+        try:
+            pos_str = celdas[0].split(".")[0]
+            pos = int(pos_str)
+            equipo = celdas[1]
+            pj = int(celdas[2])
+            g = int(celdas[3])
+            e = int(celdas[4])
+            p = int(celdas[5])
+
+            gf_gc = celdas[6]
+            if ":" in gf_gc:
+                gf, gc = gf_gc.split(":")
+                gf = int(gf)
+                gc = int(gc)
+            else:
+                gf, gc = 0, 0
+
+            pts = int(celdas[7]) if len(celdas) > 7 else 0
+            dg = gf - gc
+
+            clasificacion.append({
+                "pos": pos,
+                "equipo": equipo,
+                "pj": pj,
+                "g": g,
+                "e": e,
+                "p": p,
+                "gf": gf,
+                "gc": gc,
+                "dg": dg,
+                "pts": pts,
+            })
+        except Exception:
+            continue
 
-        marcador_match = re.search(r'>([^<>]+)\s*-\s*([^<>]+)\s*<a class="live" href="[^"]+">(\d+):(\d+)</a>', html_partido, re.DOTALL)
-        if not marcador_match:
-            return None
+    return clasificacion
 
-        equipo_local = marcador_match.group(1).strip()
-        equipo_visita = marcador_match.group(2).strip()
-        goles_local = int(marcador_match.group(3))
-        goles_visita = int(marcador_match.group(4))
 
-        tarjetas = re.findall(r'class="rcard-(\d+)"', html_partido)
-        tarjetas_local = 0
-        tarjetas_visita = 0
-        if len(tarjetas) == 2:
-            tarjetas_local = int(tarjetas[0])
-            tarjetas_visita = int(tarjetas[1])
-        elif len(tarjetas) == 1:
-            tarjetas_local = int(tarjetas[0])
-            tarjetas_visita = 0
-        elif len(tarjetas) > 2:
-            try:
-                tarjetas_local = sum(int(t) for t in tarjetas[::2])
-                tarjetas_visita = sum(int(t) for t in tarjetas[1::2])
-            except ValueError:
-                tarjetas_local = 0
-                tarjetas_visita = 0
-
-        print(f"DEBUG: Tarjetas rojas extraídas: local={tarjetas_local}, visita={tarjetas_visita}")
-        
-        tiene_estadisticas = 't=estadisticas' in html_partido
-        tiene_apuestas = 't=apuestas' in html_partido or 't=betting' in html_partido
-        # ✅ NUEVO: Intentar extraer el nombre de la liga
-        liga = 'Desconocida'
-        liga_match = re.search(r'class="[^"]*league[^"]*">([^<]+)</[^>]+>', html_partido, re.IGNORECASE)
-        if liga_match:
-            liga = liga_match.group(1).strip()
-        
-        
-        return {
-            'partido_id': partido_id, 
-            'equipo_local': equipo_local, 
-            'equipo_visita': equipo_visita,
-            'minuto': minuto, 
-            'goles_local': goles_local, 
-            'goles_visita': goles_visita,
-            'rojas_local': tarjetas_local, 
-            'rojas_visita': tarjetas_visita, 
-            'liga': liga,
-            'tiene_estadisticas': tiene_estadisticas,
-            'tiene_apuestas': tiene_apuestas
-        }
-    except Exception:
-        return None
+def _extraer_partidos_en_vivo(contenido: Union[bytes, str]) -> Optional[List[Dict]]:
+    """
+    Extrae la información básica de cada partido en vivo de la portada de livescore.
+    Devuelve None si la página no trae el contenedor 'score-data'.
+    """
+    # Un solo barrido sobre los bytes de 'score-data' (ver parser_html.extraer_partidos_livescore)
+    return extraer_partidos_livescore(contenido)
+
+
+def _extraer_portada(contenido: Union[bytes, str]) -> Optional[Tuple[List[Dict], List[Dict]]]:
+    """Partidos en vivo y programados de la portada, en el mismo barrido"""
+    return extraer_portada_livescore(contenido)
 
 
 def _formatear_estadisticas_detalladas(stats: EstadisticasPartido) -> str:
@@ -2276,17 +2585,27 @@ def _formatear_estadisticas_detalladas(stats: EstadisticasPartido) -> str:
     return " | ".join(partes) if partes else "Sin stats detalladas"
 
 
-def enviar_alerta_telegram(mensaje: str):
+def _credenciales_telegram() -> Optional[Tuple[str, str]]:
+    """Devuelve (token, chat_id) o None si no están configurados"""
     # Permite configurar las credenciales por variables de entorno
     token = os.getenv('TELEGRAM_BOT_TOKEN', idBot)
     chat_id = os.getenv('TELEGRAM_CHAT_ID', idGrupo)
 
     if not token or 'TU_TOKEN_DE_BOT' in token or not chat_id or 'TU_ID_DE_GRUPO_O_USUARIO' in str(chat_id):
+        return None
+    return token, chat_id
+
+
+def enviar_alerta_telegram(mensaje: str):
+    credenciales = _credenciales_telegram()
+    if not credenciales:
         print("ERROR: Configura 'TELEGRAM_BOT_TOKEN' y 'TELEGRAM_CHAT_ID' (o ajusta idBot/idGrupo) con tus credenciales de Telegram.")
         return
+    token, chat_id = credenciales
     try:
-        requests.post(
-            f'https://api.telegram.org/bot{token}/sendMessage',
+        http_post(
+            URL_TELEGRAM.format(token),
+            endpoint='telegram',
             data={'chat_id': chat_id, 'text': mensaje}
         )
     except Exception as e:
@@ -2295,241 +2614,305 @@ def enviar_alerta_telegram(mensaje: str):
 
 # --- Motor principal ---
 
-def main_mejorado(data_logger: ImprovedDataLogger, scoring_engine: ScoringEngine):
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Ejecutando verificación...")
+def _enviar_alertas_prematch(partido: Partido, enviar: Optional[Callable[[str], None]] = None):
+    enviar = enviar or enviar_alerta_telegram
+    for alerta_func in (
+        EstrategiaAnalisis.alerta_resumen_prematch,
+        EstrategiaAnalisis.alerta_dominio_prematch,
+        EstrategiaAnalisis.alerta_brecha_clasificacion,
+    ):
+        msg = alerta_func(partido)
+        if msg:
+            enviar(msg)
+
+
+def _actualizar_partido(info_basica: Dict, stats_detalle: Dict,
+                        data_logger: ImprovedDataLogger, enviar: Callable[[str], None]) -> 'Partido':
+    """Actualiza un partido en vivo con sus estadísticas y lo registra; las alertas van después"""
+    partido_id = info_basica['partido_id']
+    equipos = f"{info_basica['equipo_local']} - {info_basica['equipo_visita']}"
+    liga = info_basica.get('liga', 'Desconocida')
+
+    # Iniciar seguimiento si no existe
+    if partido_id not in PARTIDOS_EN_SEGUIMIENTO:
+        partido = iniciar_seguimiento_partido(partido_id, equipos, liga, info_basica)
+        
+        nueva_stats = EstadisticasPartido(
+            minuto=0, g_local=0, g_visita=0, rojas_local=0, rojas_visita=0
+        )
+        partido.actualizar_stats(nueva_stats)
+        _enviar_alertas_prematch(partido, enviar)
+
+    partido = PARTIDOS_EN_SEGUIMIENTO[partido_id]
+
+    tiene_estadisticas = stats_detalle.pop('tiene_estadisticas', False)
+
+    stats_actual = EstadisticasPartido(
+        minuto=info_basica['minuto'],
+        g_local=info_basica['goles_local'],
+        g_visita=info_basica['goles_visita'],
+        rojas_local=info_basica['rojas_local'],
+        rojas_visita=info_basica['rojas_visita'],
+        **stats_detalle
+    )
+
+    # ACTUALIZACIÓN CRÍTICA:
+    # Solo marcamos que tiene estadísticas si el scraper detallado encontró datos.
+    partido.tiene_estadisticas = tiene_estadisticas
+
+    partido.actualizar_stats(stats_actual)
+    
+    partido.tiene_apuestas = info_basica.get('tiene_apuestas', False)
+
+    # Mostrar info extra
+    info_extra = []
+    if partido.tiene_estadisticas:
+        info_extra.append("📊 Estadísticas disponibles")
+    if partido.tiene_apuestas:
+        info_extra.append("🎲 Apuestas disponibles")
+    
+    if info_extra:
+        mensaje_info = f"⚽ Partido en vivo: {partido.equipos} | " + " | ".join(info_extra) + f"\n🔗 {URL_ESTADISTICAS_BASE.format(partido.id)}"
+        print(mensaje_info)
+        if not getattr(partido, 'alerta_info_extra_enviada', False):
+            partido.alerta_info_extra_enviada = True
+
+    # Logging
+    snap_dict = construir_snapshot(stats_actual)
 
     try:
-        response = requests.get(URL_LIVESCORE, headers=HEADERS, timeout=10)
-        soup_dos = BeautifulSoup(response.text, 'html.parser')
-        
-        # Buscamos el contenedor principal
-        score_data = soup_dos.find(id='score-data')
-        if not score_data:
-            print("No se encontró el contenedor de partidos 'score-data'.")
-            return
+        integrar_logger_en_main(data_logger, partido_id, stats_actual.minuto, {
+            **snap_dict,
+            'league': partido.liga,
+            'home_team': getattr(partido, 'equipo_local', 'Home'),
+            'away_team': getattr(partido, 'equipo_visita', 'Away'),
+        })
+    except Exception as e:
+        print(f"Error en logging para {partido_id}: {e}")
 
-        # --- MEJORA CRÍTICA: Extraer partidos por bloques de liga ---
-        # En lugar de split("<​br/>"), buscamos cada bloque que contiene un ID de partido
-        # Los partidos suelen estar dentro de etiquetas <a> o seguidos de spans con clase 'live'
-        
-        # Buscamos todos los fragmentos de HTML que contienen un enlace a un partido
-        # Usamos una expresión regular para encontrar los IDs de 8 caracteres
-        html_str = str(score_data)
-        
-        # Dividimos el HTML por la etiqueta de cierre de cada bloque de partido 
-        # o por patrones comunes de separación en la versión móvil
-        bloques_partidos = re.split(r'<br\s*/?>', html_str)
-        
-        partidos_activos = 0
+    return partido
 
-        for x in bloques_partidos:
-            # Si el bloque no tiene un ID de partido, lo saltamos
-            if 'detalle-del-partido' not in x:
-                continue
-                
-            info_basica = _extraer_info_basica(x)
-            
-            # Si no pudimos extraer info o el minuto es 0 (no ha empezado), saltar
-            if not info_basica:
-                continue
 
-            partidos_activos += 1
-            partido_id = info_basica['partido_id']
-            equipos = f"{info_basica['equipo_local']} - {info_basica['equipo_visita']}"
-            liga = info_basica.get('liga', 'Desconocida')
-
-            # Iniciar seguimiento si no existe
-            if partido_id not in PARTIDOS_EN_SEGUIMIENTO:
-                partido = iniciar_seguimiento_partido(partido_id, equipos, liga, info_basica)
-                
-                nueva_stats = EstadisticasPartido(
-                    minuto=0, g_local=0, g_visita=0, rojas_local=0, rojas_visita=0
-                )
-                partido.actualizar_stats(nueva_stats)
-                
-                msg = EstrategiaAnalisis.alerta_resumen_prematch(partido)
-                if msg:
-                    enviar_alerta_telegram(msg)
-                
-                msg = EstrategiaAnalisis.alerta_dominio_prematch(partido)
-                if msg:
-                    enviar_alerta_telegram(msg)
-                
-                msg = EstrategiaAnalisis.alerta_brecha_clasificacion(partido)
-                if msg:
-                    enviar_alerta_telegram(msg)
-
-            partido = PARTIDOS_EN_SEGUIMIENTO[partido_id]
-
-            # Obtener estadísticas detalladas
-            stats_detalle = _obtener_estadisticas_detalladas(partido_id)
-            tiene_estadisticas = stats_detalle.pop('tiene_estadisticas', False)
-
-            stats_actual = EstadisticasPartido(
-                minuto=info_basica['minuto'],
-                g_local=info_basica['goles_local'],
-                g_visita=info_basica['goles_visita'],
-                rojas_local=info_basica['rojas_local'],
-                rojas_visita=info_basica['rojas_visita'],
-                **stats_detalle
-            )
+def _alertas_scoring_lote(partidos: List['Partido'], scoring_engine: ScoringEngine) -> Dict[str, str]:
+    """
+    ALERTA SCORING GOL de todos los partidos en una pasada vectorizada: xG del lote,
+    urgencia por marcador y minuto y probabilidad de gol en 10'. Devuelve {partido_id: mensaje}
+    sólo de los que se disparan.
+    """
+    import numpy as np  # sólo al evaluar; no entra en el arranque del bot
+
+    lote = MatchBatch.from_partido_data(
+        [p.id for p in partidos], [construir_snapshot(p.estadisticas_actuales) for p in partidos]
+    )
+    analisis = scoring_engine.analyze_batch(lote)
+    xg_home, xg_away = analisis['home_xg'], analisis['away_xg']
+    minuto, goles_local, goles_visita = lote.minute, lote.score_home, lote.score_away
+
+    urgencia_home = np.where(goles_local < goles_visita, 1.3, np.where(goles_visita < goles_local, 0.9, 1.0))
+    urgencia_away = np.where(goles_local < goles_visita, 0.9, np.where(goles_visita < goles_local, 1.3, 1.0))
+    tramo_final = (90 - minuto) <= 10
+    urgencia_home = np.where(tramo_final, urgencia_home * 1.2, urgencia_home)
+    urgencia_away = np.where(tramo_final, urgencia_away * 1.2, urgencia_away)
+
+    factor_10min = 0.15
+    p_goal_10 = np.clip((xg_home * urgencia_home + xg_away * urgencia_away) * factor_10min, 0.05, 0.95)
+    p_home_goal_10 = np.clip(xg_home * urgencia_home * factor_10min, 0.03, 0.80)
+    p_away_goal_10 = np.clip(xg_away * urgencia_away * factor_10min, 0.03, 0.80)
+
+    enviada = np.array([p.alerta_scoring_enviada for p in partidos], dtype=bool)
+    dispara = (p_goal_10 >= 0.35) & (minuto >= REGLA_SCORING.desde) & (minuto <= REGLA_SCORING.hasta) & ~enviada
+
+    avisos = {
+        'home_low_quality': "\n⚠️ ADVERTENCIA: LOCAL con 0 grandes ocasiones (remates de baja calidad)",
+        'away_low_quality': "\n⚠️ ADVERTENCIA: VISITA con 0 grandes ocasiones (remates de baja calidad)",
+        'both_low_quality': "\n⚠️ ADVERTENCIA: Ambos equipos con 0 grandes ocasiones (remates de baja calidad)",
+    }
+    mensajes = {}
+    for i in np.flatnonzero(dispara):
+        partido = partidos[i]
+        s = partido.estadisticas_actuales
+        partido.alerta_scoring_enviada = True
+        warning_text = avisos.get(analisis['quality_warning'][i], "")
+        mensajes[partido.id] = (
+            f"⚽🤖 ALERTA SCORING GOL {s.minuto}\'\n"
+            f"{partido.equipos} ({s.goles_local}-{s.goles_visita})\n"
+            f"Probabilidad gol próximos 10 min: {p_goal_10[i]:.1%}\n"
+            f"P(Local): {p_home_goal_10[i]:.1%} | P(Visita): {p_away_goal_10[i]:.1%}\n"
+            f"{warning_text}\n"
+            f"🔗 {URL_ESTADISTICAS_BASE.format(partido.id)}"
+        )
+    return mensajes
+
+
+def _evaluar_partidos(partidos: List['Partido'], scoring_engine: ScoringEngine,
+                      enviar: Optional[Callable[[str], None]] = None):
+    """
+    Evalúa las alertas en vivo de todos los partidos recién actualizados en una sola
+    pasada: el scoring y las condiciones de la tabla de reglas se calculan como columnas
+    para todo el lote, y sólo se llama a las reglas que pueden dispararse.
+    """
+    enviar = enviar or enviar_alerta_telegram
+    # Un partido repetido en la portada se evalúa una vez, con su último snapshot
+    partidos = list({p.id: p for p in partidos if p.estadisticas_actuales is not None}.values())
+    if not partidos:
+        return
 
-            # ACTUALIZACIÓN CRÍTICA:
-            # Solo marcamos que tiene estadísticas si el scraper detallado encontró datos.
-            partido.tiene_estadisticas = tiene_estadisticas
+    try:
+        scoring = _alertas_scoring_lote(partidos, scoring_engine)
+    except Exception as e:
+        print(f"Error en scoring por lotes: {e}")
+        scoring = {}
 
-            partido.actualizar_stats(stats_actual)
-            
-            partido.tiene_apuestas = info_basica.get('tiene_apuestas', False)
-
-            # Mostrar info extra
-            info_extra = []
-            if partido.tiene_estadisticas:
-                info_extra.append("📊 Estadísticas disponibles")
-            if partido.tiene_apuestas:
-                info_extra.append("🎲 Apuestas disponibles")
-            
-            if info_extra:
-                mensaje_info = f"⚽ Partido en vivo: {partido.equipos} | " + " | ".join(info_extra) + f"\n🔗 {URL_ESTADISTICAS_BASE.format(partido.id)}"
-                print(mensaje_info)
-                if not getattr(partido, 'alerta_info_extra_enviada', False):
-                    partido.alerta_info_extra_enviada = True
+    # Alertas en vivo: sólo los pares (partido, regla) que aún pueden dispararse en este minuto y marcador
+    por_partido: Dict[str, List[str]] = {}
+    for partido, msg in REGLAS_EN_VIVO.evaluar_lote(partidos):
+        por_partido.setdefault(partido.id, []).append(msg)
 
-            # Integración scoring + logging
-            snap_dict = construir_snapshot(stats_actual)
+    for partido in partidos:
+        if partido.id in scoring:
+            enviar(scoring[partido.id])
+        for msg in por_partido.get(partido.id, ()):
+            enviar(msg)
 
-            try:
-                integrar_logger_en_main(data_logger, partido_id, stats_actual.minuto, snap_dict)
-            except Exception as e:
-                print(f"Error en logging para {partido_id}: {e}")
+        # Log en consola
+        s = partido.estadisticas_actuales
+        stats_detalladas_str = _formatear_estadisticas_detalladas(s) if partido.tiene_estadisticas else "Sin datos"
+        print(
+            f"|{s.minuto}\'| {partido.equipos} ({s.goles_local}-{s.goles_visita}) "
+            f"| {stats_detalladas_str} | ID: {partido.id}"
+        )
 
-            # Scoring
-            try:
-                resultado = integrar_scoring_en_partido(scoring_engine, snap_dict)
-                
-                xg_home = resultado.get('xg_home', 0.3)
-                xg_away = resultado.get('xg_away', 0.3)
-                quality_warning = resultado.get('quality_warning', None)
-                
-                minutos_restantes = 90 - stats_actual.minuto
-                
-                if stats_actual.goles_local < stats_actual.goles_visita:
-                    urgencia_home = 1.3
-                    urgencia_away = 0.9
-                elif stats_actual.goles_visita < stats_actual.goles_local:
-                    urgencia_home = 0.9
-                    urgencia_away = 1.3
-                else:
-                    urgencia_home = 1.0
-                    urgencia_away = 1.0
-                
-                if minutos_restantes <= 10:
-                    urgencia_home *= 1.2
-                    urgencia_away *= 1.2
-                
-                factor_10min = 0.15
-                
-                probs = {
-                    'p_goal_10': max(0.05, min(0.95, (xg_home * urgencia_home + xg_away * urgencia_away) * factor_10min)),
-                    'p_home_goal_10': max(0.03, min(0.80, xg_home * urgencia_home * factor_10min)),
-                    'p_away_goal_10': max(0.03, min(0.80, xg_away * urgencia_away * factor_10min))
-                }
 
-                if probs['p_goal_10'] >= 0.35 and 15 <= stats_actual.minuto <= 85:
-                    if not partido.alerta_scoring_enviada:
-                        partido.alerta_scoring_enviada = True
-                        
-                        warning_text = ""
-                        if quality_warning == 'home_low_quality':
-                            warning_text = "\n⚠️ ADVERTENCIA: LOCAL con 0 grandes ocasiones (remates de baja calidad)"
-                        elif quality_warning == 'away_low_quality':
-                            warning_text = "\n⚠️ ADVERTENCIA: VISITA con 0 grandes ocasiones (remates de baja calidad)"
-                        elif quality_warning == 'both_low_quality':
-                            warning_text = "\n⚠️ ADVERTENCIA: Ambos equipos con 0 grandes ocasiones (remates de baja calidad)"
-                        
-                        alerta_scoring = (
-                            f"⚽🤖 ALERTA SCORING GOL {stats_actual.minuto}\'\n"
-                            f"{equipos} ({stats_actual.goles_local}-{stats_actual.goles_visita})\n"
-                            f"Probabilidad gol próximos 10 min: {probs['p_goal_10']:.1%}\n"
-                            f"P(Local): {probs['p_home_goal_10']:.1%} | P(Visita): {probs['p_away_goal_10']:.1%}\n"
-                            f"{warning_text}\n"
-                            f"🔗 {URL_ESTADISTICAS_BASE.format(partido_id)}"
-                        )
-                        enviar_alerta_telegram(alerta_scoring)
-            except Exception as e:
-                print(f"Error en scoring para {partido_id}: {e}")
-
-            # Todas las alertas
-            for alerta_func in [
-                EstrategiaAnalisis.alerta_roja_rapida,
-                EstrategiaAnalisis.alerta_rebote_post_roja,
-                EstrategiaAnalisis.alerta_corners_tempranos,
-                EstrategiaAnalisis.alerta_over15_abierto,
-                EstrategiaAnalisis.alerta_dominio_gol,
-                EstrategiaAnalisis.alerta_presion_sostenida,
-                EstrategiaAnalisis.alerta_wave_ofensiva,
-                lambda p: EstrategiaAnalisis.alerta_dominio_silencioso(p, lado='local'),
-                lambda p: EstrategiaAnalisis.alerta_dominio_silencioso(p, lado='visita'),
-                EstrategiaAnalisis.alerta_dominio_con_posesion_y_ataques,
-                EstrategiaAnalisis.alerta_gol_tras_descanso,
-                EstrategiaAnalisis.alerta_over_corners_tramo_final,
-                EstrategiaAnalisis.alerta_over_amarillas_pro,
-                EstrategiaAnalisis.alerta_friccion_mas_presion_gol,
-                EstrategiaAnalisis.alerta_doble_roja,
-                EstrategiaAnalisis.alerta_goleada_temprana,
-                EstrategiaAnalisis.alerta_ritmo_lento_under,
-                EstrategiaAnalisis.alerta_remontada_potencial,
-                EstrategiaAnalisis.alerta_gol_tardio,
-                EstrategiaAnalisis.alerta_colapso_defensivo_post_roja,
-                EstrategiaAnalisis.alerta_partido_roto,
-                EstrategiaAnalisis.alerta_over25_con_edge,
-                EstrategiaAnalisis.alerta_siguiente_gol_con_edge,
-                EstrategiaAnalisis.alerta_btts_con_edge,
-                EstrategiaAnalisis.alerta_over_corners_con_edge,
-                EstrategiaAnalisis.alerta_corners_ritmo_alto,
-                EstrategiaAnalisis.alerta_corners_ritmo_bajo,
-                EstrategiaAnalisis.alerta_corners_desequilibrio,
-                EstrategiaAnalisis.alerta_corners_segundo_tiempo,
-                EstrategiaAnalisis.alerta_corners_tramo_final_live,
-            ]:
-                msg = alerta_func(partido)
-                if msg:
-                    enviar_alerta_telegram(msg)
-
-            # Log en consola
-            stats_detalladas_str = _formatear_estadisticas_detalladas(stats_actual) if tiene_estadisticas else "Sin datos"
+def _registrar_final(partido: 'Partido'):
+    """Suma los totales del partido terminado a las estadísticas de su liga"""
+    s = partido.estadisticas_actuales
+    if s is None or s.minuto < MINUTO_MINIMO_FINAL or not partido.liga or partido.liga == 'Desconocida':
+        return
+    totales = {'goles': s.goles_local + s.goles_visita}
+    if partido.tiene_estadisticas:
+        totales['corners'] = s.corners
+        totales['tarjetas'] = s.amarillas_local + s.amarillas_visita + s.tarjetas_rojas_totales
+    obtener_estadisticas_ligas().registrar(partido.id, partido.liga, totales)
+
+
+def _limpiar_partidos_finalizados(en_vivo: Optional[set] = None):
+    """
+    Deja de seguir los partidos terminados: los que superaron el minuto 95 y, si se pasa
+    la portada actual, los que faltan de ella varias lecturas seguidas. Los que llegaron
+    al final alimentan las estadísticas de su liga.
+    """
+    partidos_a_eliminar = []
+    for id_p, p in PARTIDOS_EN_SEGUIMIENTO.items():
+        if p.estadisticas_actuales and p.estadisticas_actuales.minuto > 95:
+            partidos_a_eliminar.append(id_p)
+        elif en_vivo is not None:
+            if id_p in en_vivo:
+                _AUSENCIAS.pop(id_p, None)
+                continue
+            _AUSENCIAS[id_p] = _AUSENCIAS.get(id_p, 0) + 1
+            if _AUSENCIAS[id_p] >= AUSENCIAS_PARA_FINALIZAR:
+                partidos_a_eliminar.append(id_p)
+    for id_p in partidos_a_eliminar:
+        _registrar_final(PARTIDOS_EN_SEGUIMIENTO.pop(id_p))
+        _AUSENCIAS.pop(id_p, None)
+        CACHE_ESTADISTICAS.descartar(id_p)
+        PLANIFICADOR.descartar(id_p)
+
+
+def _sembrar_estadisticas_ligas(data_logger: ImprovedDataLogger):
+    """La primera vez, llena las estadísticas de ligas con los partidos ya guardados por el logger"""
+    if not obtener_estadisticas_ligas().vacia():
+        return
+    for fila in data_logger.get_final_totals(MINUTO_MINIMO_FINAL):
+        # Mismo criterio que _registrar_final: sin liga no cuenta, sin estadísticas sólo los goles
+        if fila['league'] == 'Desconocida':
+            continue
+        totales = {'goles': fila['goals']}
+        if fila['has_stats']:
+            totales['corners'] = fila['corners']
+            totales['tarjetas'] = fila['cards']
+        obtener_estadisticas_ligas().registrar(fila['match_id'], fila['league'], totales)
+    print(f"✅ Estadísticas por liga cargadas: {obtener_estadisticas_ligas().ligas()} ligas")
+
+
+def _olvidar_partidos_fuera_de_vivo(en_vivo: set):
+    """Libera la caché y los vencimientos de partidos que ya no aparecen en la portada"""
+    for id_p in CACHE_ESTADISTICAS.claves():
+        if id_p not in en_vivo:
+            CACHE_ESTADISTICAS.descartar(id_p)
+    PLANIFICADOR.retener(en_vivo)
 
-            print(
-                f"|{stats_actual.minuto}\'| {equipos} ({stats_actual.goles_local}-{stats_actual.goles_visita}) "
-                f"| {stats_detalladas_str} | ID: {partido_id}"
-            )
 
-        print(f'Partidos en vivo procesados: {partidos_activos}')
+def main_mejorado(data_logger: ImprovedDataLogger, scoring_engine: ScoringEngine):
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Ejecutando verificación...")
 
-        # Limpieza de partidos finalizados
-        partidos_a_eliminar = [id_p for id_p, p in PARTIDOS_EN_SEGUIMIENTO.items()
-                               if p.estadisticas_actuales and p.estadisticas_actuales.minuto > 95]
-        for id_p in partidos_a_eliminar:
-            del PARTIDOS_EN_SEGUIMIENTO[id_p]
+    try:
+        response = http_get(URL_LIVESCORE, endpoint='livescore')
+        portada = _extraer_portada(response.content)
+        if portada is None:
+            print("No se encontró el contenedor de partidos 'score-data'.")
+            return
+        partidos_en_vivo, programados = portada
+
+        # Los que empiezan pronto se enriquecen en segundo plano
+        PRECARGA.programar(programados)
+        PRECARGA.retener({info['partido_id'] for info in partidos_en_vivo + programados})
+
+        # Goles y rojas vistos en la portada adelantan el refresco del partido
+        for info_basica in partidos_en_vivo:
+            PLANIFICADOR.observar(info_basica)
+
+        # Sólo se descargan los partidos vencidos, dentro del presupuesto de peticiones
+        debidos = set(PLANIFICADOR.pendientes())
+        stats_por_partido = _obtener_estadisticas_en_paralelo(
+            [info['partido_id'] for info in partidos_en_vivo if info['partido_id'] in debidos]
+        )
+
+        # Primero se actualizan todos los partidos refrescados; luego se evalúan juntos
+        actualizados = []
+        for info_basica in partidos_en_vivo:
+            partido_id = info_basica['partido_id']
+            if partido_id not in debidos:
+                continue
+            try:
+                stats_detalle = stats_por_partido.get(partido_id) or _estadisticas_vacias()
+                actualizados.append(_actualizar_partido(info_basica, stats_detalle, data_logger,
+                                                        enviar_alerta_telegram))
+            finally:
+                if partido_id in PARTIDOS_EN_SEGUIMIENTO:
+                    PLANIFICADOR.reprogramar(PARTIDOS_EN_SEGUIMIENTO[partido_id])
+        _evaluar_partidos(actualizados, scoring_engine)
+
+        print(f'Partidos en vivo: {len(partidos_en_vivo)} | refrescados: {len(debidos)} | '
+              f'{PLANIFICADOR.resumen()} | {PRECARGA.resumen()} | {data_logger.summary()}')
+
+        en_vivo = {info['partido_id'] for info in partidos_en_vivo}
+        _limpiar_partidos_finalizados(en_vivo)
+        _olvidar_partidos_fuera_de_vivo(en_vivo)
+        seguidos = set(PARTIDOS_EN_SEGUIMIENTO)
+        data_logger.retain_matches(seguidos)
+        scoring_engine.retain_matches(seguidos)
 
     except Exception as e:
         print(f"Error general en main: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Una sola transacción por ciclo para todo lo registrado (la escribe el hilo del logger)
+        data_logger.end_cycle()
 
 
 def run_bot_mejorado():
     print("Iniciando Bot de Análisis de Flashscore...")
 
     data_logger = ImprovedDataLogger()
-    scoring_engine = ScoringEngine()
+    scoring_engine = MOTOR_SCORING
 
     print("✅ Sistema de scoring inicializado")
     print("✅ Logger de datos históricos inicializado")
+    _sembrar_estadisticas_ligas(data_logger)
 
-    token = os.getenv('TELEGRAM_BOT_TOKEN', idBot)
-    chat = os.getenv('TELEGRAM_CHAT_ID', idGrupo)
-    if not token or 'TU_TOKEN_DE_BOT' in token or not chat or 'TU_ID_DE_GRUPO_O_USUARIO' in str(chat):
+    if not _credenciales_telegram():
         print("\n=======================================================")
         print("CONFIGURA: 'TELEGRAM_BOT_TOKEN' y 'TELEGRAM_CHAT_ID' (o ajusta idBot/idGrupo) con tus credenciales de Telegram.")
         print("El bot no enviará alertas hasta configurarlo.")
@@ -2538,7 +2921,7 @@ def run_bot_mejorado():
     while True:
         try:
             main_mejorado(data_logger, scoring_engine)
-            time.sleep(INTERVALO_ACTUALIZACION)
+            time.sleep(PLANIFICADOR.espera_sugerida())
         except KeyboardInterrupt:
             print("\nBot detenido por el usuario.")
             break
@@ -2547,6 +2930,10 @@ def run_bot_mejorado():
             print("Reintentando en 30s...")
             time.sleep(30)
 
+    PRECARGA.detener()
+    data_logger.close()
+    cerrar_sesion()
+
 
 if __name__ == "__main__":
     run_bot_mejorado()
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Archivo aparte de football_analysis.db para no competir con el logger por el bloqueo de escritura
+RUTA_CACHE = "cache_flashscore.db"
+
+
+def fin_de_jornada(ahora: Optional[float] = None) -> float:
+    """Timestamp de la próxima medianoche local: los datos de la jornada caducan con ella"""
+    hoy = date.fromtimestamp(time.time() if ahora is None else ahora)
+    return datetime.combine(hoy + timedelta(days=1), datetime.min.time()).timestamp()
+
+
+class CacheClasificaciones:
+    """
+    Tablas de posiciones compartidas entre partidos y reinicios. Cada tabla se guarda
+    una sola vez, identificada por sus equipos (liga o grupo), y un índice equipo -> tabla
+    permite resolver un partido nuevo sin descargar nada si ambos equipos ya están en
+    una tabla vigente. Las tablas caducan al terminar la jornada.
+    """
+
+    def __init__(self, normalizar: Callable[[str], str], ruta: str = RUTA_CACHE):
+        self.normalizar = normalizar
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._memoria: Dict[str, Dict] = {}
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        self._inicializar()
+
+    def _inicializar(self):
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS clasificaciones (
+                    clave TEXT PRIMARY KEY,
+                    liga TEXT,
+                    tabla_json TEXT NOT NULL,
+                    obtenida TEXT NOT NULL,
+                    expira REAL NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS clasificacion_equipos (
+                    equipo TEXT NOT NULL,
+                    clave TEXT NOT NULL,
+                    PRIMARY KEY (equipo, clave)
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_clasif_expira ON clasificaciones(expira)')
+            self._conn.commit()
+        self.purgar_vencidas()
+
+    def _clave(self, tabla: List[Dict]) -> str:
+        equipos = sorted(self.normalizar(fila['equipo']) for fila in tabla)
+        return hashlib.sha1('|'.join(equipos).encode('utf-8')).hexdigest()[:16]
+
+    def buscar(self, equipo_local: str, equipo_visita: str) -> Optional[List[Dict]]:
+        """Tabla vigente que contiene a los dos equipos, o None si hay que descargarla"""
+        local = self.normalizar(equipo_local)
+        visita = self.normalizar(equipo_visita)
+        ahora = time.time()
+
+        with self._lock:
+            fila = self._conn.execute('''
+                SELECT c.clave, c.tabla_json, c.expira
+                FROM clasificaciones c
+                JOIN clasificacion_equipos l ON l.clave = c.clave AND l.equipo = ?
+                JOIN clasificacion_equipos v ON v.clave = c.clave AND v.equipo = ?
+                WHERE c.expira > ?
+                ORDER BY c.obtenida DESC
+                LIMIT 1
+            ''', (local, visita, ahora)).fetchone()
+            if fila is None:
+                return None
+
+            clave, tabla_json, expira = fila
+            entrada = self._memoria.get(clave)
+            if entrada is None or entrada['expira'] != expira:
+                entrada = {'tabla': json.loads(tabla_json), 'expira': expira}
+                self._memoria[clave] = entrada
+        return [dict(f) for f in entrada['tabla']]
+
+    def guardar(self, liga: str, tabla: List[Dict]):
+        if not tabla:
+            return
+        clave = self._clave(tabla)
+        expira = fin_de_jornada()
+        equipos = {self.normalizar(fila['equipo']) for fila in tabla}
+
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO clasificaciones (clave, liga, tabla_json, obtenida, expira) VALUES (?, ?, ?, ?, ?)',
+                (clave, liga, json.dumps(tabla, ensure_ascii=False), datetime.now().isoformat(), expira)
+            )
+            self._conn.execute('DELETE FROM clasificacion_equipos WHERE clave = ?', (clave,))
+            self._conn.executemany(
+                'INSERT OR IGNORE INTO clasificacion_equipos (equipo, clave) VALUES (?, ?)',
+                [(equipo, clave) for equipo in equipos]
+            )
+            self._conn.commit()
+            self._memoria[clave] = {'tabla': [dict(f) for f in tabla], 'expira': expira}
+
+    def purgar_vencidas(self) -> int:
+        ahora = time.time()
+        with self._lock:
+            vencidas = [c for (c,) in self._conn.execute(
+                'SELECT clave FROM clasificaciones WHERE expira <= ?', (ahora,))]
+            if vencidas:
+                self._conn.executemany('DELETE FROM clasificacion_equipos WHERE clave = ?',
+                                       [(c,) for c in vencidas])
+                self._conn.executemany('DELETE FROM clasificaciones WHERE clave = ?',
+                                       [(c,) for c in vencidas])
+                self._conn.commit()
+            for clave in vencidas:
+                self._memoria.pop(clave, None)
+        return len(vencidas)
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+MAX_RESULTADOS_FORMA = 10   # resultados recientes que se conservan por equipo
+
+
+class CacheFormaEquipos:
+    """
+    Últimos resultados (con fecha) de cada equipo, por nombre normalizado. Se llena con
+    las pestañas H2H que se van descargando y sólo se amplía con resultados nuevos.
+    Una entrada verificada hoy se reutiliza sin red: la forma cambia como mucho una vez
+    por jornada. Los nombres del livescore se guardan como alias del nombre del H2H.
+    """
+
+    def __init__(self, normalizar: Callable[[str], str], ruta: str = RUTA_CACHE):
+        self.normalizar = normalizar
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS forma_equipos (
+                    equipo TEXT PRIMARY KEY,
+                    nombre TEXT NOT NULL,
+                    resultados_json TEXT NOT NULL,
+                    verificado TEXT NOT NULL
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS forma_alias (
+                    alias TEXT PRIMARY KEY,
+                    equipo TEXT NOT NULL
+                )
+            ''')
+            self._conn.commit()
+
+    def _leer(self, equipo: str) -> Optional[Dict]:
+        fila = self._conn.execute(
+            'SELECT nombre, resultados_json, verificado FROM forma_equipos WHERE equipo = ?', (equipo,)
+        ).fetchone()
+        if fila is None:
+            return None
+        return {'nombre': fila[0], 'resultados': json.loads(fila[1]), 'verificado': fila[2]}
+
+    def buscar(self, nombre: str) -> Optional[Dict]:
+        """Entrada vigente (verificada hoy) para el equipo o alias, o None"""
+        clave = self.normalizar(nombre)
+        with self._lock:
+            alias = self._conn.execute('SELECT equipo FROM forma_alias WHERE alias = ?', (clave,)).fetchone()
+            entrada = self._leer(alias[0] if alias else clave)
+        if entrada is None or entrada['verificado'] != date.today().isoformat():
+            return None
+        return entrada
+
+    def actualizar(self, nombre: str, resultados: List[Dict], alias: Tuple[str, ...] = ()) -> Dict:
+        """
+        Incorpora los resultados leídos de un H2H. Sólo se añaden los que no estaban;
+        si alguno viene sin fecha no se puede fusionar y se reemplaza la lista entera.
+        """
+        clave = self.normalizar(nombre)
+        with self._lock:
+            anterior = self._leer(clave)
+            if anterior is None or any(not r.get('fecha') for r in resultados):
+                combinados = list(resultados)
+            else:
+                vistos = {(r['fecha'], r.get('rival')) for r in anterior['resultados']}
+                nuevos = [r for r in resultados if (r['fecha'], r.get('rival')) not in vistos]
+                combinados = sorted(nuevos + anterior['resultados'],
+                                    key=lambda r: r['fecha'], reverse=True)
+            entrada = {
+                'nombre': nombre,
+                'resultados': combinados[:MAX_RESULTADOS_FORMA],
+                'verificado': date.today().isoformat(),
+            }
+            self._conn.execute(
+                'INSERT OR REPLACE INTO forma_equipos (equipo, nombre, resultados_json, verificado) VALUES (?, ?, ?, ?)',
+                (clave, nombre, json.dumps(entrada['resultados'], ensure_ascii=False), entrada['verificado'])
+            )
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO forma_alias (alias, equipo) VALUES (?, ?)',
+                [(self.normalizar(a), clave) for a in alias if a and self.normalizar(a) != clave]
+            )
+            self._conn.commit()
+        return entrada
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
+
+
+METRICAS_LIGA = ('corners', 'goles', 'tarjetas')
+MIN_PARTIDOS_LIGA = 8       # partidos finalizados antes de fiarse de la media propia de una liga
+
+
+class EstadisticasLigas:
+    """
+    Media y varianza de los totales finales (córners, goles, tarjetas) por liga,
+    acumuladas partido a partido con el algoritmo de Welford. Todo vive en memoria
+    (consulta O(1)) y cada partido registrado se persiste al momento; un partido
+    sólo cuenta una vez aunque se registre de nuevo tras un reinicio.
+    """
+
+    def __init__(self, normalizar: Callable[[str], str], ruta: str = RUTA_CACHE):
+        self.normalizar = normalizar
+        self.ruta = ruta
+        self._lock = threading.Lock()
+        self._memoria: Dict[Tuple[str, str], List[float]] = {}
+        self._conn = sqlite3.connect(ruta, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS estadisticas_ligas (
+                    liga TEXT NOT NULL,
+                    metrica TEXT NOT NULL,
+                    n INTEGER NOT NULL,
+                    media REAL NOT NULL,
+                    m2 REAL NOT NULL,
+                    PRIMARY KEY (liga, metrica)
+                )
+            ''')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS estadisticas_ligas_partidos (
+                    partido_id TEXT PRIMARY KEY
+                )
+            ''')
+            self._conn.commit()
+            for liga, metrica, n, media, m2 in self._conn.execute(
+                    'SELECT liga, metrica, n, media, m2 FROM estadisticas_ligas'):
+                self._memoria[(liga, metrica)] = [n, media, m2]
+
+    def registrar(self, partido_id: str, liga: str, totales: Dict[str, float]) -> bool:
+        """Suma los totales finales de un partido a su liga; False si ya estaba registrado"""
+        clave_liga = self.normalizar(liga)
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT OR IGNORE INTO estadisticas_ligas_partidos (partido_id) VALUES (?)', (partido_id,))
+            if cursor.rowcount == 0:
+                return False
+            filas = []
+            for metrica in METRICAS_LIGA:
+                if totales.get(metrica) is None:
+                    continue
+                valor = float(totales[metrica])
+                n, media, m2 = self._memoria.get((clave_liga, metrica), [0, 0.0, 0.0])
+                n += 1
+                delta = valor - media
+                media += delta / n
+                m2 += delta * (valor - media)
+                self._memoria[(clave_liga, metrica)] = [n, media, m2]
+                filas.append((clave_liga, metrica, n, media, m2))
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO estadisticas_ligas (liga, metrica, n, media, m2) VALUES (?, ?, ?, ?, ?)',
+                filas
+            )
+            self._conn.commit()
+        return True
+
+    def _entrada(self, liga: str, metrica: str) -> Optional[List[float]]:
+        entrada = self._memoria.get((self.normalizar(liga), metrica))
+        if entrada is None or entrada[0] < MIN_PARTIDOS_LIGA:
+            return None
+        return entrada
+
+    def media(self, liga: str, metrica: str) -> Optional[float]:
+        """Media de la liga, o None si aún no hay partidos suficientes"""
+        entrada = self._entrada(liga, metrica)
+        return entrada[1] if entrada else None
+
+    def desviacion(self, liga: str, metrica: str) -> Optional[float]:
+        """Desviación estándar muestral de la liga, o None si aún no hay partidos suficientes"""
+        entrada = self._entrada(liga, metrica)
+        return (entrada[2] / (entrada[0] - 1)) ** 0.5 if entrada else None
+
+    def vacia(self) -> bool:
+        return not self._memoria
+
+    def ligas(self) -> int:
+        return len({liga for liga, _ in self._memoria})
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
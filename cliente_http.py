@@ -0,0 +1,170 @@
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# urllib3 sólo descomprime brotli si hay un decodificador instalado
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = 'gzip, deflate, br'
+    except ImportError:
+        ACCEPT_ENCODING = 'gzip, deflate'
+
+HEADERS = {
+    'User-Agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/91.0.4472.124 Safari/537.36'
+    ),
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+
+# --- Pool de conexiones ---
+MAX_CONEXIONES_POR_HOST = 8       # peticiones simultáneas a un mismo host
+POOL_HOSTS = 4                    # hosts distintos con pool propio (flashscore, telegram...)
+
+# Timeouts (conexión, lectura) en segundos por tipo de endpoint
+TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    'livescore': (3.05, 10),
+    'estadisticas': (3.05, 8),
+    'clasificacion': (3.05, 10),
+    'h2h': (3.05, 12),
+    'telegram': (3.05, 10),
+    'default': (3.05, 10),
+}
+
+_sesion: Optional[requests.Session] = None
+_sesion_lock = threading.Lock()
+
+_SEMAFOROS_HOST: Dict[str, threading.BoundedSemaphore] = {}
+_SEMAFOROS_LOCK = threading.Lock()
+
+
+def obtener_sesion() -> requests.Session:
+    """Sesión compartida con conexiones keep-alive reutilizables para todos los scrapers"""
+    global _sesion
+    if _sesion is None:
+        with _sesion_lock:
+            if _sesion is None:
+                sesion = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=POOL_HOSTS, pool_maxsize=MAX_CONEXIONES_POR_HOST)
+                sesion.mount('https://', adaptador)
+                sesion.mount('http://', adaptador)
+                sesion.headers.update(HEADERS)
+                _sesion = sesion
+    return _sesion
+
+
+def cerrar_sesion():
+    global _sesion
+    with _sesion_lock:
+        if _sesion is not None:
+            _sesion.close()
+            _sesion = None
+
+
+def _semaforo_host(url: str) -> threading.BoundedSemaphore:
+    """Semáforo compartido que limita las conexiones simultáneas a un mismo host"""
+    host = urlparse(url).netloc
+    with _SEMAFOROS_LOCK:
+        semaforo = _SEMAFOROS_HOST.get(host)
+        if semaforo is None:
+            semaforo = threading.BoundedSemaphore(MAX_CONEXIONES_POR_HOST)
+            _SEMAFOROS_HOST[host] = semaforo
+        return semaforo
+
+
+def http_get(url: str, endpoint: str = 'default', **kwargs) -> requests.Response:
+    """GET sobre la sesión compartida, con el timeout del endpoint y el límite por host"""
+    kwargs.setdefault('timeout', TIMEOUTS.get(endpoint, TIMEOUTS['default']))
+    with _semaforo_host(url):
+        return obtener_sesion().get(url, **kwargs)
+
+
+def http_post(url: str, endpoint: str = 'default', **kwargs) -> requests.Response:
+    kwargs.setdefault('timeout', TIMEOUTS.get(endpoint, TIMEOUTS['default']))
+    with _semaforo_host(url):
+        return obtener_sesion().post(url, **kwargs)
+
+
+class CacheRespuestas:
+    """
+    Caché por clave de páginas ya parseadas. Valida con ETag/Last-Modified cuando el
+    servidor los envía y, si no, con un hash del cuerpo: si la página no cambió se
+    reutiliza el resultado anterior sin volver a parsear.
+    """
+
+    def __init__(self):
+        self._entradas: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def cabeceras_condicionales(self, clave: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since para revalidar la última respuesta de la clave"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+        cabeceras = {}
+        if entrada is not None:
+            if entrada['etag']:
+                cabeceras['If-None-Match'] = entrada['etag']
+            if entrada['last_modified']:
+                cabeceras['If-Modified-Since'] = entrada['last_modified']
+        return cabeceras
+
+    def resolver(self, clave: str, status: int, cabeceras, cuerpo: Optional[str],
+                 parsear: Callable[[str], Dict]) -> Optional[Dict]:
+        """
+        Devuelve el resultado para la respuesta recibida: el cacheado si el servidor
+        respondió 304 o el cuerpo tiene el mismo hash, o el de parsear(cuerpo) si cambió.
+        """
+        with self._lock:
+            entrada = self._entradas.get(clave)
+
+        if status == 304:
+            if entrada is None:
+                return None
+            with self._lock:
+                self.aciertos += 1
+            return dict(entrada['valor'])
+
+        if status != 200 or cuerpo is None:
+            return None
+
+        huella = hashlib.sha1(cuerpo.encode('utf-8', 'surrogatepass')).hexdigest()
+        if entrada is not None and entrada['hash'] == huella:
+            with self._lock:
+                self.aciertos += 1
+            return dict(entrada['valor'])
+
+        with self._lock:
+            self.fallos += 1
+        valor = parsear(cuerpo)
+        with self._lock:
+            self._entradas[clave] = {
+                'etag': cabeceras.get('ETag'),
+                'last_modified': cabeceras.get('Last-Modified'),
+                'hash': huella,
+                'valor': dict(valor),
+            }
+        return valor
+
+    def descartar(self, clave: str):
+        with self._lock:
+            self._entradas.pop(clave, None)
+
+    def claves(self) -> List[str]:
+        with self._lock:
+            return list(self._entradas)
+
+
+# Páginas de estadísticas por partido, compartida por el modo síncrono y el asyncio
+CACHE_ESTADISTICAS = CacheRespuestas()
@@ -1,58 +1,346 @@
+import atexit
+import calendar
+import queue
 import sqlite3
 import json
-from datetime import datetime, timedelta
+import os
+import threading
+import time
+from contextlib import contextmanager
 from typing import Dict, List, Optional, Tuple
-import pandas as pd
-import numpy as np
 from pathlib import Path
+from urllib.parse import quote
+
+# Escritura por lotes: un hilo escritor vacía la cola y escribe una sola transacción
+# por ciclo de sondeo, o antes si se alcanza alguno de estos límites
+FLUSH_MAX_ROWS = 200
+FLUSH_MAX_MS = 2000
+
+# Cola acotada entre el bucle de sondeo y el hilo escritor. Si se llena, los snapshots
+# de partido se descartan al momento (el siguiente ciclo trae otro); las alertas esperan
+# hasta ALERT_ENQUEUE_TIMEOUT segundos antes de descartarse.
+QUEUE_MAX_RECORDS = 5000
+ALERT_ENQUEUE_TIMEOUT = 0.5
+WRITER_POLL_S = 0.5         # flush/close comprueban cada tanto que el hilo escritor siga vivo
+
+MAX_DIMENSION_IDS = 20000   # ids de liga/equipo/partido recordados por el escritor
+
+_DROPPED_KEY = {'match': 'dropped_matches', 'alert': 'dropped_alerts'}
+_END_CYCLE = object()
+_STOP = object()
+
+# Columnas por minuto de match_stats (la tabla de hechos); liga y equipos viven en fixtures
+STAT_COLUMNS = [
+    ('home_score', 'INTEGER'), ('away_score', 'INTEGER'),
+    ('home_shots', 'INTEGER'), ('away_shots', 'INTEGER'),
+    ('home_shots_on_target', 'INTEGER'), ('away_shots_on_target', 'INTEGER'),
+    ('home_dangerous_attacks', 'INTEGER'), ('away_dangerous_attacks', 'INTEGER'),
+    ('home_possession', 'REAL'), ('away_possession', 'REAL'),
+    ('home_corners', 'INTEGER'), ('away_corners', 'INTEGER'),
+    ('home_yellow_cards', 'INTEGER'), ('away_yellow_cards', 'INTEGER'),
+    ('home_red_cards', 'INTEGER'), ('away_red_cards', 'INTEGER'),
+    ('home_xg', 'REAL'), ('away_xg', 'REAL'),
+    ('home_momentum', 'REAL'), ('away_momentum', 'REAL'),
+    ('home_pressure', 'REAL'), ('away_pressure', 'REAL'),
+]
+_STAT_NAMES = ', '.join(name for name, _ in STAT_COLUMNS)
+
+# match_stats se reparte en una tabla por mes (UTC, como CURRENT_TIMESTAMP): la retención
+# borra meses enteros con DROP TABLE en lugar de recorrer filas. match_stats es una vista
+# UNION ALL sobre las particiones que se regenera al crear o eliminar una.
+PARTITION_PREFIX = 'match_stats_'
+
+# Columnas y joins de la forma antigua de matches (vista y consultas de lectura)
+_MATCHES_COLUMNS = (
+    'f.match_id, l.name AS league, ht.name AS home_team, at.name AS away_team, '
+    's.timestamp, s.minute, ' + ', '.join('s.' + name for name, _ in STAT_COLUMNS)
+)
+_MATCHES_JOINS = '''
+    JOIN fixtures f ON f.id = s.fixture_id
+    LEFT JOIN leagues l ON l.id = f.league_id
+    LEFT JOIN teams ht ON ht.id = f.home_team_id
+    LEFT JOIN teams at ON at.id = f.away_team_id
+'''
+
+INSERT_MATCH_SQL = '''
+    INSERT OR REPLACE INTO {table} (fixture_id, minute, %s)
+    VALUES (?, ?, %s)
+''' % (_STAT_NAMES, ', '.join('?' for _ in STAT_COLUMNS))
+
+
+def partition_name(month: str) -> str:
+    """Nombre de la partición de un mes 'YYYYMM'"""
+    return f'{PARTITION_PREFIX}{month}'
+
+
+def current_month() -> str:
+    return time.strftime('%Y%m', time.gmtime())
+
+
+def _partition_ddl(table: str) -> str:
+    columnas = ',\n'.join(f'            {name} {tipo}' for name, tipo in STAT_COLUMNS)
+    return f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            fixture_id INTEGER NOT NULL REFERENCES fixtures(id),
+            minute INTEGER NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+{columnas},
+            PRIMARY KEY (fixture_id, minute)
+        ) WITHOUT ROWID
+    '''
+
+
+# Agregados por liga que mantienen los triggers: (columna, expresión sobre una fila de match_stats)
+AGGREGATE_COLUMNS = [
+    ('goals', 'home_score + away_score'),
+    ('shots', 'home_shots + away_shots'),
+    ('corners', 'home_corners + away_corners'),
+]
+
+
+def create_partition(conn: sqlite3.Connection, table: str):
+    """Crea la partición de un mes con los triggers que mantienen league_aggregates"""
+    conn.execute(_partition_ddl(table))
+    for event, sign, row in (('INSERT', '+', 'NEW'), ('DELETE', '-', 'OLD')):
+        sums = ', '.join(
+            f"{name} = {name} {sign} IFNULL({expr.replace('home_', row + '.home_').replace('away_', row + '.away_')}, 0)"
+            for name, expr in AGGREGATE_COLUMNS
+        )
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_agg_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE league_aggregates SET snapshots = snapshots {sign} 1, {sums}
+                WHERE league_id = (SELECT league_id FROM fixtures WHERE id = {row}.fixture_id);
+            END
+        ''')
+
+
+def rebuild_league_aggregates(conn: sqlite3.Connection):
+    """Recalcula league_aggregates desde cero (tras crear la tabla o migrar datos)"""
+    conn.execute('DELETE FROM league_aggregates')
+    conn.execute(f'''
+        INSERT INTO league_aggregates (league_id, matches, snapshots, {', '.join(n for n, _ in AGGREGATE_COLUMNS)})
+        SELECT f.league_id, COUNT(DISTINCT f.id), COUNT(s.fixture_id),
+               {', '.join(f'IFNULL(SUM(s.{e.replace(" + ", " + s.")}), 0)' for _, e in AGGREGATE_COLUMNS)}
+        FROM fixtures f
+        LEFT JOIN match_stats s ON s.fixture_id = f.id
+        WHERE f.league_id IS NOT NULL
+        GROUP BY f.league_id
+    ''')
+
+
+def list_partitions(conn: sqlite3.Connection) -> List[str]:
+    return [name for (name,) in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ? ORDER BY name",
+        (PARTITION_PREFIX + '[0-9][0-9][0-9][0-9][0-9][0-9]',)
+    )]
+
+
+def rebuild_stats_views(conn: sqlite3.Connection):
+    """Regenera las vistas match_stats (unión de particiones) y matches (forma antigua)"""
+    partitions = list_partitions(conn)
+    if not partitions:
+        partitions = [partition_name(current_month())]
+        create_partition(conn, partitions[0])
+    conn.execute('DROP VIEW IF EXISTS matches')
+    conn.execute('DROP VIEW IF EXISTS match_stats')
+    conn.execute('CREATE VIEW match_stats AS ' + ' UNION ALL '.join(
+        f'SELECT * FROM {table}' for table in partitions))
+    # Vista con la forma de la antigua tabla matches para las consultas y reportes existentes
+    conn.execute(f'CREATE VIEW matches AS SELECT {_MATCHES_COLUMNS} FROM match_stats s {_MATCHES_JOINS}')
+
+
+READ_POOL_SIZE = 4
+
+# Historial de un equipo: sus últimos partidos salen de los índices (equipo, first_seen) y
+# sólo se leen las filas de esos partidos, por clave primaria en cada partición
+HISTORY_SQL = f'''
+    WITH recent AS (
+        SELECT id FROM (
+            SELECT f.id, f.first_seen FROM fixtures f
+            WHERE f.home_team_id = (SELECT id FROM teams WHERE name = :team)
+            UNION ALL
+            SELECT f.id, f.first_seen FROM fixtures f
+            WHERE f.away_team_id = (SELECT id FROM teams WHERE name = :team)
+        )
+        ORDER BY first_seen DESC
+        LIMIT :limit
+    )
+    SELECT {_MATCHES_COLUMNS}
+    FROM (SELECT * FROM match_stats WHERE fixture_id IN (SELECT id FROM recent)) s
+    {_MATCHES_JOINS}
+    ORDER BY s.timestamp DESC
+    LIMIT :limit
+'''
+
+LEAGUE_STATS_SQL = '''
+    SELECT a.snapshots, a.goals, a.shots, a.corners, a.matches
+    FROM league_aggregates a
+    JOIN leagues l ON l.id = a.league_id
+    WHERE l.name = ?
+'''
+
+
+class ReadConnectionPool:
+    """
+    Conexiones de sólo lectura reutilizables para consultas e informes. Con WAL no
+    bloquean al hilo escritor, y cada conexión conserva su caché de sentencias preparadas.
+    """
+    
+    def __init__(self, db_path: str, size: int = READ_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened: List[sqlite3.Connection] = []
+    
+    def _open(self) -> sqlite3.Connection:
+        uri = Path(self.db_path).resolve().as_uri() + '?mode=ro'
+        conn = sqlite3.connect(uri, uri=True, timeout=5.0, check_same_thread=False)
+        conn.execute('PRAGMA query_only=ON')
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = len(self._opened) < self.size
+                if create:
+                    conn = self._open()
+                    self._opened.append(conn)
+            if not create:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+    
+    def close(self):
+        with self._lock:
+            for conn in self._opened:
+                conn.close()
+            self._opened.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+
+INSERT_ALERT_SQL = '''
+    INSERT INTO alerts (match_id, minute, alert_type, score, confidence, predicted_outcome)
+    VALUES (?, ?, ?, ?, ?, ?)
+'''
+
 
 class ImprovedDataLogger:
     """Sistema mejorado de logging con análisis histórico y machine learning básico"""
     
-    def __init__(self, db_path: str = "football_analysis.db"):
+    def __init__(self, db_path: str = "football_analysis.db",
+                 flush_max_rows: int = FLUSH_MAX_ROWS, flush_max_ms: int = FLUSH_MAX_MS,
+                 queue_max: int = QUEUE_MAX_RECORDS):
         self.db_path = db_path
+        self.flush_max_rows = flush_max_rows
+        self.flush_max_ms = flush_max_ms
+        self._queue: 'queue.Queue' = queue.Queue(maxsize=queue_max)
+        self._lock = threading.Lock()
+        self._stats = {'enqueued': 0, 'written': 0, 'dropped_matches': 0, 'dropped_alerts': 0,
+                       'skipped_unchanged': 0, 'write_errors': 0, 'rejected_rows': 0,
+                       'max_depth': 0, 'last_batch_ms': 0.0}
+        # Último snapshot persistido por partido (sin el minuto), para no repetir filas idénticas
+        self._last_snapshot: Dict[str, Tuple] = {}
+        # Ids de ligas, equipos y partidos ya resueltos por el hilo escritor
+        self._dimension_ids: Dict[Tuple[str, str], int] = {}
+        self._partition: Optional[str] = None
+        self._closed = False
         self.init_database()
+        self._readers = ReadConnectionPool(db_path)
+        # Único escritor: el bucle de sondeo sólo encola y nunca espera al disco
+        self._writer = threading.Thread(target=self._writer_loop, name="data-logger-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+    
+    def _open_writer(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.execute('PRAGMA synchronous=NORMAL')   # con WAL sólo hace fsync en los checkpoints
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-8000')     # ~8 MB
+        # Un INSERT OR REPLACE borra la fila anterior: así su trigger la descuenta de los agregados
+        conn.execute('PRAGMA recursive_triggers=ON')
+        return conn
     
     def init_database(self):
         """Inicializa la base de datos con todas las tablas necesarias"""
         conn = sqlite3.connect(self.db_path)
+        # El espacio de las particiones eliminadas se devuelve con incremental_vacuum;
+        # en una base existente el cambio sólo se aplica tras un VACUUM completo
+        needs_vacuum = conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        if needs_vacuum and conn.execute('PRAGMA page_count').fetchone()[0] == 0:
+            needs_vacuum = False  # base nueva: el pragma basta
+        # WAL queda guardado en el archivo: los lectores no bloquean al hilo escritor
+        conn.execute('PRAGMA journal_mode=WAL')
         cursor = conn.cursor()
         
-        # Tabla principal de partidos con estadísticas detalladas
+        # Dimensiones: cada liga, equipo y partido se guarda una sola vez
         cursor.execute('''
-            CREATE TABLE IF NOT EXISTS matches (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                match_id TEXT NOT NULL,
-                league TEXT,
-                home_team TEXT,
-                away_team TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                minute INTEGER,
-                home_score INTEGER,
-                away_score INTEGER,
-                home_shots INTEGER,
-                away_shots INTEGER,
-                home_shots_on_target INTEGER,
-                away_shots_on_target INTEGER,
-                home_dangerous_attacks INTEGER,
-                away_dangerous_attacks INTEGER,
-                home_possession REAL,
-                away_possession REAL,
-                home_corners INTEGER,
-                away_corners INTEGER,
-                home_yellow_cards INTEGER,
-                away_yellow_cards INTEGER,
-                home_red_cards INTEGER,
-                away_red_cards INTEGER,
-                home_xg REAL,
-                away_xg REAL,
-                home_momentum REAL,
-                away_momentum REAL,
-                home_pressure REAL,
-                away_pressure REAL
+            CREATE TABLE IF NOT EXISTS leagues (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS teams (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS fixtures (
+                id INTEGER PRIMARY KEY,
+                match_id TEXT NOT NULL UNIQUE,
+                league_id INTEGER REFERENCES leagues(id),
+                home_team_id INTEGER REFERENCES teams(id),
+                away_team_id INTEGER REFERENCES teams(id),
+                first_seen DATETIME DEFAULT CURRENT_TIMESTAMP
             )
         ''')
         
+        # Agregados por liga mantenidos por triggers: get_league_stats no recorre filas
+        aggregates_exist = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'league_aggregates'"
+        ).fetchone() is not None
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS league_aggregates (
+                league_id INTEGER PRIMARY KEY REFERENCES leagues(id),
+                matches INTEGER NOT NULL DEFAULT 0,
+                snapshots INTEGER NOT NULL DEFAULT 0,
+                {', '.join(f'{name} REAL NOT NULL DEFAULT 0' for name, _ in AGGREGATE_COLUMNS)}
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS fixtures_agg_insert AFTER INSERT ON fixtures
+            BEGIN
+                INSERT OR IGNORE INTO league_aggregates (league_id) VALUES (NEW.league_id);
+                UPDATE league_aggregates SET matches = matches + 1 WHERE league_id = NEW.league_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS fixtures_agg_delete AFTER DELETE ON fixtures
+            BEGIN
+                UPDATE league_aggregates SET matches = matches - 1 WHERE league_id = OLD.league_id;
+            END
+        ''')
+        
+        # Hechos: una fila estrecha por partido y minuto, agrupada físicamente por partido
+        # y repartida en una tabla por mes
+        migrated = self._migrate_legacy_matches(cursor)
+        for table in list_partitions(conn):
+            create_partition(conn, table)   # añade los triggers a particiones anteriores
+        create_partition(conn, partition_name(current_month()))
+        rebuild_stats_views(conn)
+        if migrated or not aggregates_exist:
+            rebuild_league_aggregates(conn)
+        
         # Tabla de alertas generadas
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS alerts (
@@ -86,36 +374,336 @@ class ImprovedDataLogger:
         ''')
         
         # Índices para mejorar el rendimiento
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_match_id ON matches(match_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_timestamp ON matches(timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_league ON matches(league)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixture_league ON fixtures(league_id)')
+        # Historial por equipo: búsqueda por equipo ya ordenada por fecha, sin tocar la tabla
+        cursor.execute('DROP INDEX IF EXISTS idx_fixture_home')
+        cursor.execute('DROP INDEX IF EXISTS idx_fixture_away')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixture_home_seen ON fixtures(home_team_id, first_seen)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fixture_away_seen ON fixtures(away_team_id, first_seen)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_alert_match ON alerts(match_id)')
         
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_alert_timestamp ON alerts(timestamp)')
+        
         conn.commit()
+        if migrated or needs_vacuum:
+            # Devuelve al disco el espacio de la tabla antigua y activa el vacuum incremental
+            conn.execute('VACUUM')
         conn.close()
+        if migrated:
+            print(f"✅ Migrados {migrated} snapshots al esquema normalizado")
         print("✅ Base de datos inicializada correctamente")
     
-    def log_match_analysis(self, match_data: Dict, analysis_result: Dict):
-        """Registra un análisis de partido en la base de datos"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _migrate_legacy_matches(self, cursor: sqlite3.Cursor) -> int:
+        """
+        Reparte en particiones mensuales los snapshots de esquemas anteriores: la antigua
+        tabla ancha matches o una tabla match_stats sin particionar. Devuelve cuántos migró.
+        """
+        kinds = dict(cursor.execute(
+            "SELECT name, type FROM sqlite_master WHERE name IN ('matches', 'match_stats')"
+        ).fetchall())
+        if 'table' not in kinds.values():
+            return 0
         
-        try:
-            # Insertar datos del partido
+        for name, kind in kinds.items():
+            if kind == 'view':
+                cursor.execute(f'DROP VIEW {name}')
+        
+        if kinds.get('match_stats') == 'table':
+            cursor.execute('ALTER TABLE match_stats RENAME TO match_stats_staging')
+        else:
+            cursor.execute(_partition_ddl('match_stats_staging'))
+        
+        if kinds.get('matches') == 'table':
+            cursor.execute("INSERT OR IGNORE INTO leagues (name) SELECT DISTINCT COALESCE(league, 'Unknown') FROM matches")
+            cursor.execute('''
+                INSERT OR IGNORE INTO teams (name)
+                SELECT COALESCE(home_team, 'Home') FROM matches
+                UNION SELECT COALESCE(away_team, 'Away') FROM matches
+            ''')
+            # Liga y equipos del primer snapshot de cada partido
             cursor.execute('''
-                INSERT INTO matches (
-                    match_id, league, home_team, away_team, minute,
-                    home_score, away_score, home_shots, away_shots,
-                    home_shots_on_target, away_shots_on_target,
-                    home_dangerous_attacks, away_dangerous_attacks,
-                    home_possession, away_possession,
-                    home_corners, away_corners,
-                    home_yellow_cards, away_yellow_cards,
-                    home_red_cards, away_red_cards,
-                    home_xg, away_xg, home_momentum, away_momentum,
-                    home_pressure, away_pressure
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+                INSERT OR IGNORE INTO fixtures (match_id, league_id, home_team_id, away_team_id, first_seen)
+                SELECT m.match_id, l.id, ht.id, at.id, m.timestamp
+                FROM matches m
+                JOIN (SELECT MIN(id) AS id FROM matches GROUP BY match_id) primero ON primero.id = m.id
+                JOIN leagues l ON l.name = COALESCE(m.league, 'Unknown')
+                JOIN teams ht ON ht.name = COALESCE(m.home_team, 'Home')
+                JOIN teams at ON at.name = COALESCE(m.away_team, 'Away')
+            ''')
+            # En orden de inserción: si un minuto se repite queda su última lectura
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO match_stats_staging (fixture_id, minute, timestamp, {_STAT_NAMES})
+                SELECT f.id, COALESCE(m.minute, 0), m.timestamp, {', '.join('m.' + name for name, _ in STAT_COLUMNS)}
+                FROM matches m
+                JOIN fixtures f ON f.match_id = m.match_id
+                ORDER BY m.id
+            ''')
+            cursor.execute('DROP TABLE matches')
+        
+        months = [month for (month,) in cursor.execute(
+            "SELECT DISTINCT COALESCE(strftime('%Y%m', timestamp), ?) FROM match_stats_staging",
+            (current_month(),)
+        ).fetchall()]
+        for month in months:
+            table = partition_name(month)
+            create_partition(cursor.connection, table)
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO {table}
+                SELECT * FROM match_stats_staging
+                WHERE COALESCE(strftime('%Y%m', timestamp), ?) = ?
+            ''', (current_month(), month))
+        migrated = cursor.execute('SELECT COUNT(*) FROM match_stats_staging').fetchone()[0]
+        cursor.execute('DROP TABLE match_stats_staging')
+        return migrated
+    
+    # --- Hilo escritor ---
+    
+    def _writer_loop(self):
+        conn: Optional[sqlite3.Connection] = None
+        pending: Dict[str, List[Tuple]] = {'match': [], 'alert': []}
+        deadline: Optional[float] = None
+        try:
+            conn = self._open_writer()
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    self._write_batch(conn, pending)   # venció FLUSH_MAX_MS
+                    deadline = None
+                    continue
+                try:
+                    if item is _STOP:
+                        self._write_batch(conn, pending)
+                        return
+                    if item is _END_CYCLE:
+                        self._write_batch(conn, pending)
+                        deadline = None
+                        continue
+                    kind, row = item
+                    pending[kind].append(row)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_max_ms / 1000
+                    if len(pending['match']) + len(pending['alert']) >= self.flush_max_rows:
+                        self._write_batch(conn, pending)
+                        deadline = None
+                finally:
+                    self._queue.task_done()
+        except Exception as e:
+            # flush y close dejan de esperar al ver el hilo muerto; lo encolado se pierde
+            print(f"❌ Hilo escritor detenido, no se guardarán más datos: {e}")
+        finally:
+            if conn is not None:
+                conn.close()
+    
+    def _write_batch(self, conn: sqlite3.Connection, pending: Dict[str, List[Tuple]]):
+        matches, alerts = pending['match'], pending['alert']
+        if not matches and not alerts:
+            return
+        if len(self._dimension_ids) > MAX_DIMENSION_IDS:
+            self._dimension_ids.clear()
+        t0 = time.perf_counter()
+        try:
+            with conn:
+                self._insert_rows(conn, matches, alerts)
+        except Exception as e:
+            print(f"Error volcando {len(matches)} partidos y {len(alerts)} alertas: {e}")
+            self._forget_rolled_back()
+            with self._lock:
+                self._stats['write_errors'] += 1
+            if isinstance(e, sqlite3.OperationalError):
+                self._cap_pending(pending)   # falla la base, no los datos: todo al próximo lote
+            else:
+                self._write_rows_one_by_one(conn, pending)
+            return
+        with self._lock:
+            self._stats['written'] += len(matches) + len(alerts)
+            self._stats['last_batch_ms'] = (time.perf_counter() - t0) * 1000
+        matches.clear()
+        alerts.clear()
+    
+    def _insert_rows(self, conn: sqlite3.Connection, matches: List[Tuple], alerts: List[Tuple]):
+        if matches:
+            conn.executemany(INSERT_MATCH_SQL.format(table=self._ensure_partition(conn)), [
+                (self._fixture_id(conn, *row[:4]), row[4]) + row[5:] for row in matches
+            ])
+        if alerts:
+            conn.executemany(INSERT_ALERT_SQL, alerts)
+    
+    def _forget_rolled_back(self):
+        """Los ids y la partición creados dentro de una transacción fallida ya no existen"""
+        self._dimension_ids.clear()
+        self._partition = None
+    
+    def _cap_pending(self, pending: Dict[str, List[Tuple]]):
+        """Lo pendiente se reintenta en el próximo lote, sin crecer más que la propia cola"""
+        for kind, rows in pending.items():
+            exceso = max(0, len(rows) - self._queue.maxsize)
+            del rows[:exceso]
+            with self._lock:
+                self._stats[_DROPPED_KEY[kind]] += exceso
+    
+    def _write_rows_one_by_one(self, conn: sqlite3.Connection, pending: Dict[str, List[Tuple]]):
+        """
+        Tras fallar un lote, escribe cada fila en su propia transacción. Las filas que SQLite
+        rechaza por sus datos se descartan (rejected_rows); si falla la propia base (bloqueo,
+        disco: OperationalError) la fila y las siguientes quedan para el próximo lote.
+        """
+        written = rejected = 0
+        base_caida = False
+        for kind in ('match', 'alert'):
+            retry = []
+            for row in pending[kind]:
+                if base_caida:
+                    retry.append(row)
+                    continue
+                try:
+                    with conn:
+                        if kind == 'match':
+                            self._insert_rows(conn, [row], [])
+                        else:
+                            self._insert_rows(conn, [], [row])
+                    written += 1
+                except sqlite3.OperationalError:
+                    self._forget_rolled_back()
+                    base_caida = True
+                    retry.append(row)
+                except Exception as e:
+                    self._forget_rolled_back()
+                    rejected += 1
+                    print(f"⚠️ Fila descartada ({kind} {row[0]}): {e}")
+            pending[kind][:] = retry
+        self._cap_pending(pending)
+        with self._lock:
+            self._stats['written'] += written
+            self._stats['rejected_rows'] += rejected
+    
+    def _ensure_partition(self, conn: sqlite3.Connection) -> str:
+        """Partición del mes en curso; al cambiar de mes la crea y regenera las vistas"""
+        table = partition_name(current_month())
+        if table != self._partition:
+            if table not in list_partitions(conn):
+                create_partition(conn, table)
+                rebuild_stats_views(conn)
+            self._partition = table
+        return table
+    
+    def _dimension_id(self, conn: sqlite3.Connection, table: str, name: str) -> int:
+        key = (table, name)
+        if key not in self._dimension_ids:
+            conn.execute(f'INSERT OR IGNORE INTO {table} (name) VALUES (?)', (name,))
+            self._dimension_ids[key] = conn.execute(
+                f'SELECT id FROM {table} WHERE name = ?', (name,)).fetchone()[0]
+        return self._dimension_ids[key]
+    
+    def _fixture_id(self, conn: sqlite3.Connection, match_id: str, league: str,
+                    home_team: str, away_team: str) -> int:
+        """Id del partido en fixtures (lo crea la primera vez); sólo lo usa el hilo escritor"""
+        key = ('fixtures', match_id)
+        if key not in self._dimension_ids:
+            conn.execute('''
+                INSERT OR IGNORE INTO fixtures (match_id, league_id, home_team_id, away_team_id)
+                VALUES (?, ?, ?, ?)
+            ''', (match_id, self._dimension_id(conn, 'leagues', league or 'Unknown'),
+                  self._dimension_id(conn, 'teams', home_team or 'Home'),
+                  self._dimension_id(conn, 'teams', away_team or 'Away')))
+            self._dimension_ids[key] = conn.execute(
+                'SELECT id FROM fixtures WHERE match_id = ?', (match_id,)).fetchone()[0]
+        return self._dimension_ids[key]
+    
+    # --- Productores ---
+    
+    def _enqueue(self, kind: str, row: Tuple) -> bool:
+        try:
+            if self._closed:
+                raise queue.Full
+            if kind == 'alert':
+                self._queue.put((kind, row), timeout=ALERT_ENQUEUE_TIMEOUT)
+            else:
+                self._queue.put_nowait((kind, row))
+        except queue.Full:
+            with self._lock:
+                self._stats[_DROPPED_KEY[kind]] += 1
+                dropped = self._stats['dropped_matches'] + self._stats['dropped_alerts']
+            if dropped == 1 or dropped % 100 == 0:
+                print(f"⚠️ Cola del logger llena: {dropped} registros descartados")
+            return False
+        with self._lock:
+            self._stats['enqueued'] += 1
+            self._stats['max_depth'] = max(self._stats['max_depth'], self._queue.qsize())
+        return True
+    
+    def end_cycle(self):
+        """Marca el fin de un ciclo de sondeo: el escritor vuelca lo acumulado en una transacción"""
+        if self._closed:
+            return
+        try:
+            self._queue.put_nowait(_END_CYCLE)
+        except queue.Full:
+            pass  # con la cola llena el escritor ya está volcando por tamaño
+    
+    def flush(self):
+        """
+        Espera a que todo lo encolado hasta ahora esté escrito (para lecturas e informes).
+        Si el hilo escritor murió (p. ej. no pudo abrir la base) vuelve sin esperar.
+        """
+        if self._closed:
+            return
+        while True:
+            if not self._writer.is_alive():
+                return
+            try:
+                self._queue.put(_END_CYCLE, timeout=WRITER_POLL_S)
+                break
+            except queue.Full:
+                continue
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks and self._writer.is_alive():
+                self._queue.all_tasks_done.wait(WRITER_POLL_S)
+    
+    def close(self):
+        """Vuelca lo pendiente y detiene el hilo escritor"""
+        if self._closed:
+            return
+        self._closed = True
+        while self._writer.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=WRITER_POLL_S)
+                break
+            except queue.Full:
+                continue
+        self._writer.join()
+        self._readers.close()
+        atexit.unregister(self.close)
+    
+    def metrics(self) -> Dict:
+        """Métricas de contrapresión de la cola de escritura"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['queue_depth'] = self._queue.qsize()
+        stats['queue_max'] = self._queue.maxsize
+        return stats
+    
+    def summary(self) -> str:
+        m = self.metrics()
+        return (f"BD: cola {m['queue_depth']}/{m['queue_max']} | escritos: {m['written']} | "
+                f"sin cambios: {m['skipped_unchanged']} | "
+                f"descartados: {m['dropped_matches'] + m['dropped_alerts'] + m['rejected_rows']}")
+    
+    def retain_matches(self, match_ids: set):
+        """Olvida el último snapshot de los partidos que ya no están en seguimiento"""
+        with self._lock:
+            for match_id in [m for m in self._last_snapshot if m not in match_ids]:
+                del self._last_snapshot[match_id]
+    
+    def log_match_analysis(self, match_data: Dict, analysis_result: Dict):
+        """
+        Registra un análisis de partido (se escribe en el próximo volcado). Si nada cambió
+        desde el último snapshot persistido del partido salvo el minuto (descanso, partido
+        parado, sondeos seguidos) no se escribe fila: el volumen sigue a los eventos.
+        """
+        try:
+            row = (
                 match_data['match_id'], match_data['league'],
                 match_data['home_team'], match_data['away_team'],
                 match_data['minute'], match_data['home_score'], match_data['away_score'],
@@ -129,96 +717,164 @@ class ImprovedDataLogger:
                 analysis_result['home_xg'], analysis_result['away_xg'],
                 analysis_result['home_momentum'], analysis_result['away_momentum'],
                 analysis_result['home_pressure'], analysis_result['away_pressure']
-            ))
-            
-            conn.commit()
+            )
         except Exception as e:
             print(f"Error registrando partido: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+            return
+        
+        match_id = row[0]
+        signature = row[1:4] + row[5:]
+        with self._lock:
+            if self._last_snapshot.get(match_id) == signature:
+                self._stats['skipped_unchanged'] += 1
+                return
+        if self._enqueue('match', row):
+            with self._lock:
+                self._last_snapshot[match_id] = signature
     
     def log_alert(self, match_id: str, minute: int, alert_type: str, 
                   score: float, confidence: str, predicted_outcome: str):
-        """Registra una alerta generada"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute('''
-                INSERT INTO alerts (match_id, minute, alert_type, score, confidence, predicted_outcome)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (match_id, minute, alert_type, score, confidence, predicted_outcome))
-            
-            conn.commit()
-        except Exception as e:
-            print(f"Error registrando alerta: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
+        """Registra una alerta generada (se escribe en el próximo volcado)"""
+        self._enqueue('alert',
+                      (match_id, minute, alert_type, score, confidence, predicted_outcome))
+    
+    def reader(self):
+        """Conexión de sólo lectura del pool, como context manager"""
+        return self._readers.connection()
     
     def get_match_history(self, team: str, limit: int = 10) -> List[Dict]:
         """Obtiene el historial de partidos de un equipo"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM matches 
-            WHERE home_team = ? OR away_team = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (team, team, limit))
-        
-        columns = [description[0] for description in cursor.description]
-        results = [dict(zip(columns, row)) for row in cursor.fetchall()]
-        
-        conn.close()
-        return results
+        self.flush()
+        with self._readers.connection() as conn:
+            cursor = conn.execute(HISTORY_SQL, {'team': team, 'limit': limit})
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
     
     def get_league_stats(self, league: str) -> Dict:
-        """Obtiene estadísticas agregadas de una liga"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT 
-                AVG(home_score + away_score) as avg_goals,
-                AVG(home_shots + away_shots) as avg_shots,
-                AVG(home_corners + away_corners) as avg_corners,
-                COUNT(DISTINCT match_id) as total_matches
-            FROM matches
-            WHERE league = ?
-        ''', (league,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        """Obtiene estadísticas agregadas de una liga (de league_aggregates, sin recorrer snapshots)"""
+        self.flush()
+        with self._readers.connection() as conn:
+            result = conn.execute(LEAGUE_STATS_SQL, (league,)).fetchone()
         
+        snapshots = result[0] if result else 0
+        if not snapshots:
+            return {'avg_goals': 0, 'avg_shots': 0, 'avg_corners': 0, 'total_matches': result[4] if result else 0}
         return {
-            'avg_goals': result[0] or 0,
-            'avg_shots': result[1] or 0,
-            'avg_corners': result[2] or 0,
-            'total_matches': result[3] or 0
+            'avg_goals': result[1] / snapshots,
+            'avg_shots': result[2] / snapshots,
+            'avg_corners': result[3] / snapshots,
+            'total_matches': result[4]
         }
     
-    def cleanup_old_data(self, days: int = 90):
-        """Limpia datos antiguos para mantener la base de datos optimizada"""
-        conn = sqlite3.connect(self.db_path)
+    def get_final_totals(self, min_minute: int = 85) -> List[Dict]:
+        """
+        Totales del último snapshot de cada partido que llegó al menos a min_minute.
+        has_stats es False si ningún snapshot del partido trajo estadísticas (posesión,
+        remates, córners, amarillas): sus córners y tarjetas valen 0 porque faltan, no
+        porque no los hubiera.
+        """
+        self.flush()
+        with self._readers.connection() as conn:
+            cursor = conn.execute('''
+                SELECT f.match_id, l.name,
+                       s.home_corners + s.away_corners,
+                       s.home_score + s.away_score,
+                       s.home_yellow_cards + s.away_yellow_cards + s.home_red_cards + s.away_red_cards,
+                       last.has_stats
+                FROM (
+                    SELECT fixture_id, MAX(minute) AS minute,
+                           MAX(home_possession + away_possession + home_shots + away_shots
+                               + home_corners + away_corners + home_yellow_cards + away_yellow_cards) > 0 AS has_stats
+                    FROM match_stats
+                    GROUP BY fixture_id HAVING MAX(minute) >= ?
+                ) last
+                JOIN match_stats s ON s.fixture_id = last.fixture_id AND s.minute = last.minute
+                JOIN fixtures f ON f.id = s.fixture_id
+                JOIN leagues l ON l.id = f.league_id
+                WHERE l.name != 'Unknown'
+            ''', (min_minute,))
+            return [{'match_id': r[0], 'league': r[1], 'corners': r[2], 'goals': r[3], 'cards': r[4],
+                     'has_stats': bool(r[5])}
+                    for r in cursor.fetchall()]
+    
+    def cleanup_old_data(self, days: int = 90) -> Dict:
+        """
+        Limpia datos antiguos para mantener la base de datos optimizada. Los snapshots se
+        eliminan por meses completos (DROP de la partición, sin recorrer filas), así que
+        un mes se conserva hasta que todo él queda fuera de la retención. Devuelve las
+        filas y bytes liberados por tabla.
+        """
+        self.flush()
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
         cursor = conn.cursor()
         
-        cutoff_date = datetime.now() - timedelta(days=days)
+        cutoff = time.time() - days * 86400
+        cutoff_month = time.strftime('%Y%m', time.gmtime(cutoff))
+        cutoff_timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(cutoff))
+        page_size = cursor.execute('PRAGMA page_size').fetchone()[0]
+        
+        def free_pages() -> int:
+            return cursor.execute('PRAGMA freelist_count').fetchone()[0]
         
+        report = {
+            'match_stats': {'rows': 0, 'bytes': 0, 'partitions': []},
+            'alerts': {'rows': 0, 'bytes': 0},
+            'fixtures': {'rows': 0},
+            'file_bytes_reclaimed': 0,
+        }
         try:
-            cursor.execute('DELETE FROM matches WHERE timestamp < ?', (cutoff_date,))
-            cursor.execute('DELETE FROM alerts WHERE timestamp < ?', (cutoff_date,))
+            size_before = cursor.execute('PRAGMA page_count').fetchone()[0] * page_size
             
-            deleted = cursor.rowcount
+            expired = [t for t in list_partitions(conn) if t[len(PARTITION_PREFIX):] < cutoff_month]
+            if expired:
+                free_before = free_pages()
+                for table in expired:
+                    report['match_stats']['rows'] += cursor.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+                    # DROP no dispara triggers: se descuenta de los agregados la partición entera
+                    cursor.execute(f'''
+                        UPDATE league_aggregates
+                        SET snapshots = league_aggregates.snapshots - d.snapshots,
+                            {', '.join(f'{name} = league_aggregates.{name} - d.{name}' for name, _ in AGGREGATE_COLUMNS)}
+                        FROM (
+                            SELECT f.league_id, COUNT(*) AS snapshots,
+                                   {', '.join(f'IFNULL(SUM(s.{e.replace(" + ", " + s.")}), 0) AS {n}' for n, e in AGGREGATE_COLUMNS)}
+                            FROM {table} s JOIN fixtures f ON f.id = s.fixture_id
+                            GROUP BY f.league_id
+                        ) AS d
+                        WHERE league_aggregates.league_id = d.league_id
+                    ''')
+                    cursor.execute(f'DROP TABLE {table}')
+                rebuild_stats_views(conn)
+                report['match_stats']['partitions'] = expired
+                report['match_stats']['bytes'] = (free_pages() - free_before) * page_size
+            
+            free_before = free_pages()
+            cursor.execute('DELETE FROM alerts WHERE timestamp < ?', (cutoff_timestamp,))
+            report['alerts']['rows'] = cursor.rowcount
             conn.commit()
-            print(f"Eliminados {deleted} registros antiguos")
+            report['alerts']['bytes'] = (free_pages() - free_before) * page_size
+            
+            cursor.execute('DELETE FROM fixtures WHERE id NOT IN (SELECT fixture_id FROM match_stats)')
+            report['fixtures']['rows'] = cursor.rowcount
+            conn.commit()
+            
+            # Devuelve al sistema las páginas libres sin reescribir todo el archivo
+            # (executescript lo ejecuta hasta el final; execute sólo liberaría una página)
+            conn.executescript('PRAGMA incremental_vacuum;')
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            size_after = cursor.execute('PRAGMA page_count').fetchone()[0] * page_size
+            report['file_bytes_reclaimed'] = size_before - size_after
+            
+            print(f"Eliminados {report['match_stats']['rows']} snapshots "
+                  f"({len(expired)} particiones, {report['match_stats']['bytes'] / 1024:.0f} KB) y "
+                  f"{report['alerts']['rows']} alertas ({report['alerts']['bytes'] / 1024:.0f} KB); "
+                  f"archivo {report['file_bytes_reclaimed'] / 1024:.0f} KB más pequeño")
         except Exception as e:
             print(f"Error limpiando datos: {e}")
             conn.rollback()
         finally:
             conn.close()
+        return report
 
 
 # Clase auxiliar para análisis y reportes
@@ -230,25 +886,236 @@ class AnalyticsReporter:
     
     def generate_daily_report(self) -> str:
         """Genera un reporte diario del rendimiento"""
-        conn = sqlite3.connect(self.logger.db_path)
-        cursor = conn.cursor()
-        
-        # Obtener estadísticas del día
-        cursor.execute('''
-            SELECT COUNT(*) as total_matches,
-                   AVG(home_score + away_score) as avg_goals
-            FROM matches
-            WHERE DATE(timestamp) = DATE('now')
-        ''')
-        
-        result = cursor.fetchone()
-        conn.close()
+        self.logger.flush()
+        with self.logger.reader() as conn:
+            # Obtener estadísticas del día
+            result = conn.execute('''
+                SELECT COUNT(*) as total_matches,
+                       AVG(home_score + away_score) as avg_goals
+                FROM matches
+                WHERE DATE(timestamp) = DATE('now')
+            ''').fetchone()
         
         return f"📊 Reporte Diario\n" \
                f"Partidos analizados: {result[0]}\n" \
                f"Promedio de goles: {result[1]:.2f if result[1] else 0}"
 
 
+EXPORT_DIR = "export_parquet"
+EXPORT_CHUNK_ROWS = 50000   # filas por bloque leído de SQLite y por row group escrito
+EXPORT_FINAL_GRACE_MIN = 30  # minutos sin filas tras los que un partido se da por terminado
+_TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def _import_pyarrow():
+    """pyarrow sólo hace falta para exportar: se importa al usarlo"""
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("La exportación a Parquet requiere 'pyarrow' (pip install pyarrow)") from None
+    return pa, pc, pq
+
+
+class ParquetExporter:
+    """
+    Exporta snapshots y alertas a Parquet particionado por fecha y liga
+    (carpetas date=YYYY-MM-DD/league=..., legibles con pyarrow.dataset o pandas), en
+    bloques de tamaño fijo y sin cargar las tablas en memoria. Cada ejecución sólo
+    exporta lo nuevo desde la anterior según las marcas de _watermarks.json.
+    
+    De match_stats sólo se exportan minutos cerrados: los que ya tienen un minuto posterior
+    del mismo partido, o todos si el partido lleva EXPORT_FINAL_GRACE_MIN sin filas. El
+    minuto en curso aún se reescribe (INSERT OR REPLACE con nuevo timestamp) y se exporta
+    cuando se cierra. Cada (match_id, minute) se escribe así una sola vez; si por un minuto
+    que retrocede apareciera repetido, vale la copia con el timestamp más reciente.
+    """
+    
+    WATERMARKS_FILE = "_watermarks.json"
+    
+    # Partidos con filas desde la ventana anterior (los demás ya se exportaron terminados)
+    _ACTIVE_FIXTURES = '''
+        SELECT fixture_id, MAX(minute) AS minute, MAX(timestamp) AS timestamp
+        FROM match_stats GROUP BY fixture_id HAVING MAX(timestamp) >= :since
+    '''
+    
+    MATCHES_SQL = f'''
+        WITH active AS ({_ACTIVE_FIXTURES})
+        SELECT date(s.timestamp) AS date, {_MATCHES_COLUMNS}
+        FROM active u
+        JOIN match_stats s ON s.fixture_id = u.fixture_id {_MATCHES_JOINS}
+        WHERE s.timestamp < :cutoff AND (s.minute < u.minute OR u.timestamp < :finished)
+        ORDER BY date(s.timestamp), league
+    '''
+    
+    ACTIVE_MATCHES_SQL = f'''
+        WITH active AS ({_ACTIVE_FIXTURES})
+        SELECT f.match_id FROM active u JOIN fixtures f ON f.id = u.fixture_id
+    '''
+    
+    ALERTS_SQL = '''
+        SELECT date(a.timestamp) AS date, COALESCE(l.name, 'Unknown') AS league,
+               a.id, a.match_id, a.timestamp, a.minute, a.alert_type, a.score, a.confidence,
+               a.predicted_outcome, a.actual_outcome, a.was_correct
+        FROM alerts a
+        LEFT JOIN fixtures f ON f.match_id = a.match_id
+        LEFT JOIN leagues l ON l.id = f.league_id
+        WHERE a.id > ? AND a.id <= ?
+        ORDER BY date(a.timestamp), league
+    '''
+    
+    def __init__(self, logger: ImprovedDataLogger, output_dir: str = EXPORT_DIR,
+                 chunk_rows: int = EXPORT_CHUNK_ROWS):
+        self.logger = logger
+        self.output_dir = Path(output_dir)
+        self.chunk_rows = chunk_rows
+    
+    def _schemas(self, pa) -> Dict:
+        tipos = {'INTEGER': pa.int64(), 'REAL': pa.float64()}
+        return {
+            'matches': pa.schema(
+                [('match_id', pa.string()), ('home_team', pa.string()), ('away_team', pa.string()),
+                 ('timestamp', pa.timestamp('s')), ('minute', pa.int64())]
+                + [(name, tipos[tipo]) for name, tipo in STAT_COLUMNS]
+            ),
+            'alerts': pa.schema([
+                ('id', pa.int64()), ('match_id', pa.string()), ('timestamp', pa.timestamp('s')),
+                ('minute', pa.int64()), ('alert_type', pa.string()), ('score', pa.float64()),
+                ('confidence', pa.string()), ('predicted_outcome', pa.string()),
+                ('actual_outcome', pa.string()), ('was_correct', pa.bool_()),
+            ]),
+        }
+    
+    def _load_watermarks(self) -> Dict:
+        path = self.output_dir / self.WATERMARKS_FILE
+        if not path.exists():
+            return {}
+        return json.loads(path.read_text(encoding='utf-8'))
+    
+    def _save_watermarks(self, watermarks: Dict):
+        path = self.output_dir / self.WATERMARKS_FILE
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(watermarks, indent=2), encoding='utf-8')
+        os.replace(tmp, path)
+    
+    def export(self) -> Dict[str, int]:
+        """Exporta las filas nuevas; devuelve cuántas se escribieron por tabla"""
+        pa, pc, pq = _import_pyarrow()
+        self.logger.flush()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        watermarks = self._load_watermarks()
+        schemas = self._schemas(pa)
+        
+        # El escritor sella con CURRENT_TIMESTAMP (segundos) al volcar: se espera al segundo
+        # siguiente para que lo ya volcado quede antes del corte y lo posterior, después
+        time.sleep(1 - time.time() % 1)
+        now = time.time()
+        cutoff = time.strftime(_TIMESTAMP_FORMAT, time.gmtime(now))
+        run_id = time.strftime('%Y%m%dT%H%M%S', time.gmtime(now))
+        grace = EXPORT_FINAL_GRACE_MIN * 60
+        previous = watermarks.get('matches')
+        params = {
+            'cutoff': cutoff,
+            'finished': time.strftime(_TIMESTAMP_FORMAT, time.gmtime(now - grace)),
+            'since': '' if not previous else time.strftime(
+                _TIMESTAMP_FORMAT,
+                time.gmtime(calendar.timegm(time.strptime(previous, _TIMESTAMP_FORMAT)) - grace)),
+        }
+        # Último minuto exportado de cada partido activo: lo cerrado después va a partir de él
+        minutes = watermarks.get('match_minutes', {})
+        
+        def new_minute(row, columns):
+            match_id, minute = row[columns.index('match_id')], row[columns.index('minute')]
+            if minute <= minutes.get(match_id, -1):
+                return False
+            minutes[match_id] = minute
+            return True
+        
+        with self.logger.reader() as conn:
+            last_alert = conn.execute('SELECT COALESCE(MAX(id), 0) FROM alerts').fetchone()[0]
+            exported = {
+                'matches': self._export_query(
+                    pa, pc, pq, conn, 'matches', schemas['matches'], self.MATCHES_SQL,
+                    params, run_id, keep=new_minute),
+                'alerts': self._export_query(
+                    pa, pc, pq, conn, 'alerts', schemas['alerts'], self.ALERTS_SQL,
+                    (watermarks.get('alerts', 0), last_alert), run_id),
+            }
+            active = {match_id for (match_id,) in conn.execute(self.ACTIVE_MATCHES_SQL, params)}
+        
+        watermarks.update(matches=cutoff, alerts=last_alert,
+                          match_minutes={m: v for m, v in minutes.items() if m in active})
+        self._save_watermarks(watermarks)
+        print(f"✅ Exportados {exported['matches']} snapshots y {exported['alerts']} alertas a {self.output_dir}")
+        return exported
+    
+    def _export_query(self, pa, pc, pq, conn: sqlite3.Connection, table: str, schema,
+                      sql: str, params, run_id: str, keep=None) -> int:
+        """Escribe el resultado de la consulta; keep(fila, columnas) puede descartar filas"""
+        cursor = conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description]
+        league_idx = columns.index('league')
+        data_idx = [columns.index(name) for name in schema.names]
+        
+        writer = None
+        current = None
+        total = 0
+        try:
+            while True:
+                rows = cursor.fetchmany(self.chunk_rows)
+                if not rows:
+                    break
+                if keep is not None:
+                    rows = [row for row in rows if keep(row, columns)]
+                    if not rows:
+                        continue
+                # Un bloque puede cruzar varias particiones: llegan ordenadas y contiguas
+                start = 0
+                for i in range(1, len(rows) + 1):
+                    if i < len(rows) and (rows[i][0], rows[i][league_idx]) == (rows[start][0], rows[start][league_idx]):
+                        continue
+                    key = (rows[start][0], rows[start][league_idx])
+                    if key != current:
+                        if writer is not None:
+                            writer.close()
+                        writer = pq.ParquetWriter(self._partition_file(table, key, run_id), schema)
+                        current = key
+                    writer.write_table(self._to_table(pa, pc, schema, rows[start:i], data_idx))
+                    total += i - start
+                    start = i
+        finally:
+            if writer is not None:
+                writer.close()
+        return total
+    
+    def _partition_file(self, table: str, key: Tuple[str, str], run_id: str) -> Path:
+        date, league = key
+        # Codificación URI: la que pyarrow.dataset deshace por defecto al leer particiones hive
+        folder = (self.output_dir / table / f"date={date or 'unknown'}"
+                  / f"league={quote(league or 'Unknown', safe='')}")
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"part-{run_id}.parquet"
+        n = 1
+        while path.exists():
+            path = folder / f"part-{run_id}-{n}.parquet"
+            n += 1
+        return path
+    
+    @staticmethod
+    def _to_table(pa, pc, schema, rows: List[Tuple], data_idx: List[int]):
+        arrays = []
+        for field, idx in zip(schema, data_idx):
+            values = [row[idx] for row in rows]
+            if field.name == 'timestamp':
+                arrays.append(pc.strptime(pa.array(values, pa.string()), format='%Y-%m-%d %H:%M:%S', unit='s'))
+            elif field.type == pa.bool_():
+                arrays.append(pa.array([None if v is None else bool(v) for v in values], pa.bool_()))
+            else:
+                arrays.append(pa.array(values, field.type))
+        return pa.Table.from_arrays(arrays, schema=schema)
+
+
 # ============================================================
 # FUNCIÓN DE INTEGRACIÓN (FUERA DE LA CLASE)
 # ============================================================
@@ -310,6 +1177,15 @@ def integrar_logger_en_main(logger: ImprovedDataLogger, match_id: str, minute: i
 
 
 if __name__ == "__main__":
+    import sys
+    
+    # py data_logger.py export [carpeta]: exporta a Parquet lo nuevo desde la última vez
+    if len(sys.argv) > 1 and sys.argv[1] == 'export':
+        logger = ImprovedDataLogger()
+        ParquetExporter(logger, sys.argv[2] if len(sys.argv) > 2 else EXPORT_DIR).export()
+        logger.close()
+        sys.exit(0)
+    
     # Ejemplo de uso
     logger = ImprovedDataLogger()
     reporter = AnalyticsReporter(logger)
@@ -1,35 +1,76 @@
 import re
-import requests
-from bs4 import BeautifulSoup
-from typing import Dict, List, Tuple
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from statistics import mean
+from cache_persistente import CacheFormaEquipos
+from cliente_http import http_get
 
-HEADERS = {
-    'User-Agent': (
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-        'AppleWebKit/537.36 (KHTML, like Gecko) '
-        'Chrome/91.0.4472.124 Safari/537.36'
-    )
-}
+URL_H2H_BASE = "https://m.flashscore.cl/detalle-del-partido/{}/?s=2&t=h2h"
 
 
-def obtener_historial_desde_h2h(partido_id: str, limite: int = 5) -> Tuple[List[Dict], List[Dict], str, str]:
+def obtener_historial_desde_h2h(partido_id: str, limite: int = 5,
+                                equipo_local: Optional[str] = None,
+                                equipo_visita: Optional[str] = None) -> Tuple[List[Dict], List[Dict], str, str]:
     """
     Extrae los últimos `limite` partidos de cada equipo desde la pestaña H2H
     de la versión móvil de Flashscore, usando el mid del partido actual.
+    Si se pasan los nombres del livescore y la forma de ambos equipos ya está
+    vigente en la caché de forma, no se descarga nada.
     Devuelve:
       - hist_local: lista de dicts con goles_favor/goles_contra del local
       - hist_visita: idem para el visitante
       - nombre_local_h2h, nombre_visita_h2h: como los muestra la página
     """
-    url_h2h = f"https://m.flashscore.cl/detalle-del-partido/{partido_id}/?s=2&t=h2h"
+    if equipo_local and equipo_visita:
+        cacheado = historial_desde_cache(equipo_local, equipo_visita, limite)
+        if cacheado is not None:
+            return cacheado
+
+    url_h2h = URL_H2H_BASE.format(partido_id)
     print(f"[H2H] Cargando URL: {url_h2h}")
 
-    resp = requests.get(url_h2h, headers=HEADERS, timeout=10)
+    resp = http_get(url_h2h, endpoint='h2h')
     resp.raise_for_status()
-    html = resp.text
+    return registrar_historial_h2h(resp.text, partido_id, limite, equipo_local, equipo_visita)
+
+
+def historial_desde_cache(equipo_local: str, equipo_visita: str,
+                          limite: int = 5) -> Optional[Tuple[List[Dict], List[Dict], str, str]]:
+    """Historiales de ambos equipos desde la caché de forma, o None si alguno no está vigente"""
+    forma_local = obtener_cache_forma().buscar(equipo_local)
+    forma_visita = obtener_cache_forma().buscar(equipo_visita)
+    if forma_local is None or forma_visita is None:
+        return None
+
+    print(f"[H2H] Forma desde caché: {forma_local['nombre']} / {forma_visita['nombre']}")
+    return (_historial_de_forma(forma_local, limite), _historial_de_forma(forma_visita, limite),
+            forma_local['nombre'], forma_visita['nombre'])
+
+
+def registrar_historial_h2h(html: str, partido_id: str, limite: int = 5,
+                            equipo_local: Optional[str] = None,
+                            equipo_visita: Optional[str] = None) -> Tuple[List[Dict], List[Dict], str, str]:
+    """Parsea una pestaña H2H recién descargada y funde sus resultados en la caché de forma"""
+    hist_local, hist_visita, nombre_local, nombre_visita = parsear_historial_h2h(html, partido_id, limite)
+    if not nombre_local or not nombre_visita:
+        return hist_local, hist_visita, nombre_local, nombre_visita
+
+    forma_local = obtener_cache_forma().actualizar(nombre_local, hist_local, alias=(equipo_local,))
+    forma_visita = obtener_cache_forma().actualizar(nombre_visita, hist_visita, alias=(equipo_visita,))
+    return (_historial_de_forma(forma_local, limite), _historial_de_forma(forma_visita, limite),
+            nombre_local, nombre_visita)
+
+
+def _historial_de_forma(forma: Dict, limite: int) -> List[Dict]:
+    return [dict(r, equipo=forma['nombre']) for r in forma['resultados'][:limite]]
+
+
+def parsear_historial_h2h(html: str, partido_id: str, limite: int = 5) -> Tuple[List[Dict], List[Dict], str, str]:
+    """Parsea el HTML de la pestaña H2H (ver obtener_historial_desde_h2h)"""
     print(f"[H2H] HTML recibido, longitud={len(html)}")
 
+    from bs4 import BeautifulSoup
     soup = BeautifulSoup(html, "html.parser")
 
     # Buscar encabezados "Últimos partidos: X"
@@ -106,6 +147,7 @@ def extraer_partidos_tabla(tabla, nombre_equipo: str, limite: int) -> List[Dict]
             continue
 
         # spans[0] = fecha, spans[1] = "EquipoA - EquipoB"
+        fecha = _fecha_iso(spans[0].get_text(strip=True))
         texto_partidos = spans[1].get_text(" ", strip=True)
         marcador_tag = td.find("b")
         if not marcador_tag:
@@ -132,9 +174,9 @@ def extraer_partidos_tabla(tabla, nombre_equipo: str, limite: int) -> List[Dict]
 
         # Determinar si nuestro equipo es local (eq_a) o visita (eq_b)
         if _team_matches(nombre_equipo, eq_a):
-            gf, gc = goles_a, goles_b
+            gf, gc, rival = goles_a, goles_b, eq_b
         elif _team_matches(nombre_equipo, eq_b):
-            gf, gc = goles_b, goles_a
+            gf, gc, rival = goles_b, goles_a, eq_a
         else:
         # Debug útil: ver por qué no matchea
         # print(f"[H2H] Skip (no match) target='{nombre_equipo}' vs '{eq_a}' / '{eq_b}' | marcador={marcador}")
@@ -144,12 +186,23 @@ def extraer_partidos_tabla(tabla, nombre_equipo: str, limite: int) -> List[Dict]
             "equipo": nombre_equipo,
             "goles_favor": gf,
             "goles_contra": gc,
+            "fecha": fecha,
+            "rival": rival,
         })
 
     print(f"[H2H] {nombre_equipo}: partidos parseados = {len(partidos)}")
     return partidos
 
 
+def _fecha_iso(texto: str) -> str:
+    """'29.11.2025' (o '29.11.25') -> '2025-11-29'; cadena vacía si no es una fecha"""
+    for formato in ("%d.%m.%Y", "%d.%m.%y"):
+        try:
+            return datetime.strptime(texto.strip(), formato).date().isoformat()
+        except ValueError:
+            continue
+    return ""
+
 
 def _norm_team_name(s: str) -> str:
     s = (s or "").strip().lower()
@@ -201,6 +254,20 @@ def _team_matches(target: str, candidate: str) -> bool:
     hits = sum(1 for tok in t_tokens if tok in c)
     return hits / len(t_tokens) >= 0.6
 
+
+# Forma reciente por equipo, compartida entre partidos y reinicios (se abre al primer uso)
+_cache_forma: Optional[CacheFormaEquipos] = None
+_cache_forma_lock = threading.Lock()
+
+
+def obtener_cache_forma() -> CacheFormaEquipos:
+    global _cache_forma
+    if _cache_forma is None:
+        with _cache_forma_lock:
+            if _cache_forma is None:
+                _cache_forma = CacheFormaEquipos(normalizar=_norm_team_name)
+    return _cache_forma
+
 def analizar_patrones_simple(historial: List[Dict]) -> Dict:
     """
     Calcula forma básica (G-E-P), índice de forma, medias de GF/GC
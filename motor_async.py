@@ -0,0 +1,404 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import bot_apuestas_mejorado as bot
+from bot_apuestas_mejorado import EstadisticasPartido
+from cliente_http import CACHE_ESTADISTICAS, HEADERS, MAX_CONEXIONES_POR_HOST, TIMEOUTS
+from data_logger import ImprovedDataLogger
+from historical_from_h2h import URL_H2H_BASE, historial_desde_cache, registrar_historial_h2h
+from planificador import INTERVALO_LIVESCORE, PlanificadorPartidos
+from precarga import VENTANA_PRECARGA_MIN, minutos_para_inicio
+from scoring_system import ScoringEngine
+
+
+# --- Configuración del modo asyncio ---
+ENRIQUECEDORES_ASYNC = 4          # tareas que descargan clasificación + H2H en paralelo
+PRECARGADORES_ASYNC = 2           # tareas que enriquecen partidos programados antes de empezar
+TIMEOUT_ENRIQUECIMIENTO = 20      # segundos que un partido nuevo espera su H2H antes de evaluarse igual
+ESPERA_LOTE_EVALUACION = 0.5      # segundos que se juntan partidos refrescados antes de evaluarlos en lote
+
+
+class MotorAsync:
+    """
+    Motor de sondeo basado en asyncio. Cada etapa corre como una tarea independiente:
+      - bucle_livescore: lee la portada en vivo y da de alta/baja partidos
+      - refrescar_partido: una tarea por partido que refresca sus estadísticas
+        con el intervalo que le asigna el planificador
+      - trabajador_evaluacion: evalúa las alertas de los partidos refrescados, en lote
+      - trabajador_enriquecimiento: clasificación + H2H de los partidos nuevos
+      - trabajador_precarga: lo mismo para los partidos programados, antes del inicio
+      - trabajador_telegram: envío de alertas en orden de llegada
+    Un H2H lento sólo retrasa al partido que lo necesita, nunca al resto.
+    """
+
+    def __init__(self, sesion: 'aiohttp.ClientSession', data_logger: ImprovedDataLogger,
+                 scoring_engine: ScoringEngine):
+        self.sesion = sesion
+        self.data_logger = data_logger
+        self.scoring_engine = scoring_engine
+        self.cola_telegram: asyncio.Queue = asyncio.Queue()
+        self.cola_enriquecimiento: asyncio.Queue = asyncio.Queue()
+        self.info_en_vivo: Dict[str, Dict] = {}
+        self.tareas_partido: Dict[str, asyncio.Task] = {}
+        self.enriquecido: Dict[str, asyncio.Event] = {}
+        self.planificador = PlanificadorPartidos(bot.REGLAS_EN_VIVO, (bot.REGLA_SCORING,))
+        self.despertadores: Dict[str, asyncio.Event] = {}
+        self.cola_precarga: asyncio.Queue = asyncio.Queue()
+        self.precargados: Dict[str, 'bot.Partido'] = {}
+        self.precargando: set = set()
+        self.por_evaluar: List['bot.Partido'] = []
+        self.hay_por_evaluar = asyncio.Event()
+
+    def enviar(self, mensaje: str):
+        """Encola una alerta; el envío real lo hace trabajador_telegram"""
+        self.cola_telegram.put_nowait(mensaje)
+
+    async def _descargar(self, url: str, endpoint: str = 'default', binario: bool = False):
+        conexion, lectura = TIMEOUTS.get(endpoint, TIMEOUTS['default'])
+        timeout = aiohttp.ClientTimeout(sock_connect=conexion, sock_read=lectura)
+        try:
+            async with self.sesion.get(url, timeout=timeout) as resp:
+                if resp.status != 200:
+                    print(f"⚠️ Respuesta {resp.status} para {url}")
+                    return None
+                return await resp.read() if binario else await resp.text()
+        except Exception as e:
+            print(f"Error descargando {url}: {e}")
+            return None
+
+    async def _descargar_estadisticas(self, partido_id: str) -> Optional[Dict]:
+        """GET condicional de la pestaña de estadísticas; sólo se parsea si la página cambió"""
+        url = bot.URL_ESTADISTICAS_BASE.format(partido_id)
+        conexion, lectura = TIMEOUTS['estadisticas']
+        timeout = aiohttp.ClientTimeout(sock_connect=conexion, sock_read=lectura)
+        try:
+            async with self.sesion.get(url, timeout=timeout,
+                                       headers=CACHE_ESTADISTICAS.cabeceras_condicionales(partido_id)) as resp:
+                cuerpo = await resp.text() if resp.status == 200 else None
+                status, cabeceras = resp.status, resp.headers
+        except Exception as e:
+            print(f"Error descargando {url}: {e}")
+            return None
+        return await asyncio.to_thread(CACHE_ESTADISTICAS.resolver, partido_id, status, cabeceras,
+                                       cuerpo, bot._parsear_estadisticas)
+
+    # --- Livescore ---
+
+    async def bucle_livescore(self):
+        while True:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Ejecutando verificación (async)...")
+            contenido = await self._descargar(bot.URL_LIVESCORE, 'livescore', binario=True)
+            if contenido is not None:
+                try:
+                    portada = await asyncio.to_thread(bot._extraer_portada, contenido)
+                    if portada is None:
+                        print("No se encontró el contenedor de partidos 'score-data'.")
+                    else:
+                        partidos, programados = portada
+                        self._programar_precarga(programados, partidos)
+                        self._sincronizar_partidos(partidos)
+                    # Lo registrado por los partidos desde la última vuelta, en una sola transacción
+                    self.data_logger.end_cycle()
+                except Exception as e:
+                    print(f"Error general en livescore async: {e}")
+            await asyncio.sleep(INTERVALO_LIVESCORE)
+
+    def _sincronizar_partidos(self, partidos: List[Dict]):
+        """Registra partidos nuevos, actualiza la info básica y cancela los que ya no están en vivo"""
+        vistos = set()
+        for info_basica in partidos:
+            partido_id = info_basica['partido_id']
+            vistos.add(partido_id)
+            self.info_en_vivo[partido_id] = info_basica
+
+            if partido_id not in bot.PARTIDOS_EN_SEGUIMIENTO:
+                partido = self.precargados.pop(partido_id, None)
+                if partido is not None:
+                    print(f"⚡ Pre-partido precargado para: {partido.equipos}")
+                    partido.tiene_estadisticas = info_basica.get('tiene_estadisticas', False)
+                    partido.tiene_apuestas = info_basica.get('tiene_apuestas', False)
+                else:
+                    equipos = f"{info_basica['equipo_local']} - {info_basica['equipo_visita']}"
+                    partido = bot._crear_partido(partido_id, equipos, info_basica.get('liga', 'Desconocida'), info_basica)
+                partido.actualizar_stats(EstadisticasPartido(
+                    minuto=0, g_local=0, g_visita=0, rojas_local=0, rojas_visita=0
+                ))
+                bot.PARTIDOS_EN_SEGUIMIENTO[partido_id] = partido
+                if partido.perfil_local is not None:
+                    # Ya enriquecido antes del inicio: sólo quedan las alertas pre-partido
+                    bot._enviar_alertas_prematch(partido, self.enviar)
+                else:
+                    self.enriquecido[partido_id] = asyncio.Event()
+                    self.cola_enriquecimiento.put_nowait(partido_id)
+
+            # Un gol o una roja despiertan al partido antes de su vencimiento
+            if self.planificador.observar(info_basica) and partido_id in self.despertadores:
+                self.despertadores[partido_id].set()
+
+            # La tarea termina sola si el partido dejó de seguirse (minuto > 95) y puede volver
+            tarea = self.tareas_partido.get(partido_id)
+            if tarea is None or tarea.done():
+                self.despertadores[partido_id] = asyncio.Event()
+                self.tareas_partido[partido_id] = asyncio.create_task(self.refrescar_partido(partido_id))
+
+        for partido_id in [pid for pid in self.tareas_partido if pid not in vistos]:
+            self.tareas_partido.pop(partido_id).cancel()
+            self.info_en_vivo.pop(partido_id, None)
+            self.despertadores.pop(partido_id, None)
+            self.planificador.descartar(partido_id)
+            CACHE_ESTADISTICAS.descartar(partido_id)
+
+        print(f'Partidos en vivo: {len(partidos)} | {self.planificador.resumen()} | {self.data_logger.summary()}')
+        bot._limpiar_partidos_finalizados(vistos)
+        seguidos = set(bot.PARTIDOS_EN_SEGUIMIENTO)
+        self.data_logger.retain_matches(seguidos)
+        self.scoring_engine.retain_matches(seguidos)
+
+    def _programar_precarga(self, programados: List[Dict], en_vivo: List[Dict]):
+        """Encola los partidos que empiezan pronto y olvida los precargados que ya no figuran"""
+        for info in programados:
+            partido_id = info['partido_id']
+            if partido_id in self.precargados or partido_id in self.precargando:
+                continue
+            faltan = minutos_para_inicio(info.get('hora'))
+            if faltan is not None and faltan > VENTANA_PRECARGA_MIN:
+                continue
+            self.precargando.add(partido_id)
+            self.cola_precarga.put_nowait(info)
+
+        vigentes = {info['partido_id'] for info in programados + en_vivo}
+        for partido_id in [pid for pid in self.precargados if pid not in vigentes]:
+            del self.precargados[partido_id]
+
+    async def trabajador_precarga(self):
+        while True:
+            info = await self.cola_precarga.get()
+            partido_id = info['partido_id']
+            try:
+                equipos = f"{info['equipo_local']} - {info['equipo_visita']}"
+                partido = bot._crear_partido(partido_id, equipos, info.get('liga', 'Desconocida'), info)
+                await self._cargar_prepartido(partido)
+                # Si empezó mientras se precargaba, ya lo enriquece la cola normal (desde la caché)
+                if partido_id not in bot.PARTIDOS_EN_SEGUIMIENTO:
+                    self.precargados[partido_id] = partido
+            except Exception as e:
+                print(f"⚠️ Error en precarga de {partido_id}: {e}")
+            finally:
+                self.precargando.discard(partido_id)
+                self.cola_precarga.task_done()
+
+    # --- Estadísticas por partido ---
+
+    async def refrescar_partido(self, partido_id: str):
+        evento = self.enriquecido.get(partido_id)
+        if evento is not None:
+            try:
+                await asyncio.wait_for(evento.wait(), TIMEOUT_ENRIQUECIMIENTO)
+            except asyncio.TimeoutError:
+                print(f"⚠️ Enriquecimiento lento para {partido_id}; se evalúa sin esperar al H2H")
+
+        while True:
+            await self._esperar_turno(partido_id)
+            stats_detalle = bot._estadisticas_vacias()
+            try:
+                resultado = await self._descargar_estadisticas(partido_id)
+                if resultado is not None:
+                    stats_detalle = resultado
+            except Exception as e:
+                print(f"Error extrayendo estadísticas {partido_id}: {e}")
+
+            info_basica = self.info_en_vivo.get(partido_id)
+            if info_basica is None or partido_id not in bot.PARTIDOS_EN_SEGUIMIENTO:
+                return
+
+            try:
+                self.por_evaluar.append(bot._actualizar_partido(info_basica, stats_detalle,
+                                                                self.data_logger, self.enviar))
+                self.hay_por_evaluar.set()
+            except Exception as e:
+                print(f"Error procesando partido {partido_id}: {e}")
+
+            partido = bot.PARTIDOS_EN_SEGUIMIENTO.get(partido_id)
+            if partido is not None:
+                self.planificador.reprogramar(partido)
+
+    async def trabajador_evaluacion(self):
+        """Evalúa de una vez las alertas de todos los partidos refrescados desde la última vuelta"""
+        while True:
+            await self.hay_por_evaluar.wait()
+            # Los refrescos vencen en grupo: una pausa corta junta los que terminan casi a la vez
+            await asyncio.sleep(ESPERA_LOTE_EVALUACION)
+            self.hay_por_evaluar.clear()
+            lote, self.por_evaluar = self.por_evaluar, []
+            lote = [p for p in lote if bot.PARTIDOS_EN_SEGUIMIENTO.get(p.id) is p]
+            try:
+                bot._evaluar_partidos(lote, self.scoring_engine, enviar=self.enviar)
+            except Exception as e:
+                print(f"Error evaluando alertas en lote: {e}")
+
+    async def _esperar_turno(self, partido_id: str):
+        """Duerme hasta el vencimiento del partido (o hasta un gol/roja) y reserva presupuesto"""
+        despertador = self.despertadores.get(partido_id)
+        espera = self.planificador.segundos_hasta(partido_id)
+        if despertador is not None and espera > 0:
+            try:
+                await asyncio.wait_for(despertador.wait(), espera)
+            except asyncio.TimeoutError:
+                pass
+            despertador.clear()
+        while not self.planificador.consumir():
+            await asyncio.sleep(self.planificador.espera_presupuesto())
+
+    # --- Enriquecimiento (clasificación + H2H) ---
+
+    async def trabajador_enriquecimiento(self):
+        while True:
+            partido_id = await self.cola_enriquecimiento.get()
+            try:
+                partido = bot.PARTIDOS_EN_SEGUIMIENTO.get(partido_id)
+                if partido is not None:
+                    await self._enriquecer(partido)
+            except Exception as e:
+                print(f"⚠️ ERROR en enriquecimiento de {partido_id}: {e}")
+            finally:
+                evento = self.enriquecido.pop(partido_id, None)
+                if evento is not None:
+                    evento.set()
+                self.cola_enriquecimiento.task_done()
+
+    async def _clasificacion(self, partido: 'bot.Partido') -> List[Dict]:
+        """Tabla de posiciones desde la caché persistente; sólo se descarga si falta la de su liga"""
+        tabla = await asyncio.to_thread(bot.obtener_cache_clasificaciones().buscar,
+                                        partido.equipo_local, partido.equipo_visita)
+        if tabla is not None:
+            print(f"📦 Clasificación desde caché para: {partido.equipos}")
+            return tabla
+
+        html_tabla = await self._descargar(bot.URL_CLASIFICACION_BASE.format(partido.id), 'clasificacion')
+        if html_tabla is None:
+            return []
+        tabla = await asyncio.to_thread(bot._parsear_clasificacion, html_tabla, partido.id)
+        await asyncio.to_thread(bot.obtener_cache_clasificaciones().guardar, partido.liga, tabla)
+        return tabla
+
+    async def _historial(self, partido: 'bot.Partido'):
+        """Forma de ambos equipos desde la caché; si alguno no está vigente se descarga el H2H"""
+        historial = await asyncio.to_thread(historial_desde_cache,
+                                            partido.equipo_local, partido.equipo_visita)
+        if historial is not None:
+            return historial
+
+        html_h2h = await self._descargar(URL_H2H_BASE.format(partido.id), 'h2h')
+        if html_h2h is None:
+            raise ValueError("pestaña H2H no disponible")
+        return await asyncio.to_thread(registrar_historial_h2h, html_h2h, partido.id, 5,
+                                       partido.equipo_local, partido.equipo_visita)
+
+    async def _enriquecer(self, partido: 'bot.Partido'):
+        await self._cargar_prepartido(partido)
+        bot._enviar_alertas_prematch(partido, self.enviar)
+
+    async def _cargar_prepartido(self, partido: 'bot.Partido'):
+        print(f"⚙️ Cargando clasificación e H2H para: {partido.equipos}...")
+        tabla, historial = await asyncio.gather(
+            self._clasificacion(partido),
+            self._historial(partido),
+            return_exceptions=True,
+        )
+
+        try:
+            if isinstance(tabla, Exception):
+                raise tabla
+            bot._aplicar_clasificacion(partido, tabla)
+        except Exception as e:
+            print(f"⚠️ ERROR al cargar clasificación de liga para {partido.equipos}: {e}")
+
+        try:
+            if isinstance(historial, Exception):
+                raise historial
+            bot._aplicar_historial(partido, *historial)
+        except Exception as e:
+            print(f"⚠️ ERROR al cargar historial H2H para {partido.equipos}. Continuará sin análisis histórico. Error: {e}")
+
+    # --- Telegram ---
+
+    async def trabajador_telegram(self):
+        while True:
+            mensaje = await self.cola_telegram.get()
+            try:
+                credenciales = bot._credenciales_telegram()
+                if not credenciales:
+                    print("ERROR: Configura 'TELEGRAM_BOT_TOKEN' y 'TELEGRAM_CHAT_ID' (o ajusta idBot/idGrupo) con tus credenciales de Telegram.")
+                    continue
+                token, chat_id = credenciales
+                conexion, lectura = TIMEOUTS['telegram']
+                timeout = aiohttp.ClientTimeout(sock_connect=conexion, sock_read=lectura)
+                async with self.sesion.post(bot.URL_TELEGRAM.format(token), timeout=timeout,
+                                            data={'chat_id': chat_id, 'text': mensaje}) as resp:
+                    await resp.read()
+            except Exception as e:
+                print(f"Error enviando Telegram: {e}")
+            finally:
+                self.cola_telegram.task_done()
+
+    async def ejecutar(self):
+        tareas = [
+            asyncio.create_task(self.bucle_livescore()),
+            asyncio.create_task(self.trabajador_telegram()),
+            asyncio.create_task(self.trabajador_evaluacion()),
+        ]
+        tareas += [asyncio.create_task(self.trabajador_enriquecimiento()) for _ in range(ENRIQUECEDORES_ASYNC)]
+        tareas += [asyncio.create_task(self.trabajador_precarga()) for _ in range(PRECARGADORES_ASYNC)]
+        try:
+            await asyncio.gather(*tareas)
+        finally:
+            for tarea in tareas + list(self.tareas_partido.values()):
+                tarea.cancel()
+
+
+async def _main_async():
+    data_logger = ImprovedDataLogger()
+    scoring_engine = bot.MOTOR_SCORING
+
+    print("✅ Sistema de scoring inicializado")
+    print("✅ Logger de datos históricos inicializado")
+    bot._sembrar_estadisticas_ligas(data_logger)
+
+    conector = aiohttp.TCPConnector(
+        limit=bot.MAX_WORKERS_ESTADISTICAS,
+        limit_per_host=MAX_CONEXIONES_POR_HOST,
+    )
+    async with aiohttp.ClientSession(headers=HEADERS, connector=conector) as sesion:
+        try:
+            await MotorAsync(sesion, data_logger, scoring_engine).ejecutar()
+        finally:
+            data_logger.close()
+
+
+def run_bot_async():
+    print("Iniciando Bot de Análisis de Flashscore (modo asyncio)...")
+
+    if aiohttp is None:
+        print("ERROR: el modo asyncio requiere 'aiohttp' (pip install aiohttp).")
+        return
+
+    if not bot._credenciales_telegram():
+        print("\n=======================================================")
+        print("CONFIGURA: 'TELEGRAM_BOT_TOKEN' y 'TELEGRAM_CHAT_ID' (o ajusta idBot/idGrupo) con tus credenciales de Telegram.")
+        print("El bot no enviará alertas hasta configurarlo.")
+        print("=======================================================\n")
+
+    try:
+        asyncio.run(_main_async())
+    except KeyboardInterrupt:
+        print("\nBot detenido por el usuario.")
+
+
+if __name__ == "__main__":
+    run_bot_async()
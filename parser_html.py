@@ -0,0 +1,516 @@
+import html as _html
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+# Backends opcionales con parser en C; si no están instalados se usa BeautifulSoup.
+# bs4 tarda en importarse y sólo hace falta en la ruta de respaldo: se importa al usarla.
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:
+    _SelectolaxParser = None
+
+try:
+    from lxml import etree as _etree
+    from lxml import html as _lxml_html
+except ImportError:
+    _etree = None
+    _lxml_html = None
+
+# Fila de estadística: (nombre en minúsculas, texto local, texto visita)
+FilaEstadistica = Tuple[str, str, str]
+
+CLASE_FILA = 'wcl-row_'
+CLASE_CATEGORIA = 'wcl-category_'
+CLASE_LOCAL = 'wcl-homeValue_'
+CLASE_VISITA = 'wcl-awayValue_'
+
+# Permite forzar un backend: PARSER_HTML=selectolax|lxml|bs4
+BACKEND_FORZADO = os.getenv('PARSER_HTML', '').strip().lower()
+
+
+# --- BeautifulSoup (ruta original) ---
+
+_RE_FILA = re.compile(CLASE_FILA)
+_RE_CATEGORIA = re.compile(CLASE_CATEGORIA)
+_RE_LOCAL = re.compile(CLASE_LOCAL)
+_RE_VISITA = re.compile(CLASE_VISITA)
+
+
+def _filas_bs4(html: str) -> List[FilaEstadistica]:
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    filas = []
+    for fila in soup.find_all("div", class_=_RE_FILA):
+        nombre_div = fila.find("div", class_=_RE_CATEGORIA)
+        if not nombre_div:
+            continue
+        valor_local_div = fila.find("div", class_=_RE_LOCAL)
+        valor_visita_div = fila.find("div", class_=_RE_VISITA)
+        if not valor_local_div or not valor_visita_div:
+            continue
+        filas.append((
+            nombre_div.get_text(strip=True).lower(),
+            valor_local_div.get_text(strip=True),
+            valor_visita_div.get_text(strip=True),
+        ))
+    return filas
+
+
+# --- selectolax (Lexbor) ---
+
+def _css_clase(clase: str) -> str:
+    return f'div[class*="{clase}"]'
+
+
+_CSS_FILA = _css_clase(CLASE_FILA)
+_CSS_CATEGORIA = _css_clase(CLASE_CATEGORIA)
+_CSS_LOCAL = _css_clase(CLASE_LOCAL)
+_CSS_VISITA = _css_clase(CLASE_VISITA)
+
+
+def _filas_selectolax(html: str) -> List[FilaEstadistica]:
+    arbol = _SelectolaxParser(html)
+    filas = []
+    for fila in arbol.css(_CSS_FILA):
+        nombre_div = fila.css_first(_CSS_CATEGORIA)
+        if nombre_div is None:
+            continue
+        valor_local_div = fila.css_first(_CSS_LOCAL)
+        valor_visita_div = fila.css_first(_CSS_VISITA)
+        if valor_local_div is None or valor_visita_div is None:
+            continue
+        filas.append((
+            nombre_div.text(strip=True).lower(),
+            valor_local_div.text(strip=True),
+            valor_visita_div.text(strip=True),
+        ))
+    return filas
+
+
+# --- lxml (XPath precompilado) ---
+
+def _xpath_clase(clase: str, relativo: bool):
+    eje = './/' if relativo else '//'
+    expresion = f'{eje}div[contains(@class, "{clase}")]'
+    return _etree.XPath(f'({expresion})[1]' if relativo else expresion)
+
+
+if _etree is not None:
+    _XP_FILA = _xpath_clase(CLASE_FILA, relativo=False)
+    _XP_CATEGORIA = _xpath_clase(CLASE_CATEGORIA, relativo=True)
+    _XP_LOCAL = _xpath_clase(CLASE_LOCAL, relativo=True)
+    _XP_VISITA = _xpath_clase(CLASE_VISITA, relativo=True)
+
+
+def _texto_lxml(elemento) -> str:
+    # Equivale a get_text(strip=True): concatena los textos ignorando comentarios
+    return ''.join(t.strip() for t in elemento.itertext(_etree.Element))
+
+
+def _filas_lxml(html: str) -> List[FilaEstadistica]:
+    if not html.strip():
+        return []
+    raiz = _lxml_html.fromstring(html)
+    filas = []
+    for fila in _XP_FILA(raiz):
+        nombre_div = _XP_CATEGORIA(fila)
+        if not nombre_div:
+            continue
+        valor_local_div = _XP_LOCAL(fila)
+        valor_visita_div = _XP_VISITA(fila)
+        if not valor_local_div or not valor_visita_div:
+            continue
+        filas.append((
+            _texto_lxml(nombre_div[0]).lower(),
+            _texto_lxml(valor_local_div[0]),
+            _texto_lxml(valor_visita_div[0]),
+        ))
+    return filas
+
+
+BACKENDS: Dict[str, Optional[Callable[[str], List[FilaEstadistica]]]] = {
+    'selectolax': _filas_selectolax if _SelectolaxParser is not None else None,
+    'lxml': _filas_lxml if _etree is not None else None,
+    'bs4': _filas_bs4,
+}
+
+
+def backends_disponibles() -> List[str]:
+    return [nombre for nombre, funcion in BACKENDS.items() if funcion is not None]
+
+
+def _elegir_backend() -> str:
+    if BACKEND_FORZADO:
+        if BACKENDS.get(BACKEND_FORZADO) is not None:
+            return BACKEND_FORZADO
+        print(f"⚠️ PARSER_HTML={BACKEND_FORZADO} no disponible; se usa el más rápido instalado")
+    return backends_disponibles()[0]
+
+
+BACKEND_ACTIVO = _elegir_backend()
+
+
+def extraer_filas_estadisticas(html: str) -> List[FilaEstadistica]:
+    """Filas (nombre, local, visita) de la pestaña 'Estadísticas' con el backend más rápido disponible"""
+    try:
+        return BACKENDS[BACKEND_ACTIVO](html)
+    except Exception as e:
+        if BACKEND_ACTIVO == 'bs4':
+            raise
+        print(f"⚠️ Parser {BACKEND_ACTIVO} falló ({e}); se reintenta con BeautifulSoup")
+        return _filas_bs4(html)
+
+
+def comparar_backends(html: str) -> Dict[str, List[FilaEstadistica]]:
+    """
+    Extrae las filas con todos los backends instalados y devuelve sólo los que
+    difieren de BeautifulSoup (dict vacío = todos coinciden).
+    """
+    referencia = _filas_bs4(html)
+    return {
+        nombre: filas
+        for nombre in backends_disponibles() if nombre != 'bs4'
+        for filas in [BACKENDS[nombre](html)]
+        if filas != referencia
+    }
+
+
+# --- Portada livescore ---
+#
+# Un único barrido con patrones precompilados sobre los bytes crudos de la sección
+# 'score-data', sin construir DOM. Cada <br> cierra el partido en curso.
+
+_RE_SCORE_DATA = re.compile(rb"""<(\w+)[^>]*\bid=["']?score-data["'\s>]""")
+
+_RE_TOKENS_LIVESCORE = re.compile(
+    rb"""(?P<br><br\s*/?>)"""
+    rb"""|<span class=["']live["']>(?P<minuto>[^<]+)</span>"""
+    rb"""|(?<=>)(?P<equipos>[^<>]+)<a class=["']live["'] href=["'](?P<href_marcador>[^"']+)["']>(?P<gl>\d+):(?P<gv>\d+)</a>"""
+    rb"""|(?<=>)(?P<equipos_prog>[^<>]+)<a [^>]*?href=["'](?P<href_prog>[^"']+)["'][^>]*>\s*-\s*:\s*-\s*</a>"""
+    rb"""|<span>(?P<hora>\d{1,2}:\d{2})</span>"""
+    rb"""|class=["'][^"']*league[^"']*["']>(?P<liga>[^<]+)</[^>]+>"""
+    rb"""|class=["']rcard-(?P<rojas>\d+)["']"""
+    rb"""|href=["'](?P<href>[^"']*)["']""",
+    re.IGNORECASE,
+)
+
+_RE_ID_PARTIDO = re.compile(rb'/detalle-del-partido/([a-zA-Z0-9]{8})/\?s=2$')
+_RE_EQUIPOS = re.compile(r'([^<>]+)\s*-\s*([^<>]+)', re.DOTALL)
+
+
+def _texto(valor: bytes) -> str:
+    return _html.unescape(valor.decode('utf-8', 'replace'))
+
+
+def _limites_score_data(contenido: bytes) -> Optional[Tuple[int, int]]:
+    """(inicio, fin) del contenedor 'score-data', siguiendo la profundidad de su etiqueta"""
+    apertura = _RE_SCORE_DATA.search(contenido)
+    if not apertura:
+        return None
+    etiqueta = apertura.group(1).lower()
+    inicio = contenido.index(b'>', apertura.end() - 1) + 1
+    patron = re.compile(rb'<(/?)' + re.escape(etiqueta) + rb'\b', re.IGNORECASE)
+    profundidad = 1
+    for m in patron.finditer(contenido, inicio):
+        profundidad += -1 if m.group(1) else 1
+        if profundidad == 0:
+            return inicio, m.start()
+    return inicio, len(contenido)
+
+
+def _cerrar_bloque(bloque: Dict) -> Optional[Dict]:
+    """Convierte lo acumulado entre dos <br> en el dict de info básica (o None si no es un partido en vivo)"""
+    if bloque.get('partido_id') is None or bloque.get('minuto') is None or bloque.get('marcador') is None:
+        return None
+
+    minuto_str = _texto(bloque['minuto']).replace("'", "").replace("+", "").strip()
+    if minuto_str.lower().startswith("descanso"):
+        minuto = 45
+    elif minuto_str.isdigit():
+        minuto = int(minuto_str)
+    else:
+        return None
+
+    equipos, goles_local, goles_visita = bloque['marcador']
+    equipos_match = _RE_EQUIPOS.fullmatch(_texto(equipos))
+    if not equipos_match:
+        return None
+
+    tarjetas = bloque['rojas']
+    if len(tarjetas) == 2:
+        rojas_local, rojas_visita = tarjetas
+    elif len(tarjetas) == 1:
+        rojas_local, rojas_visita = tarjetas[0], 0
+    elif len(tarjetas) > 2:
+        rojas_local, rojas_visita = sum(tarjetas[::2]), sum(tarjetas[1::2])
+    else:
+        rojas_local, rojas_visita = 0, 0
+
+    return {
+        'partido_id': bloque['partido_id'],
+        'equipo_local': equipos_match.group(1).strip(),
+        'equipo_visita': equipos_match.group(2).strip(),
+        'minuto': minuto,
+        'goles_local': goles_local,
+        'goles_visita': goles_visita,
+        'rojas_local': rojas_local,
+        'rojas_visita': rojas_visita,
+        'liga': _texto(bloque['liga']).strip() if bloque.get('liga') else 'Desconocida',
+        'tiene_estadisticas': bloque['tiene_estadisticas'],
+        'tiene_apuestas': bloque['tiene_apuestas'],
+    }
+
+
+def _nuevo_bloque() -> Dict:
+    return {'rojas': [], 'tiene_estadisticas': False, 'tiene_apuestas': False}
+
+
+def _anotar_href(bloque: Dict, href: bytes):
+    if bloque.get('partido_id') is None:
+        m = _RE_ID_PARTIDO.search(href)
+        if m:
+            bloque['partido_id'] = m.group(1).decode('ascii')
+    if b't=estadisticas' in href:
+        bloque['tiene_estadisticas'] = True
+    if b't=apuestas' in href or b't=betting' in href:
+        bloque['tiene_apuestas'] = True
+
+
+def _cerrar_programado(bloque: Dict) -> Optional[Dict]:
+    """Partido aún no iniciado ('-:-'): equipos, liga y hora de inicio si la trae"""
+    if bloque.get('partido_id') is None or bloque.get('programado') is None or bloque.get('minuto') is not None:
+        return None
+    equipos_match = _RE_EQUIPOS.fullmatch(_texto(bloque['programado']))
+    if not equipos_match:
+        return None
+    return {
+        'partido_id': bloque['partido_id'],
+        'equipo_local': equipos_match.group(1).strip(),
+        'equipo_visita': equipos_match.group(2).strip(),
+        'hora': bloque['hora'].decode('ascii') if bloque.get('hora') else None,
+        'liga': _texto(bloque['liga']).strip() if bloque.get('liga') else 'Desconocida',
+    }
+
+
+def _iterar_bloques(contenido: bytes, inicio: int, fin: int) -> Iterator[Dict]:
+    """
+    Recorre una sola vez contenido[inicio:fin]; cada <br> cierra un bloque. La cabecera
+    de liga sólo precede al primer partido de su grupo: vale para los bloques siguientes
+    hasta la próxima cabecera.
+    """
+    liga = None
+    bloque = _nuevo_bloque()
+    for m in _RE_TOKENS_LIVESCORE.finditer(contenido, inicio, fin):
+        tipo = m.lastgroup
+        if tipo == 'br':
+            yield bloque
+            bloque = _nuevo_bloque()
+            if liga is not None:
+                bloque['liga'] = liga
+        elif m.group('minuto') is not None:
+            bloque.setdefault('minuto', m.group('minuto'))
+        elif m.group('equipos') is not None:
+            bloque.setdefault('marcador', (m.group('equipos'), int(m.group('gl')), int(m.group('gv'))))
+            _anotar_href(bloque, m.group('href_marcador'))
+        elif m.group('equipos_prog') is not None:
+            bloque.setdefault('programado', m.group('equipos_prog'))
+            _anotar_href(bloque, m.group('href_prog'))
+        elif tipo == 'hora':
+            bloque.setdefault('hora', m.group('hora'))
+        elif tipo == 'liga':
+            bloque['liga'] = liga = m.group('liga')
+        elif tipo == 'rojas':
+            bloque['rojas'].append(int(m.group('rojas')))
+        elif tipo == 'href':
+            _anotar_href(bloque, m.group('href'))
+    yield bloque
+
+
+def iterar_partidos_livescore(contenido: bytes, inicio: int, fin: int) -> Iterator[Dict]:
+    """Va entregando cada partido en vivo de contenido[inicio:fin]"""
+    for bloque in _iterar_bloques(contenido, inicio, fin):
+        info = _cerrar_bloque(bloque)
+        if info:
+            yield info
+
+
+_RE_LIGA_BS4 = re.compile(r'class="[^"]*league[^"]*">([^<]+)</[^>]+>', re.IGNORECASE)
+
+
+def _partidos_livescore_bs4(html: str) -> Optional[List[Dict]]:
+    """Ruta original: árbol BeautifulSoup de la portada, split por <br> y regex por bloque"""
+    from bs4 import BeautifulSoup
+    score_data = BeautifulSoup(html, 'html.parser').find(id='score-data')
+    if not score_data:
+        return None
+    partidos = []
+    liga = None
+    for bloque in re.split(r'<br\s*/?>', str(score_data)):
+        liga_match = _RE_LIGA_BS4.search(bloque)
+        if liga_match:
+            liga = liga_match.group(1)
+        if 'detalle-del-partido' not in bloque:
+            continue
+        info = _info_basica_bs4(bloque, liga)
+        if info:
+            partidos.append(info)
+    return partidos
+
+
+def _info_basica_bs4(html_partido: str, liga: Optional[str] = None) -> Optional[Dict]:
+    """Info de un bloque entre dos <br>; liga es la última cabecera vista antes del bloque"""
+    try:
+        partido_id = re.search(r'href="/detalle-del-partido/([a-zA-Z0-9]{8})/\?s=2"', html_partido).group(1)
+        minuto_str_match = re.search(r'<span class="live">([^<]+)</span>', html_partido)
+        if not minuto_str_match:
+            return None
+        minuto_str = minuto_str_match.group(1).replace("'", "").replace("+", "").strip()
+        if minuto_str.lower().startswith("descanso"):
+            minuto = 45
+        elif minuto_str.isdigit():
+            minuto = int(minuto_str)
+        else:
+            return None
+
+        marcador_match = re.search(r'>([^<>]+)\s*-\s*([^<>]+)\s*<a class="live" href="[^"]+">(\d+):(\d+)</a>', html_partido, re.DOTALL)
+        if not marcador_match:
+            return None
+
+        tarjetas = [int(t) for t in re.findall(r'class="rcard-(\d+)"', html_partido)]
+        if len(tarjetas) == 2:
+            rojas_local, rojas_visita = tarjetas
+        elif len(tarjetas) == 1:
+            rojas_local, rojas_visita = tarjetas[0], 0
+        elif len(tarjetas) > 2:
+            rojas_local, rojas_visita = sum(tarjetas[::2]), sum(tarjetas[1::2])
+        else:
+            rojas_local, rojas_visita = 0, 0
+
+        return {
+            'partido_id': partido_id,
+            'equipo_local': marcador_match.group(1).strip(),
+            'equipo_visita': marcador_match.group(2).strip(),
+            'minuto': minuto,
+            'goles_local': int(marcador_match.group(3)),
+            'goles_visita': int(marcador_match.group(4)),
+            'rojas_local': rojas_local,
+            'rojas_visita': rojas_visita,
+            'liga': liga.strip() if liga else 'Desconocida',
+            'tiene_estadisticas': 't=estadisticas' in html_partido,
+            'tiene_apuestas': 't=apuestas' in html_partido or 't=betting' in html_partido,
+        }
+    except Exception:
+        return None
+
+
+def extraer_partidos_livescore(contenido: Union[bytes, str]) -> Optional[List[Dict]]:
+    """
+    Info básica de cada partido en vivo de la portada.
+    Devuelve None si la página no trae el contenedor 'score-data'.
+    """
+    if isinstance(contenido, str):
+        contenido = contenido.encode('utf-8')
+    try:
+        limites = _limites_score_data(contenido)
+        if limites is None:
+            return None
+        return list(iterar_partidos_livescore(contenido, *limites))
+    except Exception as e:
+        print(f"⚠️ Extractor rápido de livescore falló ({e}); se reintenta con BeautifulSoup")
+        return _partidos_livescore_bs4(contenido.decode('utf-8', 'replace'))
+
+
+def extraer_portada_livescore(contenido: Union[bytes, str]) -> Optional[Tuple[List[Dict], List[Dict]]]:
+    """
+    (en vivo, programados) de la portada en un solo barrido.
+    Devuelve None si la página no trae el contenedor 'score-data'.
+    """
+    if isinstance(contenido, str):
+        contenido = contenido.encode('utf-8')
+    try:
+        limites = _limites_score_data(contenido)
+        if limites is None:
+            return None
+        en_vivo, programados = [], []
+        for bloque in _iterar_bloques(contenido, *limites):
+            info = _cerrar_bloque(bloque)
+            if info:
+                en_vivo.append(info)
+                continue
+            info = _cerrar_programado(bloque)
+            if info:
+                programados.append(info)
+        return en_vivo, programados
+    except Exception as e:
+        print(f"⚠️ Extractor rápido de livescore falló ({e}); se reintenta con BeautifulSoup")
+        en_vivo = _partidos_livescore_bs4(contenido.decode('utf-8', 'replace'))
+        return None if en_vivo is None else (en_vivo, [])
+
+
+def comparar_livescore(contenido: Union[bytes, str]) -> List[Tuple[Optional[Dict], Optional[Dict]]]:
+    """
+    Pares (rápido, BeautifulSoup) que no coinciden; lista vacía = mismo resultado.
+    Los textos de referencia se comparan sin entidades HTML, que el extractor rápido ya decodifica.
+    """
+    if isinstance(contenido, str):
+        contenido = contenido.encode('utf-8')
+    rapido = extraer_partidos_livescore(contenido) or []
+    referencia = _partidos_livescore_bs4(contenido.decode('utf-8', 'replace')) or []
+    for info in referencia:
+        for clave in ('equipo_local', 'equipo_visita', 'liga'):
+            info[clave] = _html.unescape(info[clave])
+    diferencias = [(a, b) for a, b in zip(rapido, referencia) if a != b]
+    diferencias += [(a, None) for a in rapido[len(referencia):]]
+    diferencias += [(None, b) for b in referencia[len(rapido):]]
+    return diferencias
+
+
+def _medir(funcion: Callable[[str], List[FilaEstadistica]], html: str, repeticiones: int) -> float:
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion(html)
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+
+if __name__ == "__main__":
+    # Verificación de paridad y tiempos sobre páginas guardadas (estadísticas o portada livescore):
+    #   py parser_html.py paginas/*.html
+    if len(sys.argv) < 2:
+        print("Uso: py parser_html.py pagina.html [pagina2.html ...]")
+        sys.exit(2)
+
+    print(f"Backends disponibles: {', '.join(backends_disponibles())} (activo: {BACKEND_ACTIVO})")
+    diferencias = 0
+    for ruta in sys.argv[1:]:
+        with open(ruta, 'rb') as f:
+            contenido = f.read()
+        html = contenido.decode('utf-8', 'replace')
+
+        if _RE_SCORE_DATA.search(contenido):
+            distintos_livescore = comparar_livescore(contenido)
+            rapido = _medir(extraer_partidos_livescore, contenido, 20)
+            original = _medir(_partidos_livescore_bs4, html, 20)
+            # Con cabeceras de liga en la página, todo partido debe heredar la suya
+            sin_liga = [info for info in extraer_partidos_livescore(contenido) or []
+                        if info['liga'] == 'Desconocida'] if _RE_LIGA_BS4.search(html) else []
+            if distintos_livescore:
+                estado = f"❌ {len(distintos_livescore)} partidos difieren"
+            elif sin_liga:
+                estado = f"❌ {len(sin_liga)} partidos sin liga"
+            else:
+                estado = "✅"
+            print(f"{estado} {os.path.basename(ruta)} (livescore, {len(extraer_partidos_livescore(contenido))} partidos) "
+                  f"rápido: {rapido:.2f} ms | bs4: {original:.2f} ms")
+            diferencias += len(distintos_livescore) + len(sin_liga)
+            continue
+
+        distintos = comparar_backends(html)
+        tiempos = " | ".join(f"{nombre}: {_medir(BACKENDS[nombre], html, 20):.2f} ms"
+                             for nombre in backends_disponibles())
+        estado = "✅" if not distintos else f"❌ difiere en {', '.join(distintos)}"
+        print(f"{estado} {os.path.basename(ruta)} ({len(_filas_bs4(html))} filas) {tiempos}")
+        diferencias += len(distintos)
+    sys.exit(1 if diferencias else 0)
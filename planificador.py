@@ -0,0 +1,203 @@
+import heapq
+import random
+import time
+from itertools import islice
+from typing import Dict, List, Optional, Sequence, Tuple
+from reglas import IndiceReglas, ReglaAlerta
+
+# --- Configuración del planificador ---
+INTERVALO_CALIENTE = (15, 20)         # partidos calientes: ventana de alerta abierta, momentum, final ajustado
+INTERVALO_NORMAL = (55, 65)           # partidos con algo en juego pero sin urgencia
+INTERVALO_FRIO = (120, 180)           # partidos sin ventanas armadas o sin estadísticas
+INTERVALO_LIVESCORE = 20              # la portada detecta goles y rojas de todos los partidos en una sola petición
+ESPERA_MINIMA_CICLO = 5
+PRESUPUESTO_PETICIONES_MINUTO = 90    # peticiones de estadísticas por minuto para todos los partidos
+
+CALOR_CALIENTE = 3
+CALOR_NORMAL = 1
+
+def ventanas_armadas(partido, reglas: IndiceReglas, adicionales: Sequence[ReglaAlerta] = ()) -> int:
+    """
+    Cuántas alertas pueden dispararse aún en el snapshot actual del partido, con las mismas
+    condiciones que al evaluarlas: las candidatas de la tabla de reglas más las que se
+    evalúan aparte (adicionales) y no se han enviado.
+    """
+    s = partido.estadisticas_actuales
+    if s is None:
+        return 0
+    return len(reglas.candidatas(partido)) + sum(
+        1 for regla in adicionales if regla.puede_disparar(partido, s) and not regla.agotada(partido)
+    )
+
+
+class PlanificadorPartidos:
+    """
+    Asigna a cada partido su propio vencimiento de refresco según su estado
+    (minuto, ventanas de alerta armadas, momentum y disponibilidad de estadísticas)
+    y reparte las descargas dentro de un presupuesto global de peticiones.
+    """
+
+    def __init__(self, reglas: IndiceReglas, adicionales: Sequence[ReglaAlerta] = (),
+                 presupuesto_minuto: int = PRESUPUESTO_PETICIONES_MINUTO):
+        self.reglas = reglas
+        self.adicionales = tuple(adicionales)
+        self._cola: List[Tuple[float, str]] = []
+        self._vencimientos: Dict[str, float] = {}
+        self._marcadores: Dict[str, Tuple[int, int, int, int]] = {}
+        self.presupuesto_minuto = presupuesto_minuto
+        self._tokens = float(presupuesto_minuto)
+        self._ultima_recarga = time.monotonic()
+
+    # --- Prioridad ---
+
+    def calcular_calor(self, partido) -> int:
+        s = partido.estadisticas_actuales
+        if s is None or s.minuto == 0:
+            return CALOR_CALIENTE  # primer refresco: aún no sabemos nada del partido
+        if not partido.tiene_estadisticas:
+            return 0  # sin pestaña de estadísticas sólo cambia el marcador, que ya vigila la portada
+
+        armadas = ventanas_armadas(partido, self.reglas, self.adicionales)
+        if armadas == 0:
+            return 0
+
+        calor = 1 if armadas < 3 else 2
+        if s.minuto >= 75:
+            calor += 1
+        if s.minuto >= 60 and s.diferencia_goles <= 1:
+            calor += 1
+
+        # El momentum sólo cuenta si hay una lectura real reciente con la que comparar
+        # (contra la foto del minuto 0 mediría todo el partido)
+        referencia = next((h for h in islice(reversed(partido.historial), 1, None) if h.minuto > 0), None)
+        if referencia is not None and s.minuto - referencia.minuto <= 15:
+            momentum = partido.calcular_momentum(10)
+            tiros = sum(m.get('tiros_puerta', 0) for m in momentum.values())
+            remates = sum(m.get('remates', 0) for m in momentum.values())
+            corners = sum(m.get('corners', 0) for m in momentum.values())
+            if tiros >= 3 or remates >= 6 or corners >= 3:
+                calor += 1
+
+        return calor
+
+    def calcular_intervalo(self, partido) -> float:
+        calor = self.calcular_calor(partido)
+        if calor >= CALOR_CALIENTE:
+            rango = INTERVALO_CALIENTE
+        elif calor >= CALOR_NORMAL:
+            rango = INTERVALO_NORMAL
+        else:
+            rango = INTERVALO_FRIO
+        # Un poco de dispersión para que los partidos no venzan todos a la vez
+        return random.uniform(*rango)
+
+    # --- Vencimientos ---
+
+    def _programar(self, partido_id: str, vencimiento: float):
+        self._vencimientos[partido_id] = vencimiento
+        heapq.heappush(self._cola, (vencimiento, partido_id))
+        # El modo asyncio no vacía la cola (usa segundos_hasta): se compacta cuando las
+        # entradas obsoletas superan a las vigentes
+        if len(self._cola) > 2 * len(self._vencimientos) + 16:
+            self._cola = [(v, pid) for pid, v in self._vencimientos.items()]
+            heapq.heapify(self._cola)
+
+    def observar(self, info_basica: Dict, ahora: Optional[float] = None) -> bool:
+        """
+        Registra un partido visto en la portada. Devuelve True si debe refrescarse ya:
+        partido nuevo, o cambió el marcador o las rojas desde la última lectura.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        partido_id = info_basica['partido_id']
+        marcador = (info_basica['goles_local'], info_basica['goles_visita'],
+                    info_basica['rojas_local'], info_basica['rojas_visita'])
+        anterior = self._marcadores.get(partido_id)
+        self._marcadores[partido_id] = marcador
+
+        cambio = anterior is None or anterior != marcador
+        if cambio or partido_id not in self._vencimientos:
+            if self._vencimientos.get(partido_id, float('inf')) > ahora:
+                self._programar(partido_id, ahora)
+        return cambio
+
+    def reprogramar(self, partido, ahora: Optional[float] = None) -> float:
+        """Fija el siguiente vencimiento del partido tras refrescarlo; devuelve el intervalo"""
+        ahora = time.monotonic() if ahora is None else ahora
+        intervalo = self.calcular_intervalo(partido)
+        self._programar(partido.id, ahora + intervalo)
+        return intervalo
+
+    def segundos_hasta(self, partido_id: str, ahora: Optional[float] = None) -> float:
+        ahora = time.monotonic() if ahora is None else ahora
+        return max(0.0, self._vencimientos.get(partido_id, ahora) - ahora)
+
+    def segundos_hasta_proximo(self, ahora: Optional[float] = None) -> Optional[float]:
+        ahora = time.monotonic() if ahora is None else ahora
+        self._purgar_obsoletos()
+        if not self._cola:
+            return None
+        return max(0.0, self._cola[0][0] - ahora)
+
+    def espera_sugerida(self) -> float:
+        """Pausa del bucle principal: hasta el próximo vencimiento, sin dejar de leer la portada"""
+        proximo = self.segundos_hasta_proximo()
+        if proximo is None:
+            return INTERVALO_LIVESCORE
+        return max(ESPERA_MINIMA_CICLO, min(INTERVALO_LIVESCORE, proximo))
+
+    def pendientes(self, ahora: Optional[float] = None) -> List[str]:
+        """Partidos vencidos, del más atrasado al más reciente, hasta agotar el presupuesto"""
+        ahora = time.monotonic() if ahora is None else ahora
+        debidos = []
+        while self._cola and self._cola[0][0] <= ahora:
+            vencimiento, partido_id = self._cola[0]
+            if self._vencimientos.get(partido_id) != vencimiento:
+                heapq.heappop(self._cola)
+                continue
+            if not self.consumir():
+                break
+            heapq.heappop(self._cola)
+            del self._vencimientos[partido_id]
+            debidos.append(partido_id)
+        return debidos
+
+    def descartar(self, partido_id: str):
+        self._vencimientos.pop(partido_id, None)
+        self._marcadores.pop(partido_id, None)
+
+    def retener(self, en_vivo: set):
+        """Olvida los partidos que ya no aparecen en la portada"""
+        for partido_id in [pid for pid in self._marcadores if pid not in en_vivo]:
+            self.descartar(partido_id)
+
+    def _purgar_obsoletos(self):
+        while self._cola and self._vencimientos.get(self._cola[0][1]) != self._cola[0][0]:
+            heapq.heappop(self._cola)
+
+    # --- Presupuesto global (cubo de tokens) ---
+
+    def _recargar(self):
+        ahora = time.monotonic()
+        self._tokens = min(
+            float(self.presupuesto_minuto),
+            self._tokens + (ahora - self._ultima_recarga) * self.presupuesto_minuto / 60.0,
+        )
+        self._ultima_recarga = ahora
+
+    def consumir(self) -> bool:
+        self._recargar()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def espera_presupuesto(self) -> float:
+        """Segundos hasta que haya presupuesto para una petición más"""
+        self._recargar()
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) * 60.0 / self.presupuesto_minuto
+
+    def resumen(self) -> str:
+        self._recargar()
+        return f"programados: {len(self._vencimientos)} | presupuesto: {int(self._tokens)}/{self.presupuesto_minuto}"
@@ -0,0 +1,117 @@
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+# --- Configuración de la precarga pre-partido ---
+PRECARGA_WORKERS = 2               # hilos en segundo plano; no deben competir con el sondeo en vivo
+VENTANA_PRECARGA_MIN = 120         # se precargan los partidos que empiezan dentro de esta ventana
+ESPERA_PRECARGA_EN_CURSO = 5       # segundos que el inicio de un partido espera a una precarga ya lanzada
+MAX_ANTIGUEDAD_PRECARGA = 6 * 3600 # descarta lo precargado de partidos que nunca empezaron
+
+
+def minutos_para_inicio(hora: Optional[str], ahora: Optional[datetime] = None) -> Optional[float]:
+    """Minutos hasta una hora 'HH:MM' de hoy (o de mañana si ya pasó hace rato); None si no hay hora"""
+    if not hora:
+        return None
+    ahora = ahora or datetime.now()
+    try:
+        h, m = (int(x) for x in hora.split(':'))
+        inicio = ahora.replace(hour=h, minute=m, second=0, microsecond=0)
+    except ValueError:
+        return None
+    if inicio < ahora - timedelta(minutes=30):
+        inicio += timedelta(days=1)
+    return (inicio - ahora).total_seconds() / 60
+
+
+class PrecargaPrepartido:
+    """
+    Calcula en segundo plano el enriquecimiento pre-partido (clasificación, H2H, perfiles
+    y probabilidades) de los partidos programados, para que al empezar sólo haga falta
+    recoger el resultado. `calcular` recibe la info del partido programado y devuelve
+    el objeto ya enriquecido.
+    """
+
+    def __init__(self, calcular: Callable[[Dict], Any], workers: int = PRECARGA_WORKERS):
+        self.calcular = calcular
+        self.workers = workers
+        self._cola: 'queue.Queue[Dict]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._listos: Dict[str, Dict] = {}
+        self._en_curso: Dict[str, threading.Event] = {}
+        self._hilos: List[threading.Thread] = []
+        self._detener = threading.Event()
+
+    def _arrancar(self):
+        if self._hilos:
+            return
+        for i in range(self.workers):
+            hilo = threading.Thread(target=self._trabajar, name=f"precarga-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def programar(self, programados: List[Dict]) -> int:
+        """Encola los partidos que empiezan pronto y aún no están precargados; devuelve cuántos"""
+        encolados = 0
+        with self._lock:
+            for info in programados:
+                partido_id = info['partido_id']
+                if partido_id in self._listos or partido_id in self._en_curso:
+                    continue
+                faltan = minutos_para_inicio(info.get('hora'))
+                if faltan is not None and faltan > VENTANA_PRECARGA_MIN:
+                    continue
+                self._en_curso[partido_id] = threading.Event()
+                self._cola.put(info)
+                encolados += 1
+        if encolados:
+            self._arrancar()
+        return encolados
+
+    def _trabajar(self):
+        while not self._detener.is_set():
+            try:
+                info = self._cola.get(timeout=1)
+            except queue.Empty:
+                continue
+            partido_id = info['partido_id']
+            resultado = None
+            try:
+                resultado = self.calcular(info)
+            except Exception as e:
+                print(f"⚠️ Error en precarga de {partido_id}: {e}")
+            finally:
+                with self._lock:
+                    if resultado is not None:
+                        self._listos[partido_id] = {'resultado': resultado, 'creado': time.time()}
+                    evento = self._en_curso.pop(partido_id, None)
+                if evento is not None:
+                    evento.set()
+                self._cola.task_done()
+
+    def tomar(self, partido_id: str, espera: float = ESPERA_PRECARGA_EN_CURSO) -> Optional[Any]:
+        """Resultado precargado del partido (se retira); si se está calculando, lo espera un poco"""
+        with self._lock:
+            evento = self._en_curso.get(partido_id)
+        if evento is not None:
+            evento.wait(espera)
+        with self._lock:
+            entrada = self._listos.pop(partido_id, None)
+        return entrada['resultado'] if entrada else None
+
+    def retener(self, vigentes: set):
+        """Olvida lo precargado de partidos que ya no aparecen en la portada o son muy antiguos"""
+        limite = time.time() - MAX_ANTIGUEDAD_PRECARGA
+        with self._lock:
+            for partido_id in [pid for pid, e in self._listos.items()
+                               if pid not in vigentes or e['creado'] < limite]:
+                del self._listos[partido_id]
+
+    def resumen(self) -> str:
+        with self._lock:
+            return f"precargados: {len(self._listos)} | en curso: {len(self._en_curso)}"
+
+    def detener(self):
+        self._detener.set()
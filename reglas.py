@@ -0,0 +1,150 @@
+from typing import Callable, Iterator, List, Optional, Set, Tuple
+
+# --- Índice de reglas de alerta por tramo de minuto ---
+ANCHO_TRAMO = 5        # minutos por tramo del índice
+MINUTO_MAXIMO = 125    # el último tramo recoge todo lo posterior (prórrogas, descuentos largos)
+
+
+class ReglaAlerta:
+    """
+    Una alerta en vivo con sus condiciones de activación declaradas como datos. Las
+    condiciones son necesarias, no suficientes: si no se cumplen la alerta no puede
+    dispararse y ni se llama; si se cumplen, decide la propia función.
+
+    - funcion: recibe el partido y devuelve el mensaje o None; None si la alerta se evalúa aparte
+    - desde/hasta: minutos (inclusive) en los que la alerta puede dispararse; hasta=None sin límite
+    - requiere_estadisticas: sólo con pestaña de estadísticas
+    - banderas: atributos *_enviada del partido; con todos puestos la alerta se retira del partido
+    - max_diferencia_goles / max_goles: límites del marcador
+    - requiere_roja: sólo si hubo alguna expulsión en el partido
+    """
+    __slots__ = ('nombre', 'funcion', 'desde', 'hasta', 'requiere_estadisticas', 'banderas',
+                 'max_diferencia_goles', 'max_goles', 'requiere_roja')
+
+    def __init__(self, nombre: str, funcion: Optional[Callable], desde: int = 0, hasta: Optional[int] = None, *,
+                 requiere_estadisticas: bool = False, banderas: Tuple[str, ...] = (),
+                 max_diferencia_goles: Optional[int] = None, max_goles: Optional[int] = None,
+                 requiere_roja: bool = False):
+        self.nombre = nombre
+        self.funcion = funcion
+        self.desde = desde
+        self.hasta = hasta
+        self.requiere_estadisticas = requiere_estadisticas
+        self.banderas = banderas
+        self.max_diferencia_goles = max_diferencia_goles
+        self.max_goles = max_goles
+        self.requiere_roja = requiere_roja
+
+    def puede_disparar(self, partido, s) -> bool:
+        if s.minuto < self.desde or (self.hasta is not None and s.minuto > self.hasta):
+            return False
+        if self.requiere_estadisticas and not partido.tiene_estadisticas:
+            return False
+        if self.max_diferencia_goles is not None and s.diferencia_goles > self.max_diferencia_goles:
+            return False
+        if self.max_goles is not None and s.goles_local + s.goles_visita > self.max_goles:
+            return False
+        if self.requiere_roja and not (s.tarjetas_rojas_totales > 0
+                                       or partido.minuto_primera_roja_local is not None
+                                       or partido.minuto_primera_roja_visita is not None):
+            return False
+        return True
+
+    def agotada(self, partido) -> bool:
+        """True si ya se enviaron todas sus variantes (nunca para reglas sin banderas)"""
+        return bool(self.banderas) and all(getattr(partido, b, False) for b in self.banderas)
+
+
+class IndiceReglas:
+    """
+    Tabla de reglas en vivo. evaluar_lote() llama, para todos los partidos a la vez, sólo a
+    las reglas cuyas condiciones se cumplen y que no están agotadas en ese partido, en el
+    orden de la tabla. candidatas() responde lo mismo para un solo partido mirando sólo las
+    reglas de su tramo de minuto; el planificador la usa para contar las alertas aún posibles.
+    """
+
+    def __init__(self, reglas: List[ReglaAlerta], ancho_tramo: int = ANCHO_TRAMO):
+        self.reglas = reglas
+        self.ancho_tramo = ancho_tramo
+        self._condiciones = None   # arrays de candidatas_lote, creados en su primer uso
+        self._posicion = {r.nombre: j for j, r in enumerate(reglas)}
+        self._tramos: List[List[ReglaAlerta]] = []
+        for inicio in range(0, MINUTO_MAXIMO + 1, ancho_tramo):
+            ultimo = inicio + ancho_tramo > MINUTO_MAXIMO
+            fin = None if ultimo else inicio + ancho_tramo - 1
+            self._tramos.append([
+                r for r in reglas
+                if (fin is None or r.desde <= fin) and (r.hasta is None or r.hasta >= inicio)
+            ])
+
+    def tramo(self, minuto: int) -> List[ReglaAlerta]:
+        return self._tramos[min(max(minuto, 0) // self.ancho_tramo, len(self._tramos) - 1)]
+
+    def candidatas(self, partido) -> List[ReglaAlerta]:
+        """Reglas que aún pueden dispararse en el snapshot actual del partido"""
+        s = partido.estadisticas_actuales
+        if s is None:
+            return []
+        retiradas: Set[str] = partido.reglas_retiradas
+        return [r for r in self.tramo(s.minuto) if r.nombre not in retiradas and r.puede_disparar(partido, s)]
+
+    def _columnas_reglas(self, np):
+        """Condiciones de la tabla como arrays (una posición por regla); sin límite = infinito"""
+        if self._condiciones is None:
+            def sin_limite(valor):
+                return np.inf if valor is None else valor
+
+            self._condiciones = (
+                np.array([r.desde for r in self.reglas], dtype=float),
+                np.array([sin_limite(r.hasta) for r in self.reglas], dtype=float),
+                np.array([sin_limite(r.max_diferencia_goles) for r in self.reglas], dtype=float),
+                np.array([sin_limite(r.max_goles) for r in self.reglas], dtype=float),
+                np.array([r.requiere_estadisticas for r in self.reglas], dtype=bool),
+                np.array([r.requiere_roja for r in self.reglas], dtype=bool),
+            )
+        return self._condiciones
+
+    def candidatas_lote(self, partidos) -> List[Tuple[object, ReglaAlerta]]:
+        """
+        candidatas() de muchos partidos en una pasada con NumPy: una columna por dato del
+        snapshot frente a una fila por regla. Devuelve los pares (partido, regla) cuyas
+        condiciones se cumplen, por partido y en el orden de la tabla, como candidatas().
+        """
+        partidos = [p for p in partidos if p.estadisticas_actuales is not None]
+        if not partidos:
+            return []
+        import numpy as np  # sólo al evaluar; no entra en el arranque del bot
+
+        desde, hasta, max_dif, max_goles, requiere_stats, requiere_roja = self._columnas_reglas(np)
+        snaps = [p.estadisticas_actuales for p in partidos]
+        minuto = np.array([s.minuto for s in snaps], dtype=float)[:, None]
+        dif = np.array([s.diferencia_goles for s in snaps], dtype=float)[:, None]
+        goles = np.array([s.goles_local + s.goles_visita for s in snaps], dtype=float)[:, None]
+        con_stats = np.array([p.tiene_estadisticas for p in partidos], dtype=bool)[:, None]
+        con_roja = np.array([
+            s.tarjetas_rojas_totales > 0
+            or p.minuto_primera_roja_local is not None or p.minuto_primera_roja_visita is not None
+            for p, s in zip(partidos, snaps)
+        ], dtype=bool)[:, None]
+
+        cumple = ((minuto >= desde) & (minuto <= hasta)
+                  & (con_stats | ~requiere_stats)
+                  & (dif <= max_dif) & (goles <= max_goles)
+                  & (con_roja | ~requiere_roja))
+        for i, partido in enumerate(partidos):
+            for nombre in partido.reglas_retiradas:
+                j = self._posicion.get(nombre)
+                if j is not None:
+                    cumple[i, j] = False
+
+        filas, columnas = np.nonzero(cumple)
+        return [(partidos[i], self.reglas[j]) for i, j in zip(filas.tolist(), columnas.tolist())]
+
+    def evaluar_lote(self, partidos) -> Iterator[Tuple[object, str]]:
+        """(partido, mensaje) de las alertas que se disparan en el snapshot actual de cada partido"""
+        for partido, regla in self.candidatas_lote(partidos):
+            msg = regla.funcion(partido)
+            if regla.agotada(partido):
+                partido.reglas_retiradas.add(regla.nombre)
+            if msg:
+                yield partido, msg
@@ -1,8 +1,31 @@
 import json
-from typing import Dict, List, Optional, Tuple
+import threading
+from collections import deque
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from datetime import datetime
 import math
 
+if TYPE_CHECKING:
+    import numpy as np   # sólo para las anotaciones; en ejecución se importa con _import_numpy
+
+# Estadísticas por lado que el modo por lotes carga como columnas (ver MatchBatch)
+BATCH_FIELDS = ('shots', 'shots_on_target', 'dangerous_attacks', 'possession', 'corners', 'big_chances', 'xgot')
+
+
+def _import_numpy():
+    """numpy sólo hace falta en el modo por lotes: se importa al usarlo"""
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("El scoring por lotes requiere 'numpy' (pip install numpy)") from None
+    return np
+
+
+def _round_batch(np, values: 'np.ndarray', digits: int = 2) -> 'np.ndarray':
+    """round() de Python elemento a elemento: np.round difiere en los empates (0.995 -> 1.0)"""
+    return np.array([round(v, digits) for v in values.tolist()])
+
+
 class ExpectedGoalsCalculator:
     """Calcula Expected Goals (xG) basado en estadísticas del partido"""
     
@@ -89,13 +112,51 @@ class ExpectedGoalsCalculator:
             print(f"Error calculando xG: {e}")
             return 0.3  # Valor por defecto más realista
 
+    def calculate_xg_batch(self, columns: Dict) -> 'np.ndarray':
+        """
+        calculate_xg para muchos equipos a la vez, sobre columnas NumPy (ver MatchBatch)
+
+        Args:
+            columns: {estadística: array} con las claves de BATCH_FIELDS; xgot es NaN si falta
+
+        Returns:
+            array con el xG de cada equipo, igual al de calculate_xg
+        """
+        np = _import_numpy()
+        shots = columns['shots']
+        shots_on_target = columns['shots_on_target']
+        possession = columns['possession']
+        big_chances = columns['big_chances']
+        xgot = columns['xgot']
+
+        shots_off_target = np.maximum(0, shots - shots_on_target)
+        xg_shots = (shots_on_target * 0.15 + shots_off_target * 0.05)
+        xg_attacks = (columns['dangerous_attacks'] / 10) * 0.3
+        xg_possession = np.where(possession > 50, ((possession - 50) / 50) * 0.2, 0)
+        xg_corners = columns['corners'] * 0.03
+        total_xg = xg_shots + xg_attacks + xg_possession + xg_corners
+
+        # Mismo orden de prioridad que calculate_xg: xGOT, grandes ocasiones, volumen sin calidad
+        with np.errstate(divide='ignore', invalid='ignore'):
+            quality_ratio = xgot / (shots_on_target * 0.15)
+        quality_factor = np.select(
+            [~np.isnan(xgot) & (shots_on_target > 0),
+             big_chances > 0,
+             (shots_on_target >= 3) & (big_chances == 0)],
+            [np.clip(quality_ratio, 0.5, 1.8), 1.0 + big_chances * 0.35, 0.65],
+            default=1.0,
+        )
+
+        return _round_batch(np, np.maximum(0.15, total_xg * quality_factor))
+
 
 class MomentumAnalyzer:
-    """Analiza el momentum del partido en ventanas de tiempo"""
+    """Analiza el momentum de un partido en ventanas de tiempo (un analizador por partido)"""
     
     def __init__(self, window_size: int = 5):
         self.window_size = window_size
-        self.history = []
+        self.history = deque(maxlen=window_size)
+        self.lock = threading.Lock()
     
     def add_snapshot(self, minute: int, home_stats: Dict, away_stats: Dict):
         """Agrega un snapshot de estadísticas"""
@@ -103,11 +164,13 @@ class MomentumAnalyzer:
             'minute': minute,
             'home': home_stats.copy(),
             'away': away_stats.copy()
-        })
-        
-        # Mantener solo los últimos N snapshots
-        if len(self.history) > self.window_size:
-            self.history.pop(0)
+        })  # la deque conserva sólo los últimos N snapshots
+    
+    def update(self, minute: int, home_stats: Dict, away_stats: Dict) -> Tuple[float, float]:
+        """Agrega un snapshot y devuelve el momentum (local, visita) en un solo paso atómico"""
+        with self.lock:
+            self.add_snapshot(minute, home_stats, away_stats)
+            return self.calculate_momentum('home'), self.calculate_momentum('away')
     
     def calculate_momentum(self, team: str = 'home') -> float:
         """
@@ -144,12 +207,62 @@ class MomentumAnalyzer:
             return 0.0
 
 
+class MatchBatch:
+    """
+    Snapshots actuales de varios partidos como columnas (struct-of-arrays): una columna
+    NumPy por estadística y lado, con una fila por partido en el orden de match_ids.
+    Los snapshots tienen el formato de analyze_match ('home', 'away', 'minute', 'league').
+    """
+
+    def __init__(self, match_ids: List[str], snapshots: List[Dict]):
+        np = _import_numpy()
+        self.match_ids = list(match_ids)
+        self.leagues = [s.get('league', 'Unknown') for s in snapshots]
+        self.minute = np.array([s.get('minute', 0) for s in snapshots], dtype=float)
+        self.score_home = np.array([s.get('score_home', 0) for s in snapshots], dtype=float)
+        self.score_away = np.array([s.get('score_away', 0) for s in snapshots], dtype=float)
+        self.home = self._columns(np, [s.get('home', {}) for s in snapshots])
+        self.away = self._columns(np, [s.get('away', {}) for s in snapshots])
+
+    @classmethod
+    def from_partido_data(cls, match_ids: List[str], partidos_data: List[Dict]) -> 'MatchBatch':
+        """Lote con los mismos datos que integrar_scoring_en_partido pasa a analyze_match"""
+        return cls(match_ids, [
+            {
+                'home': data.get('home_stats', {}),
+                'away': data.get('away_stats', {}),
+                'minute': data.get('minute', 0),
+                'league': data.get('league', 'Unknown'),
+                'score_home': data.get('score_home', 0),
+                'score_away': data.get('score_away', 0),
+            }
+            for data in partidos_data
+        ])
+
+    @staticmethod
+    def _columns(np, sides: List[Dict]) -> Dict:
+        columns = {
+            field: np.array([side.get(field, 0) for side in sides], dtype=float)
+            for field in BATCH_FIELDS if field != 'xgot'
+        }
+        xgot = [side.get('xgot') for side in sides]
+        columns['xgot'] = np.array([np.nan if x is None else x for x in xgot], dtype=float)
+        return columns
+
+    def __len__(self) -> int:
+        return len(self.match_ids)
+
+
 class ScoringEngine:
     """Motor principal de scoring mejorado"""
     
     def __init__(self):
         self.xg_calculator = ExpectedGoalsCalculator()
-        self.momentum_analyzer = MomentumAnalyzer()
+        
+        # Momentum por partido (match_id -> MomentumAnalyzer): cada partido con su propio
+        # historial; el lock protege el diccionario cuando se analiza desde varios hilos
+        self.momentum_analyzers: Dict[str, MomentumAnalyzer] = {}
+        self._lock = threading.Lock()
         
         # Pesos de ligas (puedes ajustar según tus preferencias)
         self.league_weights = {
@@ -165,6 +278,22 @@ class ScoringEngine:
             'default': 0.65
         }
     
+    def momentum_analyzer(self, match_id: Optional[str]) -> MomentumAnalyzer:
+        """Analizador de momentum del partido; sin match_id, uno nuevo que no se guarda"""
+        if match_id is None:
+            return MomentumAnalyzer()
+        with self._lock:
+            analyzer = self.momentum_analyzers.get(match_id)
+            if analyzer is None:
+                analyzer = self.momentum_analyzers[match_id] = MomentumAnalyzer()
+            return analyzer
+    
+    def retain_matches(self, match_ids: set):
+        """Olvida el momentum de los partidos que ya no están en seguimiento"""
+        with self._lock:
+            for match_id in [m for m in self.momentum_analyzers if m not in match_ids]:
+                del self.momentum_analyzers[match_id]
+    
     def get_league_weight(self, league: str) -> float:
         """Obtiene el peso de una liga"""
         return self.league_weights.get(league, self.league_weights['default'])
@@ -204,13 +333,64 @@ class ScoringEngine:
         except Exception as e:
             print(f"Error calculando presión: {e}")
             return 0.0
+
+    def calculate_pressure_batch(self, columns: Dict, opponent_columns: Dict) -> 'np.ndarray':
+        """calculate_pressure_score sobre columnas NumPy de muchos partidos (0-100)"""
+        np = _import_numpy()
+        total_pressure = (
+            columns['shots'] * 3 +
+            columns['dangerous_attacks'] * 2 +
+            columns['possession'] * 50 +
+            columns['corners'] * 4 -
+            opponent_columns['shots_on_target'] * 2
+        )
+        return np.clip(total_pressure, 0, 100)
+
+    def analyze_batch(self, batch: MatchBatch) -> Dict:
+        """
+        xG, presión, avisos de calidad y proyección de córners de todos los partidos
+        de un lote en una pasada vectorizada
+
+        El momentum no se incluye: depende del historial de cada partido, no del
+        snapshot actual, así que tampoco hay score final ni predicted_outcome.
+
+        Returns:
+            Dict de arrays (una fila por partido, en el orden del lote) con las claves
+            home_xg, away_xg, home_pressure, away_pressure, league_weight,
+            corners_projection y quality_warning (None o el mismo código que analyze_match)
+        """
+        np = _import_numpy()
+        home, away = batch.home, batch.away
+
+        home_low = (home['shots_on_target'] >= 3) & (home['big_chances'] == 0)
+        away_low = (away['shots_on_target'] >= 3) & (away['big_chances'] == 0)
+        quality_warning = np.full(len(batch), None, dtype=object)
+        quality_warning[away_low] = 'away_low_quality'
+        quality_warning[home_low] = 'home_low_quality'
+        quality_warning[home_low & away_low] = 'both_low_quality'
+
+        # Córners totales a 90' al ritmo actual
+        corners = home['corners'] + away['corners']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corners_projection = np.where(batch.minute > 0, corners / batch.minute * 90, 0.0)
+
+        return {
+            'home_xg': self.xg_calculator.calculate_xg_batch(home),
+            'away_xg': self.xg_calculator.calculate_xg_batch(away),
+            'home_pressure': _round_batch(np, self.calculate_pressure_batch(home, away)),
+            'away_pressure': _round_batch(np, self.calculate_pressure_batch(away, home)),
+            'league_weight': np.array([self.get_league_weight(l) for l in batch.leagues]),
+            'corners_projection': corners_projection,
+            'quality_warning': quality_warning,
+        }
     
     def analyze_match(self, match_data: Dict) -> Dict:
         """
         Análisis completo del partido
         
         Args:
-            match_data: Diccionario con toda la información del partido
+            match_data: Diccionario con toda la información del partido; con 'match_id'
+                        el momentum se calcula sobre los snapshots previos de ese partido
         
         Returns:
             Dict con el análisis completo y score
@@ -255,10 +435,9 @@ class ScoringEngine:
                 else:
                     quality_warning = 'away_low_quality'
             
-            # Actualizar momentum
-            self.momentum_analyzer.add_snapshot(minute, home_stats, away_stats)
-            home_momentum = self.momentum_analyzer.calculate_momentum('home')
-            away_momentum = self.momentum_analyzer.calculate_momentum('away')
+            # Actualizar momentum (sólo con snapshots de este partido)
+            analyzer = self.momentum_analyzer(match_data.get('match_id'))
+            home_momentum, away_momentum = analyzer.update(minute, home_stats, away_stats)
             
             # Calcular presión
             home_pressure = self.calculate_pressure_score(home_stats, away_stats)
@@ -336,6 +515,7 @@ def integrar_scoring_en_partido(scoring_engine: ScoringEngine, partido_data: Dic
     try:
         # Preparar datos en el formato que espera analyze_match
         match_data_formatted = {
+            'match_id': partido_data.get('match_id'),
             'home': partido_data.get('home_stats', {}),
             'away': partido_data.get('away_stats', {}),
             'minute': partido_data.get('minute', 0),